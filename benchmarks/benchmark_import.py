@@ -0,0 +1,87 @@
+"""
+Benchmark of the time taken to import the plugin step.
+
+MAP Client imports every plugin when it starts, so the step should not import
+exporters it does not use, see exporters.py.  Each case imports modules in a
+fresh process, the time reported is the best of the repeats:
+
+    step             the step module, as MAP Client imports it
+    all_exporters    the step module then every cmlibs.exporter backend, as
+                     MAP Client paid before the exporters were imported lazily
+    exporter_<type>  the step module then the exporter of one export type, as
+                     paid by the first execution of that type
+
+    python benchmarks/benchmark_import.py
+
+The step and its requirements must be installed, or importable from the
+root of the repository.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+STEP_MODULE = "mapclientplugins.argonsceneexporterstep.step"
+REPEATS = 5
+IMPORT_CODE = """
+import importlib
+import sys
+import time
+
+start = time.perf_counter()
+for module_name in sys.argv[1:]:
+    importlib.import_module(module_name)
+print(time.perf_counter() - start)
+"""
+
+
+def _import_time(module_names):
+    completed = subprocess.run([sys.executable, "-c", IMPORT_CODE] + module_names, check=True, stdout=subprocess.PIPE, text=True,
+                               cwd=ROOT_DIR)
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(repeats=REPEATS):
+    """
+    Returns the best import time in seconds of each case.
+    """
+    from mapclientplugins.argonsceneexporterstep.exporters import EXPORTERS
+
+    cases = {
+        "step": [STEP_MODULE],
+        "all_exporters": [STEP_MODULE] + [module_name for module_name, _ in EXPORTERS.values()],
+    }
+    for export_type, (module_name, _) in EXPORTERS.items():
+        cases[f"exporter_{export_type}"] = [STEP_MODULE, module_name]
+
+    # The first import of each module writes its bytecode, so it is not timed.
+    _import_time(cases["all_exporters"])
+    return {name: min(_import_time(module_names) for _ in range(repeats)) for name, module_names in cases.items()}
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="benchmark_import")
+    parser.add_argument("-n", "--repeats", type=int, default=REPEATS, help="Number of times each case is run")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_arguments()
+    results = run_benchmarks(args.repeats)
+    for name, seconds in results.items():
+        print(f"{name}: {seconds * 1000:.1f} ms")
+    print(f"Saved at start up: {(results['all_exporters'] - results['step']) * 1000:.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, sort_keys=True, indent=2)
+
+
+if __name__ == "__main__":
+    main()
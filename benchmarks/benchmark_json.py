@@ -0,0 +1,98 @@
+"""
+Benchmark of the throughput of the JSON backends of the splitter.
+
+Generates a synthetic time varying scene, see splitter.synthetic, then reads
+and writes each of its resources with every backend installed, see
+splitter.serialisation.  The throughput reported is the bytes of the
+resources read from disk over the best time of the repeats, for parsing from
+the file and for serialising the parsed content.  The bytes written are
+reported too, every backend writes compactly so they differ only in how
+floats are formatted.
+
+    python benchmarks/benchmark_json.py --size "32 MiB"
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIZE = "16 MiB"
+REPEATS = 3
+
+
+def _best_time(function, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(size, repeats=REPEATS):
+    """
+    Returns the parse and serialise throughput in bytes per second and the bytes
+    written by each backend installed.
+    """
+    from mapclientplugins.argonsceneexporterstep.splitter.serialisation import (
+        PARSING_BACKENDS, SERIALISING_BACKENDS, available_backends, read_json, serialise_json)
+    from mapclientplugins.argonsceneexporterstep.splitter.synthetic import generate_scene
+    from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+    scene_dir = tempfile.mkdtemp(prefix="benchmark_json_")
+    try:
+        generate_scene(scene_dir, convert_to_bytes(size), surfaces=2, lines=1, glyphs=1, time_steps=2)
+        resources = [os.path.join(scene_dir, file_name) for file_name in sorted(os.listdir(scene_dir))
+                     if file_name.endswith(".json") and not file_name.endswith("_metadata.json")]
+        total_bytes = sum(os.path.getsize(resource) for resource in resources)
+        contents = [read_json(resource, "json") for resource in resources]
+
+        results = {}
+        for backend in available_backends():
+            result = {}
+            if backend in PARSING_BACKENDS:
+                seconds = _best_time(lambda: [read_json(resource, backend) for resource in resources], repeats)
+                result["parse"] = total_bytes / seconds
+            if backend in SERIALISING_BACKENDS:
+                seconds = _best_time(lambda: [serialise_json(content, backend=backend) for content in contents], repeats)
+                result["serialise"] = total_bytes / seconds
+                result["bytes_written"] = sum(len(serialise_json(content, backend=backend)) for content in contents)
+            results[backend] = result
+    finally:
+        shutil.rmtree(scene_dir, ignore_errors=True)
+
+    return {"bytes_read": total_bytes, "backends": results}
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="benchmark_json")
+    parser.add_argument("-s", "--size", default=SIZE, help="Size of the synthetic scene, 16 MiB etc.")
+    parser.add_argument("-n", "--repeats", type=int, default=REPEATS, help="Number of times each backend is run")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_arguments()
+    results = run_benchmarks(args.size, args.repeats)
+    print(f"Resources: {results['bytes_read']} bytes")
+    for backend, result in results["backends"].items():
+        parts = [f"{operation} {result[operation] / 1024 / 1024:.1f} MiB/s" for operation in ["parse", "serialise"] if operation in result]
+        if "bytes_written" in result:
+            parts.append(f"writes {result['bytes_written']} bytes")
+        print(f"{backend}: " + ", ".join(parts))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, sort_keys=True, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Benchmarks of splitting and combining webGL exports.
+
+Each case generates a synthetic scene, see splitter.synthetic, then splits
+it, combines it, or both.  Every operation runs in a fresh process on a fresh
+copy of the scene, so that its peak resident set size can be measured, and
+the wall time reported is the best of the repeats.  The bytes and number of
+files in the output directory are reported too, they do not change between
+runs unless the output of the splitter changes, as is the time taken to parse
+the output as a client would, see _parse_output.  Cases that write the same
+resources in different formats are compared with each other, see
+FORMAT_COMPARISONS, and cases splitting surfaces in different orders are
+compared by the locality of their split files, see LOCALITY_COMPARISONS.
+
+Results are written as JSON, and can be saved as a baseline and compared
+against later:
+
+    python benchmarks/benchmark_splitter.py --save benchmarks/baseline.json
+    python benchmarks/benchmark_splitter.py --compare benchmarks/baseline.json
+
+The quick suite takes under a minute, the full suite adds cases of 256 MiB
+and 1 GiB, including a surface of millions of faces split with each engine.
+The operations delete their sources as the step does, so the output bytes
+are those of the finished export.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SUITE_QUICK = "quick"
+SUITE_FULL = "full"
+SUITES = [SUITE_QUICK, SUITE_FULL]
+REPEATS = 5
+# Relative increase in wall time or peak memory over the baseline that is reported as a regression.
+TOLERANCE = 0.2
+# Wall times that differ by less than this many seconds are too close to call.
+MINIMUM_TIME_DIFFERENCE = 0.05
+
+# Cases are a name, the arguments of synthetic.generate_scene with the size as text,
+# and the arguments of split_webgl_output and combine_webgl_output, without the
+# metadata file, for the operations that are run.
+QUICK_CASES = [
+    ("surfaces_python", {"size": "8 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "512 KiB", "delete_split_source": True, "engine": "python"}}),
+    ("surfaces_numpy", {"size": "8 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "512 KiB", "delete_split_source": True, "engine": "numpy"}}),
+    ("surfaces_streaming", {"size": "8 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "512 KiB", "delete_split_source": True, "memory_limit": "1 MiB"}}),
+    # Chunks span whole rows of the surface, Morton order gives about as many vertices but smaller bounding boxes.
+    ("surfaces_morton", {"size": "8 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "512 KiB", "delete_split_source": True, "split_order": "morton"}}),
+    # Chunks much narrower than the rows of the surface, where Morton order gives the chunks fewer vertices.
+    ("surfaces_faces_narrow", {"size": "1 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "16 KiB", "delete_split_source": True}}),
+    ("surfaces_morton_narrow", {"size": "1 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "16 KiB", "delete_split_source": True, "split_order": "morton"}}),
+    ("surfaces_binary", {"size": "8 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "512 KiB", "delete_split_source": True, "output_format": "binary"}}),
+    ("mixed_time_varying", {"size": "16 MiB", "surfaces": 2, "lines": 1, "glyphs": 1, "lod": True, "time_steps": 4},
+     {"split": {"file_size_limit": "1 MiB", "delete_split_source": True}}),
+    ("many_small", {"size": "16 MiB", "surfaces": 600, "lines": 200, "glyphs": 0},
+     {"combine": {"file_size_limit": "703 KiB", "delete_combined_source": True}}),
+]
+FULL_CASES = QUICK_CASES + [
+    ("large_time_varying", {"size": "256 MiB", "surfaces": 2, "lines": 1, "glyphs": 1, "time_steps": 2},
+     {"split": {"file_size_limit": "18 MiB", "delete_split_source": True, "workers": 0}}),
+    # About 2.2 million faces in one surface, split with each engine.
+    ("million_faces_python", {"size": "256 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "18 MiB", "delete_split_source": True, "engine": "python"}}),
+    ("million_faces_numpy", {"size": "256 MiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "18 MiB", "delete_split_source": True, "engine": "numpy"}}),
+    ("huge_streaming", {"size": "1 GiB", "surfaces": 1, "lines": 0, "glyphs": 0},
+     {"split": {"file_size_limit": "18 MiB", "delete_split_source": True}}),
+    ("many_small_large", {"size": "64 MiB", "surfaces": 1500, "lines": 500, "glyphs": 0},
+     {"combine": {"file_size_limit": "703 KiB", "delete_combined_source": True, "workers": 0}}),
+]
+OPERATIONS = ["split", "combine"]
+# Pairs of cases splitting the same scene in the binary and the JSON output formats.
+FORMAT_COMPARISONS = [("surfaces_binary", "surfaces_numpy")]
+# Pairs of cases splitting the same scene in Morton and in faces order.
+LOCALITY_COMPARISONS = [("surfaces_morton", "surfaces_numpy"), ("surfaces_morton_narrow", "surfaces_faces_narrow")]
+LOCALITY_TYPES = ["Surfaces", "Lines"]
+SIZE_ARGUMENTS = ["size", "file_size_limit", "memory_limit"]
+
+
+def _with_sizes(arguments):
+    from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+    converted = dict(arguments)
+    for key in SIZE_ARGUMENTS:
+        if key in converted:
+            converted[key] = convert_to_bytes(converted[key])
+    if converted.get("workers", 1) == 0:
+        converted["workers"] = None
+    return converted
+
+
+def _peak_rss():
+    """
+    The peak resident set size in bytes of this process and of its finished child processes.
+    """
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _directory_totals(directory):
+    total_bytes = 0
+    total_files = 0
+    for file_name in os.listdir(directory):
+        path = os.path.join(directory, file_name)
+        if os.path.isfile(path):
+            total_bytes += os.path.getsize(path)
+            total_files += 1
+    return total_bytes, total_files
+
+
+def _typed_arrays(value, data, arrays):
+    from mapclientplugins.argonsceneexporterstep.splitter.binary_resource import TYPED_ARRAY_KEY, TYPED_ARRAYS
+
+    if isinstance(value, dict):
+        if TYPED_ARRAY_KEY in value:
+            code = TYPED_ARRAYS[value[TYPED_ARRAY_KEY]]
+            start = value["byteOffset"]
+            arrays.append(data[start:start + value["length"] * struct.calcsize(code)].cast(code))
+        else:
+            for item in value.values():
+                _typed_arrays(item, data, arrays)
+    elif isinstance(value, list):
+        for item in value:
+            _typed_arrays(item, data, arrays)
+
+
+def _parse_output(meta_file):
+    """
+    Parse the resources of the metadata file as a client would, JSON resources into
+    values and binary resources into typed arrays viewing their .bin files.
+    Returns the seconds taken.
+    """
+    from mapclientplugins.argonsceneexporterstep.splitter.binary_resource import BINARY_KEY, is_binary_header
+    from mapclientplugins.argonsceneexporterstep.splitter.json_resource import referenced_files
+
+    with open(meta_file) as f:
+        meta_content = json.load(f)
+    meta_dir = os.path.dirname(meta_file)
+    files = {}
+    referenced_files(meta_content, meta_dir, files)
+    start = time.perf_counter()
+    for file_name in files:
+        if not file_name.endswith(".json") or not os.path.isfile(file_name):
+            continue
+        with open(file_name) as f:
+            content = json.load(f)
+        headers = content if isinstance(content, list) else [content]
+        if len(headers) and is_binary_header(headers[0]):
+            with open(os.path.join(os.path.dirname(file_name), headers[0][BINARY_KEY]["URL"]), 'rb') as f:
+                data = memoryview(f.read())
+            _typed_arrays(headers, data, [])
+    return time.perf_counter() - start
+
+
+def _chunk_locality(meta_file):
+    """
+    The total number of vertices of the JSON split files of surfaces and lines, and
+    the mean of the largest side of their bounding boxes.  Vertices shared by faces
+    in different split files are copied into each, so fewer vertices and smaller
+    bounding boxes mean more compact split files.  None for both without split files.
+    """
+    from mapclientplugins.argonsceneexporterstep.splitter.binary_resource import is_binary_header
+    from mapclientplugins.argonsceneexporterstep.splitter.spatial import bounding_box
+
+    with open(meta_file) as f:
+        meta_content = json.load(f)
+    meta_dir = os.path.dirname(meta_file)
+    vertices = 0
+    extents = []
+    for item in meta_content:
+        if not isinstance(item, dict) or item.get("Type") not in LOCALITY_TYPES or not isinstance(item.get("URL"), list):
+            continue
+        for url in item["URL"]:
+            with open(os.path.join(meta_dir, url)) as f:
+                content = json.load(f)
+            if is_binary_header(content):
+                continue
+            box = bounding_box(content["vertices"], content.get("scale", None))
+            vertices += len(content["vertices"]) // 3
+            if box is not None:
+                extents.append(max(upper - lower for lower, upper in zip(*box)))
+
+    if not extents:
+        return None, None
+    return vertices, sum(extents) / len(extents)
+
+
+def _run_operation(specification):
+    """
+    Run one operation in this process and print its measurements as JSON.
+    """
+    from mapclientplugins.argonsceneexporterstep.splitter.json_resource import combine_webgl_output, split_webgl_output
+
+    operation = {"split": split_webgl_output, "combine": combine_webgl_output}[specification["operation"]]
+    start = time.perf_counter()
+    operation(specification["meta_file"], **_with_sizes(specification["arguments"]))
+    wall_time = time.perf_counter() - start
+    output_bytes, output_files = _directory_totals(os.path.dirname(specification["meta_file"]))
+    chunk_vertices, chunk_extent = _chunk_locality(specification["meta_file"])
+    print(json.dumps({"wall_time": wall_time, "peak_rss": _peak_rss(), "output_bytes": output_bytes, "output_files": output_files,
+                      "parse_time": _parse_output(specification["meta_file"]), "chunk_vertices": chunk_vertices,
+                      "chunk_extent": chunk_extent}))
+
+
+def _measure(operation, meta_file, arguments):
+    specification = json.dumps({"operation": operation, "meta_file": meta_file, "arguments": arguments})
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-operation", specification],
+                               check=True, stdout=subprocess.PIPE, text=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _run_case(scene_arguments, operations, work_dir, repeats):
+    from mapclientplugins.argonsceneexporterstep.splitter.synthetic import generate_scene
+
+    scene_dir = os.path.join(work_dir, "scene")
+    meta_file = generate_scene(scene_dir, **_with_sizes(scene_arguments))
+    input_bytes, input_files = _directory_totals(scene_dir)
+    results = {"input_bytes": input_bytes, "input_files": input_files}
+    runs = {operation: [] for operation in OPERATIONS if operation in operations}
+    for _ in range(repeats):
+        run_dir = os.path.join(work_dir, "run")
+        shutil.rmtree(run_dir, ignore_errors=True)
+        shutil.copytree(scene_dir, run_dir)
+        for operation in runs:
+            runs[operation].append(_measure(operation, os.path.join(run_dir, os.path.basename(meta_file)), operations[operation]))
+
+    for operation, measurements in runs.items():
+        peak_rss = [measurement["peak_rss"] for measurement in measurements if measurement["peak_rss"] is not None]
+        results[operation] = {
+            "wall_time": min(measurement["wall_time"] for measurement in measurements),
+            "peak_rss": max(peak_rss) if peak_rss else None,
+            "output_bytes": measurements[-1]["output_bytes"],
+            "output_files": measurements[-1]["output_files"],
+            "parse_time": min(measurement["parse_time"] for measurement in measurements),
+            "chunk_vertices": measurements[-1]["chunk_vertices"],
+            "chunk_extent": measurements[-1]["chunk_extent"],
+        }
+    return results
+
+
+def _format_comparisons(results):
+    """
+    Print the output size and parse time of each binary case of FORMAT_COMPARISONS
+    relative to its JSON case, when both were run.
+    """
+    for binary_name, json_name in FORMAT_COMPARISONS:
+        if binary_name in results and json_name in results:
+            binary_split, json_split = results[binary_name]["split"], results[json_name]["split"]
+            print(f"{binary_name} against {json_name}: output {binary_split['output_bytes'] / json_split['output_bytes']:.2f}x bytes, "
+                  f"parse time {binary_split['parse_time']:.3f} s against {json_split['parse_time']:.3f} s "
+                  f"({binary_split['parse_time'] / json_split['parse_time']:.2f}x)", file=sys.stderr)
+
+
+def _locality_comparisons(results):
+    """
+    Print the vertices and mean bounding box extent of the split files of each Morton
+    case of LOCALITY_COMPARISONS relative to its faces order case, when both were run.
+    """
+    for morton_name, faces_name in LOCALITY_COMPARISONS:
+        if morton_name in results and faces_name in results:
+            morton_split, faces_split = results[morton_name]["split"], results[faces_name]["split"]
+            if morton_split["chunk_vertices"] is None or faces_split["chunk_vertices"] is None:
+                continue
+            print(f"{morton_name} against {faces_name}: {morton_split['chunk_vertices']} against {faces_split['chunk_vertices']} "
+                  f"vertices ({morton_split['chunk_vertices'] / faces_split['chunk_vertices']:.2f}x), mean extent "
+                  f"{morton_split['chunk_extent']:.3f} against {faces_split['chunk_extent']:.3f} "
+                  f"({morton_split['chunk_extent'] / faces_split['chunk_extent']:.2f}x)", file=sys.stderr)
+
+
+def _environment():
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy_version,
+    }
+
+
+def run_benchmarks(suite=SUITE_QUICK, repeats=REPEATS, case_names=None, work_dir=None):
+    """
+    Run the cases of the suite, or only those in case_names, and return the results.
+    """
+    cases = FULL_CASES if suite == SUITE_FULL else QUICK_CASES
+    results = {}
+    for name, scene_arguments, operations in cases:
+        if case_names and name not in case_names:
+            continue
+        case_dir = tempfile.mkdtemp(prefix=f"{name}_", dir=work_dir)
+        try:
+            results[name] = _run_case(scene_arguments, operations, case_dir, repeats)
+        finally:
+            shutil.rmtree(case_dir, ignore_errors=True)
+        print(f"{name}: " + ", ".join(f"{operation} {results[name][operation]['wall_time']:.3f} s" for operation in OPERATIONS
+                                      if operation in results[name]), file=sys.stderr)
+    _format_comparisons(results)
+    _locality_comparisons(results)
+
+    return {"environment": _environment(), "suite": suite, "repeats": repeats, "results": results}
+
+
+def compare_results(results, baseline, tolerance=TOLERANCE):
+    """
+    Print the results relative to the baseline, returns the list of regressions:
+    wall times or peak memory more than tolerance over the baseline, and outputs that changed.
+    Wall times within MINIMUM_TIME_DIFFERENCE of the baseline are not regressions.
+    """
+    regressions = []
+    for name, case in results["results"].items():
+        baseline_case = baseline["results"].get(name, None)
+        if baseline_case is None:
+            print(f"{name}: not in baseline")
+            continue
+        for operation in OPERATIONS:
+            if operation not in case or operation not in baseline_case:
+                continue
+            current, previous = case[operation], baseline_case[operation]
+            time_ratio = current["wall_time"] / previous["wall_time"]
+            line = f"{name} {operation}: wall time {current['wall_time']:.3f} s ({time_ratio:.2f}x)"
+            if time_ratio > 1.0 + tolerance and current["wall_time"] - previous["wall_time"] > MINIMUM_TIME_DIFFERENCE:
+                regressions.append(f"{name} {operation} wall time")
+            if current["peak_rss"] and previous["peak_rss"]:
+                rss_ratio = current["peak_rss"] / previous["peak_rss"]
+                line += f", peak RSS {current['peak_rss'] / 2 ** 20:.1f} MiB ({rss_ratio:.2f}x)"
+                if rss_ratio > 1.0 + tolerance:
+                    regressions.append(f"{name} {operation} peak RSS")
+            line += f", output {current['output_bytes']} bytes in {current['output_files']} files"
+            if "parse_time" in current and "parse_time" in previous:
+                line += f", parse time {current['parse_time']:.3f} s ({current['parse_time'] / previous['parse_time']:.2f}x)"
+            if (current["output_bytes"], current["output_files"]) != (previous["output_bytes"], previous["output_files"]):
+                line += f" (was {previous['output_bytes']} bytes in {previous['output_files']} files)"
+                regressions.append(f"{name} {operation} output")
+            print(line)
+
+    if results["environment"] != baseline.get("environment", None):
+        print("The baseline was recorded in a different environment, compare wall times with care.")
+    return regressions
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="benchmark_splitter")
+    parser.add_argument("--suite", choices=SUITES, default=SUITE_QUICK, help="Cases to run, full adds cases of up to 1 GiB")
+    parser.add_argument("-k", "--case", action="append", help="Only run the named case, may be given more than once")
+    parser.add_argument("-n", "--repeats", type=int, default=REPEATS, help="Number of times each operation is run")
+    parser.add_argument("--save", help="Save the results as a baseline JSON file")
+    parser.add_argument("--compare", help="Compare the results with a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Relative increase over the baseline reported as a regression")
+    parser.add_argument("--work-dir", help="Directory for the generated scenes, by default the system temporary directory")
+    parser.add_argument("--run-operation", help=argparse.SUPPRESS)
+
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_arguments()
+    if args.run_operation:
+        _run_operation(json.loads(args.run_operation))
+        return
+
+    results = run_benchmarks(args.suite, args.repeats, args.case, args.work_dir)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, sort_keys=True, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
+    elif not args.save:
+        print(json.dumps(results, sort_keys=True, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark of the time taken to load a workflow of many steps.
+
+MAP Client creates each step of a workflow and deserialises its configuration
+when it loads the workflow, see ArgonSceneExporterStep.deserialize.  Each case
+loads the steps in a fresh process with a QApplication, as MAP Client has,
+the time reported is the best of the repeats:
+
+    deserialize   creating and deserialising the steps
+    dialog        creating and deserialising the steps, then building a
+                  ConfigureDialog to validate each of them, as deserialize
+                  did before the configuration was validated without it
+
+    python benchmarks/benchmark_workflow.py --steps 50
+
+Qt is run with the offscreen platform unless QT_QPA_PLATFORM is set.  The step
+and its requirements must be installed, or importable from the root of the
+repository.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+STEPS = 50
+REPEATS = 3
+LOAD_CODE = """
+import json
+import sys
+import time
+
+from PySide6 import QtWidgets
+
+from mapclientplugins.argonsceneexporterstep.step import ArgonSceneExporterStep
+
+location, steps, case = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+app = QtWidgets.QApplication([])
+identifiers = [f"exporter_{index}" for index in range(steps)]
+configs = [json.dumps({"identifier": identifier, "outputDir": identifier}) for identifier in identifiers]
+
+start = time.perf_counter()
+for config in configs:
+    step = ArgonSceneExporterStep(location)
+    step.registerIdentifierOccursCount(identifiers.count)
+    step.deserialize(config)
+    if case == "dialog":
+        from mapclientplugins.argonsceneexporterstep.configuredialog import ConfigureDialog
+        dialog = ConfigureDialog()
+        dialog.setWorkflowLocation(location)
+        dialog.identifierOccursCount = identifiers.count
+        dialog.setConfig(step._config)
+        dialog.validate()
+print(time.perf_counter() - start)
+"""
+CASES = ["deserialize", "dialog"]
+
+
+def _load_time(location, steps, case):
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    completed = subprocess.run([sys.executable, "-c", LOAD_CODE, location, str(steps), case], check=True, stdout=subprocess.PIPE,
+                               text=True, cwd=ROOT_DIR, env=environment)
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(steps=STEPS, repeats=REPEATS):
+    """
+    Returns the best time in seconds to load a workflow of steps steps for each case.
+    """
+    with tempfile.TemporaryDirectory(prefix="benchmark_workflow_") as location:
+        for index in range(steps):
+            os.mkdir(os.path.join(location, f"exporter_{index}"))
+        return {case: min(_load_time(location, steps, case) for _ in range(repeats)) for case in CASES}
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="benchmark_workflow")
+    parser.add_argument("-s", "--steps", type=int, default=STEPS, help="Number of steps in the workflow")
+    parser.add_argument("-n", "--repeats", type=int, default=REPEATS, help="Number of times each case is run")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_arguments()
+    results = run_benchmarks(args.steps, args.repeats)
+    for case, seconds in results.items():
+        print(f"{case}: {seconds * 1000:.1f} ms, {seconds * 1000 / args.steps:.2f} ms per step")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, sort_keys=True, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Cache of export results, kept in the output directory.
+
+An export is identified by a fingerprint of the serialised document, the
+files the document reads, the export type, the versions of the packages
+doing the export and the step configuration.  After an export the files it
+wrote are stored as a variant under its fingerprint, hard linked where the
+file system allows.  A later export with the same fingerprint is skipped
+when the output directory still holds its files, or the stored variant is
+put back when it does not.
+
+Variants that have not been used for longer than the maximum age are
+removed, then the least recently used variants until the cache fits in the
+maximum size.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from importlib.metadata import PackageNotFoundError, version
+
+CACHE_DIRECTORY = '.export_cache'
+STATE_FILE = 'state.json'
+MANIFEST_FILE = 'manifest.json'
+MAX_CACHE_SIZE = 1024 * 1024 * 1024
+MAX_CACHE_AGE_DAYS = 30
+SECONDS_PER_DAY = 24 * 60 * 60
+# Configuration that does not change the exported files.
+IGNORED_CONFIG_KEYS = ['identifier', 'previous_location', 'cacheResults', 'cacheSize', 'cacheMaxAge', 'stageReport', 'memoryLimit',
+                       'workers']
+# Keys of the serialised document naming files the document reads.
+FILE_NAME_KEYS = ['FileName']
+
+
+def package_versions(package_names):
+    """
+    The installed version of each package, None for packages that are not installed.
+    """
+    versions = {}
+    for package_name in package_names:
+        try:
+            versions[package_name] = version(package_name)
+        except PackageNotFoundError:
+            versions[package_name] = None
+    return versions
+
+
+def _file_names(value):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in FILE_NAME_KEYS and isinstance(item, str):
+                yield item
+            else:
+                yield from _file_names(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _file_names(item)
+
+
+def _file_stats(document_text):
+    try:
+        document = json.loads(document_text)
+    except ValueError:
+        return {}
+
+    stats = {}
+    for file_name in _file_names(document):
+        # Relative names are resolved as the document resolves them, see cmlibs.argon ArgonModelSourceFile.
+        path = os.path.abspath(file_name)
+        if os.path.isfile(path):
+            file_stat = os.stat(path)
+            stats[file_name] = [file_stat.st_size, file_stat.st_mtime_ns]
+        else:
+            stats[file_name] = None
+    return stats
+
+
+def export_fingerprint(document_text, config, versions):
+    """
+    The fingerprint of an export of the serialised document_text with the step config
+    by the packages with the given versions.  The files named in the document are
+    included by size and modification time.
+    """
+    content = {
+        "document": document_text,
+        "files": _file_stats(document_text),
+        "config": {key: value for key, value in config.items() if key not in IGNORED_CONFIG_KEYS},
+        "versions": versions,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _file_stat(path):
+    file_stat = os.stat(path)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+def _is_intact(directory, files):
+    for relative_path, expected in files.items():
+        path = os.path.join(directory, relative_path)
+        if not os.path.isfile(path) or _file_stat(path) != expected:
+            return False
+    return True
+
+
+def _link_or_copy(source, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, content):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(content, f, sort_keys=True, indent=2)
+    os.replace(temporary_path, path)
+
+
+class ExportCache(object):
+    """
+    The export cache of one output directory.
+    """
+
+    def __init__(self, output_dir, max_size=MAX_CACHE_SIZE, max_age=MAX_CACHE_AGE_DAYS * SECONDS_PER_DAY):
+        self._output_dir = output_dir
+        self._cache_dir = os.path.join(output_dir, CACHE_DIRECTORY)
+        self._max_size = max_size
+        self._max_age = max_age
+        self._snapshot = None
+
+    def _variant_dir(self, fingerprint):
+        return os.path.join(self._cache_dir, fingerprint)
+
+    def _state(self):
+        return _read_json(os.path.join(self._cache_dir, STATE_FILE))
+
+    def _output_files(self):
+        """
+        The size and modification time of every file in the output directory, outside the cache.
+        """
+        files = {}
+        for directory, sub_directories, file_names in os.walk(self._output_dir):
+            if directory == self._output_dir and CACHE_DIRECTORY in sub_directories:
+                sub_directories.remove(CACHE_DIRECTORY)
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                files[os.path.relpath(path, self._output_dir)] = _file_stat(path)
+        return files
+
+    def is_current(self, fingerprint):
+        """
+        True if the output directory holds the unchanged files of the export with fingerprint.
+        """
+        state = self._state()
+        return state is not None and state["fingerprint"] == fingerprint and _is_intact(self._output_dir, state["files"])
+
+    def restore(self, fingerprint):
+        """
+        Put the stored variant for fingerprint in the output directory, replacing the
+        files of the current export.  Returns False if there is no usable variant.
+        """
+        variant_dir = self._variant_dir(fingerprint)
+        manifest = _read_json(os.path.join(variant_dir, MANIFEST_FILE))
+        if manifest is None:
+            return False
+        if not _is_intact(variant_dir, manifest["files"]):
+            shutil.rmtree(variant_dir, ignore_errors=True)
+            return False
+
+        state = self._state()
+        if state is not None:
+            for relative_path in state["files"]:
+                path = os.path.join(self._output_dir, relative_path)
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        files = {}
+        for relative_path in manifest["files"]:
+            path = os.path.join(self._output_dir, relative_path)
+            _link_or_copy(os.path.join(variant_dir, relative_path), path)
+            files[relative_path] = _file_stat(path)
+
+        manifest["used"] = time.time()
+        _write_json(os.path.join(variant_dir, MANIFEST_FILE), manifest)
+        _write_json(os.path.join(self._cache_dir, STATE_FILE), {"fingerprint": fingerprint, "files": files})
+        return True
+
+    def reuse(self, fingerprint):
+        """
+        True if the export with fingerprint is in the output directory, restoring it if needed.
+        """
+        return self.is_current(fingerprint) or self.restore(fingerprint)
+
+    def begin(self):
+        """
+        Prepare for an export.  Output files that share their data with a stored
+        variant are replaced by copies, so that writing to them cannot change the
+        variant, and the output directory is recorded to find the files written.
+        """
+        for relative_path in self._output_files():
+            path = os.path.join(self._output_dir, relative_path)
+            if os.stat(path).st_nlink > 1:
+                temporary_path = f"{path}.detach"
+                shutil.copy2(path, temporary_path)
+                os.replace(temporary_path, path)
+        self._snapshot = self._output_files()
+
+    def store(self, fingerprint):
+        """
+        Store the files written since begin as the variant for fingerprint, then evict old variants.
+        """
+        snapshot = {} if self._snapshot is None else self._snapshot
+        files = {relative_path: file_stat for relative_path, file_stat in self._output_files().items()
+                 if snapshot.get(relative_path) != file_stat}
+
+        variant_dir = self._variant_dir(fingerprint)
+        shutil.rmtree(variant_dir, ignore_errors=True)
+        os.makedirs(variant_dir)
+        for relative_path in files:
+            _link_or_copy(os.path.join(self._output_dir, relative_path), os.path.join(variant_dir, relative_path))
+
+        now = time.time()
+        _write_json(os.path.join(variant_dir, MANIFEST_FILE), {
+            "files": files,
+            "size": sum(size for size, _ in files.values()),
+            "created": now,
+            "used": now,
+        })
+        _write_json(os.path.join(self._cache_dir, STATE_FILE), {"fingerprint": fingerprint, "files": files})
+        self._snapshot = None
+        self.evict()
+
+    def evict(self):
+        """
+        Remove variants not used within the maximum age, then the least recently used
+        variants until the stored variants fit in the maximum size.
+        """
+        if not os.path.isdir(self._cache_dir):
+            return
+
+        now = time.time()
+        variants = []
+        for name in os.listdir(self._cache_dir):
+            variant_dir = os.path.join(self._cache_dir, name)
+            if not os.path.isdir(variant_dir):
+                continue
+            manifest = _read_json(os.path.join(variant_dir, MANIFEST_FILE))
+            if manifest is None or now - manifest["used"] > self._max_age:
+                shutil.rmtree(variant_dir, ignore_errors=True)
+            else:
+                variants.append((manifest["used"], manifest["size"], variant_dir))
+
+        variants.sort()
+        total_size = sum(size for _, size, _ in variants)
+        for _, size, variant_dir in variants:
+            if total_size <= self._max_size:
+                break
+            shutil.rmtree(variant_dir, ignore_errors=True)
+            total_size -= size
+
+    def invalidate(self):
+        """
+        Remove every stored variant, the next export always runs.
+        """
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
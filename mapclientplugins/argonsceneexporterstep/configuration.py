@@ -0,0 +1,65 @@
+"""
+Configuration of the step, without the configure dialog.
+
+MAP Client checks the configuration of every step of a workflow when it loads
+it, so the checks are made here without Qt widgets, and need no display.
+ConfigureDialog makes the same checks, showing the fields that are not valid.
+"""
+import copy
+import os
+
+from mapclientplugins.argonsceneexporterstep.cache import MAX_CACHE_AGE_DAYS
+
+DEFAULT_CONFIG = {
+    'identifier': '', 'exportType': 'webgl', 'prefix': '',
+    'timeSteps': '', 'initialTime': '', 'finishTime': '',
+    'outputDir': '', 'splitSize': '18 MiB', 'splitFiles': False,
+    'combineSize': '703 KiB', 'combineFiles': False, 'workers': 1,
+    'outputFormat': 'json', 'compressFiles': False,
+    'significantDigits': '', 'quantizationBits': 0, 'splitOrder': 'faces',
+    'maxVerticesPerChunk': 0, 'cacheResults': False, 'cacheSize': '1 GiB',
+    'cacheMaxAge': MAX_CACHE_AGE_DAYS, 'stageReport': False, 'parallelTimeSteps': False,
+    'memoryLimit': '',
+}
+
+
+def default_config():
+    """
+    A new configuration with the default values.
+    """
+    return copy.deepcopy(DEFAULT_CONFIG)
+
+
+def output_location(output_dir, workflow_location=None):
+    """
+    The path of output_dir, which is relative to the workflow_location when there is one.
+    """
+    if workflow_location:
+        return os.path.realpath(os.path.join(workflow_location, output_dir))
+    return output_dir
+
+
+def identifier_valid(identifier, identifier_occurs_count, previous_identifier):
+    """
+    True if the identifier is unique in the workflow.  identifier_occurs_count is
+    the callable from the workflow framework counting the steps with an identifier,
+    which counts this step too when its identifier is still previous_identifier.
+    """
+    occurs = identifier_occurs_count(identifier)
+    return occurs == 0 or (occurs == 1 and identifier == previous_identifier)
+
+
+def directory_valid(output_dir, workflow_location=None):
+    """
+    True if output_dir is given and is an existing directory, see output_location.
+    """
+    return bool(output_dir) and os.path.isdir(output_location(output_dir, workflow_location))
+
+
+def validate_config(config, identifier_occurs_count, workflow_location=None):
+    """
+    True if the config of a step is valid, for the identifier the step has in the
+    config, see identifier_valid and directory_valid.
+    """
+    return (identifier_valid(config['identifier'], identifier_occurs_count, config['identifier']) and
+            directory_valid(config.get('outputDir', ''), workflow_location))
@@ -2,10 +2,23 @@ import os
 import webbrowser
 
 from PySide6 import QtCore, QtWidgets
+from mapclientplugins.argonsceneexporterstep.cache import ExportCache
+from mapclientplugins.argonsceneexporterstep.configuration import directory_valid, identifier_valid, output_location
+from mapclientplugins.argonsceneexporterstep.exporters import discovered_exporters
 from mapclientplugins.argonsceneexporterstep.ui_configuredialog import Ui_ConfigureDialog
 
 INVALID_STYLE_SHEET = 'background-color: rgba(239, 0, 0, 50)'
 DEFAULT_STYLE_SHEET = ''
+# Page of options for each export type, other export types have no options.
+EXPORT_TYPE_PAGES = {
+    'flatmapsvg': 'pageFlatmapSVG',
+    'image': 'pageImage',
+    'stl': 'pageSTL',
+    'thumbnail': 'pageThumbnail',
+    'vtk': 'pageVTK',
+    'wavefront': 'pageWavefront',
+    'webgl': 'pageWebGL',
+}
 
 
 class ConfigureDialog(QtWidgets.QDialog):
@@ -18,6 +31,7 @@ class ConfigureDialog(QtWidgets.QDialog):
 
         self._ui = Ui_ConfigureDialog()
         self._ui.setupUi(self)
+        self._ui.comboBoxExportType.addItems(sorted(discovered_exporters()))
 
         # Keep track of the previous identifier so that we can track changes
         # and know how many occurrences of the current identifier there should
@@ -43,6 +57,7 @@ class ConfigureDialog(QtWidgets.QDialog):
     def _make_connections(self):
         self._ui.lineEditIdentifier.textChanged.connect(self.validate)
         self._ui.pushButtonOutputDirectory.clicked.connect(self._directory_chooser_clicked)
+        self._ui.pushButtonClearCache.clicked.connect(self._clear_cache_clicked)
         self._ui.comboBoxExportType.currentTextChanged.connect(self._update_ui)
         self._ui.checkBoxSplitWebGLOutput.stateChanged.connect(self._update_ui)
         self._ui.checkBoxLODs.stateChanged.connect(self._update_ui)
@@ -54,8 +69,10 @@ class ConfigureDialog(QtWidgets.QDialog):
         elif self.sender() == self._ui.checkBoxSplitWebGLOutput:
             webgl_on = self._ui.checkBoxSplitWebGLOutput.isChecked()
             # self._ui.checkBoxLODs.setEnabled(not webgl_on)
-        current_index = self._ui.comboBoxExportType.currentIndex()
-        self._ui.stackedWidget.setCurrentIndex(current_index)
+        page = EXPORT_TYPE_PAGES.get(self._ui.comboBoxExportType.currentText(), None)
+        self._ui.stackedWidget.setVisible(page is not None)
+        if page is not None:
+            self._ui.stackedWidget.setCurrentWidget(getattr(self._ui, page))
 
     def _output_location(self, location=None):
         if location is None:
@@ -87,26 +104,20 @@ class ConfigureDialog(QtWidgets.QDialog):
         self._workflow_location = location
 
     def _directory_valid(self):
-        dir_path = self._output_location()
+        valid = directory_valid(self._output_location(), self._workflow_location)
+        self._ui.lineEditOutputDirectory.setStyleSheet(DEFAULT_STYLE_SHEET if valid else INVALID_STYLE_SHEET)
 
-        if self._workflow_location:
-            dir_path = os.path.realpath(os.path.join(self._workflow_location, dir_path))
-
-        directory_valid = os.path.isdir(dir_path) and len(self._ui.lineEditOutputDirectory.text())
-        self._ui.lineEditOutputDirectory.setStyleSheet(DEFAULT_STYLE_SHEET if directory_valid else INVALID_STYLE_SHEET)
-
-        return directory_valid
+        return valid
 
     def validate(self):
         """
         Validate the configuration dialog fields.  For any field that is not valid
         set the style sheet to the INVALID_STYLE_SHEET.  Return the outcome of the
-        overall validity of the configuration.
+        overall validity of the configuration, see configuration.validate_config.
         """
         # Determine if the current identifier is unique throughout the workflow
         # The identifierOccursCount method is part of the interface to the workflow framework.
-        value = self.identifierOccursCount(self._ui.lineEditIdentifier.text())
-        valid = (value == 0) or (value == 1 and self._previousIdentifier == self._ui.lineEditIdentifier.text())
+        valid = identifier_valid(self._ui.lineEditIdentifier.text(), self.identifierOccursCount, self._previousIdentifier)
         if valid:
             self._ui.lineEditIdentifier.setStyleSheet(DEFAULT_STYLE_SHEET)
         else:
@@ -125,8 +136,16 @@ class ConfigureDialog(QtWidgets.QDialog):
                   'initialTime': self._ui.initialTime_lineEdit.text(), 'finishTime': self._ui.finishTime_lineEdit.text(),
                   'outputDir': self._output_location(), 'exportType': self._ui.comboBoxExportType.currentText(),
                   'LODs': self._ui.checkBoxLODs.isChecked(),
+                  'parallelTimeSteps': self._ui.checkBoxParallelTimeSteps.isChecked(),
+                  'memoryLimit': self._ui.lineEditMemoryLimit.text(),
                   'splitFiles': self._ui.checkBoxSplitWebGLOutput.isChecked(), 'splitSize': self._ui.lineEditSplitMaxSize.text(),
                   'combineFiles': self._ui.checkBoxCombineWebGLOutput.isChecked(), 'combineSize': self._ui.lineEditCombineMaxSize.text(),
+                  'workers': self._ui.spinBoxWorkers.value(), 'outputFormat': self._ui.comboBoxOutputFormat.currentText(),
+                  'compressFiles': self._ui.checkBoxCompressWebGLOutput.isChecked(),
+                  'significantDigits': self._ui.lineEditSignificantDigits.text(), 'quantizationBits': self._ui.spinBoxQuantizationBits.value(),
+                  'splitOrder': self._ui.comboBoxSplitOrder.currentText(), 'maxVerticesPerChunk': self._ui.spinBoxMaxVerticesPerChunk.value(),
+                  'cacheResults': self._ui.checkBoxCacheResults.isChecked(), 'cacheSize': self._ui.lineEditCacheMaxSize.text(),
+                  'cacheMaxAge': self._ui.spinBoxCacheMaxAge.value(), 'stageReport': self._ui.checkBoxStageReport.isChecked(),
                   'width': self._ui.spinBoxWidth.value(), 'height': self._ui.spinBoxHeight.value()}
         if self._previousLocation:
             config['previous_location'] = os.path.relpath(self._previousLocation, self._workflow_location)
@@ -148,11 +167,24 @@ class ConfigureDialog(QtWidgets.QDialog):
         self._ui.initialTime_lineEdit.setText(config['initialTime'])
         self._ui.finishTime_lineEdit.setText(config['finishTime'])
         self._ui.checkBoxLODs.setChecked(config.get('LODs', False))
+        self._ui.checkBoxParallelTimeSteps.setChecked(config.get('parallelTimeSteps', False))
+        self._ui.lineEditMemoryLimit.setText(config.get('memoryLimit', ''))
         self._ui.comboBoxExportType.setCurrentText(config['exportType'])
         self._ui.lineEditSplitMaxSize.setText(config.get('splitSize', '18 MiB'))
         self._ui.checkBoxSplitWebGLOutput.setChecked(config.get('splitFiles', False))
         self._ui.lineEditCombineMaxSize.setText(config.get('combineSize', '703 KiB'))
         self._ui.checkBoxCombineWebGLOutput.setChecked(config.get('combineFiles', False))
+        self._ui.spinBoxWorkers.setValue(config.get('workers', 1))
+        self._ui.comboBoxOutputFormat.setCurrentText(config.get('outputFormat', 'json'))
+        self._ui.checkBoxCompressWebGLOutput.setChecked(config.get('compressFiles', False))
+        self._ui.lineEditSignificantDigits.setText(config.get('significantDigits', ''))
+        self._ui.spinBoxQuantizationBits.setValue(config.get('quantizationBits', 0))
+        self._ui.comboBoxSplitOrder.setCurrentText(config.get('splitOrder', 'faces'))
+        self._ui.spinBoxMaxVerticesPerChunk.setValue(config.get('maxVerticesPerChunk', 0))
+        self._ui.checkBoxCacheResults.setChecked(config.get('cacheResults', False))
+        self._ui.lineEditCacheMaxSize.setText(config.get('cacheSize', '1 GiB'))
+        self._ui.spinBoxCacheMaxAge.setValue(config.get('cacheMaxAge', 30))
+        self._ui.checkBoxStageReport.setChecked(config.get('stageReport', False))
         self._ui.spinBoxWidth.setValue(config.get('width', 512))
         self._ui.spinBoxHeight.setValue(config.get('height', 512))
         if 'outputDir' in config:
@@ -160,6 +192,10 @@ class ConfigureDialog(QtWidgets.QDialog):
         if 'previous_location' in config:
             self._previousLocation = os.path.join(self._workflow_location, config['previous_location'])
 
+    def _clear_cache_clicked(self):
+        if self._directory_valid():
+            ExportCache(output_location(self._output_location(), self._workflow_location)).invalidate()
+
     def _directory_chooser_clicked(self):
         # Second parameter returned is the filter chosen
         location = QtWidgets.QFileDialog.getExistingDirectory(self, 'Select Destination for export', self._previousLocation)
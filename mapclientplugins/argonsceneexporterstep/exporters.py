@@ -0,0 +1,151 @@
+"""
+Registry of the exporter for each export type.
+
+The cmlibs.exporter backends are imported the first time an export of their
+type is made, so loading the plugin does not pay for all of them.  Other
+packages can add export types with an entry point in ENTRY_POINT_GROUP named
+after the export type.  The entry point is a factory called with the output
+directory and the step configuration that returns an exporter with
+set_document, set_parameters and export methods.  Entry points cannot replace
+the export types listed in EXPORTERS.
+"""
+import importlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from importlib.metadata import entry_points
+
+ENTRY_POINT_GROUP = 'mapclientplugins.argonsceneexporterstep.exporters'
+TIME_STEPS_DIRECTORY_PREFIX = '.time_steps_'
+
+
+def _exporter(exporter_class, output_dir, config):
+    return exporter_class(output_dir)
+
+
+def _webgl_exporter(exporter_class, output_dir, config):
+    exporter = exporter_class(output_dir)
+    exporter.setLoD(config.get('LODs', False))
+    return exporter
+
+
+def _image_exporter(exporter_class, output_dir, config):
+    return exporter_class(config['width'], config['height'], output_dir)
+
+
+# Export type to the module of its ArgonSceneExporter and the function creating it.
+EXPORTERS = {
+    'flatmapsvg': ('cmlibs.exporter.flatmapsvg', _exporter),
+    'image': ('cmlibs.exporter.image', _image_exporter),
+    'mbfxml': ('cmlibs.exporter.mbfxml', _exporter),
+    'stl': ('cmlibs.exporter.stl', _exporter),
+    'thumbnail': ('cmlibs.exporter.thumbnail', _exporter),
+    'vtk': ('cmlibs.exporter.vtk', _exporter),
+    'wavefront': ('cmlibs.exporter.wavefront', _exporter),
+    'webgl': ('cmlibs.exporter.webgl', _webgl_exporter),
+}
+
+_factories = {}
+_discovered = None
+
+
+def discovered_exporters():
+    """
+    The entry points of the export types added by other packages, by export type.
+    The entry points are looked up once and only loaded when they are used.
+    """
+    global _discovered
+    if _discovered is None:
+        found = entry_points()
+        group = found.select(group=ENTRY_POINT_GROUP) if hasattr(found, 'select') else found.get(ENTRY_POINT_GROUP, [])
+        _discovered = {entry_point.name: entry_point for entry_point in group if entry_point.name not in EXPORTERS}
+    return _discovered
+
+
+def export_types():
+    """
+    The export types of EXPORTERS followed by those added by other packages.
+    """
+    return list(EXPORTERS) + sorted(discovered_exporters())
+
+
+def exporter_factory(export_type):
+    """
+    The factory of the exporter for export_type, importing it the first time.
+    """
+    if export_type not in _factories:
+        if export_type in EXPORTERS:
+            module_name, create = EXPORTERS[export_type]
+            _factories[export_type] = partial(create, importlib.import_module(module_name).ArgonSceneExporter)
+        elif export_type in discovered_exporters():
+            _factories[export_type] = discovered_exporters()[export_type].load()
+        else:
+            raise NotImplementedError('Current export type selection is not implemented.')
+    return _factories[export_type]
+
+
+def create_exporter(export_type, output_dir, config):
+    """
+    Create the exporter for export_type writing to output_dir, configured from the step config.
+    """
+    return exporter_factory(export_type)(output_dir, config)
+
+
+def _export_time_step_slice(document_state, export_type, output_dir, config, parameters):
+    """
+    Load the document from document_state and export it with parameters to output_dir,
+    in a worker process.  Returns the metadata file written.
+    """
+    from cmlibs.argon.argondocument import ArgonDocument
+
+    document = ArgonDocument()
+    document.initialiseVisualisationContents()
+    document.deserialize(document_state)
+    exporter = create_exporter(export_type, output_dir, config)
+    exporter.set_document(document)
+    exporter.set_parameters(parameters)
+    exporter.export()
+    return exporter.metadata_file()
+
+
+def export_time_steps(document_state, export_type, output_dir, config, parameters, workers, progress=None):
+    """
+    Export the time steps given by parameters in slices with up to workers processes,
+    each loading the document from document_state, then merge the slices into one
+    export in output_dir, see splitter.time_steps.  The workers are started fresh
+    rather than forked, as the document holds Zinc and Qt state.  When progress is
+    given it is called with the number of slices done out of the total, it may raise
+    an exception to stop slices that have not started.  Returns the metadata file.
+    """
+    from mapclientplugins.argonsceneexporterstep.splitter.time_steps import merge_time_step_exports, time_step_slices
+
+    slices = time_step_slices(parameters["numberOfTimeSteps"], parameters["initialTime"], parameters["finishTime"], workers)
+    slices_dir = tempfile.mkdtemp(prefix=TIME_STEPS_DIRECTORY_PREFIX, dir=output_dir)
+    try:
+        meta_files = [None] * len(slices)
+        if progress is not None:
+            progress(0, len(slices), 0)
+        with ProcessPoolExecutor(max_workers=len(slices), mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {}
+            for index, (_, number_of_time_steps, initial_time, finish_time) in enumerate(slices):
+                slice_parameters = dict(parameters, numberOfTimeSteps=number_of_time_steps, initialTime=initial_time, finishTime=finish_time)
+                slice_dir = os.path.join(slices_dir, f"slice_{index}")
+                os.makedirs(slice_dir)
+                futures[executor.submit(_export_time_step_slice, document_state, export_type, slice_dir, config, slice_parameters)] = index
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    meta_files[futures[future]] = future.result()
+                    if progress is not None:
+                        progress(done, len(slices), 0)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return merge_time_step_exports(meta_files, slices, output_dir, workers)
+    finally:
+        shutil.rmtree(slices_dir, ignore_errors=True)
@@ -0,0 +1,167 @@
+"""
+Binary form of threejs JSON resources.
+
+A binary resource is written as a small JSON header and a little-endian .bin
+file next to it.  Every non-empty array of numbers in the resource is moved
+into the .bin file, floats as Float32 and non-negative integers (face masks and
+indices) as Uint16 or Uint32, and replaced in the header by an accessor:
+
+    {"typedArray": "Float32", "byteOffset": 0, "length": 3}
+
+The header records the .bin file it uses under the "binary" key.  Clients can
+map each accessor straight into a typed array.  A combination file is a JSON
+list of headers that all use one shared .bin file.
+"""
+import json
+import os
+import sys
+
+from array import array
+
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import write_json
+
+BINARY_EXTENSION = '.bin'
+# Typed array names to array module type codes.
+TYPED_ARRAYS = {
+    'Uint16': 'H',
+    'Uint32': 'I',
+    'Int32': 'i',
+    'Float32': 'f',
+}
+TYPED_ARRAY_KEY = 'typedArray'
+BINARY_KEY = 'binary'
+ALIGNMENT = 4
+
+
+def binary_url(url):
+    """
+    The URL of the .bin file that goes with the header at url.
+    """
+    base_name, _ = os.path.splitext(url)
+    return f"{base_name}{BINARY_EXTENSION}"
+
+
+def is_binary_header(content):
+    return isinstance(content, dict) and BINARY_KEY in content
+
+
+def _typed_array_name(values):
+    """
+    The typed array that can hold the values, or None if the values
+    are not all numbers or do not fit a typed array.
+    """
+    if all(type(value) is int for value in values):
+        smallest = min(values)
+        largest = max(values)
+        if smallest >= 0 and largest < 2 ** 16:
+            return 'Uint16'
+        if smallest >= 0 and largest < 2 ** 32:
+            return 'Uint32'
+        if smallest >= -2 ** 31 and largest < 2 ** 31:
+            return 'Int32'
+        return None
+
+    if all(type(value) in (int, float) for value in values):
+        return 'Float32'
+
+    return None
+
+
+class _BufferWriter(object):
+    """
+    Collects typed arrays into one buffer, keeping each array aligned.
+    """
+
+    def __init__(self, fh):
+        self._fh = fh
+        self.byte_length = 0
+
+    def add(self, values):
+        name = _typed_array_name(values)
+        if name is None:
+            return None
+
+        padding = -self.byte_length % ALIGNMENT
+        if padding:
+            self._fh.write(b'\0' * padding)
+            self.byte_length += padding
+
+        typed_values = array(TYPED_ARRAYS[name], values)
+        if sys.byteorder != 'little':
+            typed_values.byteswap()
+
+        accessor = {TYPED_ARRAY_KEY: name, "byteOffset": self.byte_length, "length": len(typed_values)}
+        typed_values.tofile(self._fh)
+        self.byte_length += len(typed_values) * typed_values.itemsize
+        return accessor
+
+
+def _externalise(value, buffer):
+    if isinstance(value, dict):
+        return {key: _externalise(item, buffer) for key, item in value.items()}
+    if isinstance(value, list) and len(value):
+        accessor = buffer.add(value)
+        if accessor is not None:
+            return accessor
+        return [_externalise(item, buffer) for item in value]
+    return value
+
+
+def _internalise(value, data):
+    if isinstance(value, dict):
+        if TYPED_ARRAY_KEY in value:
+            typed_values = array(TYPED_ARRAYS[value[TYPED_ARRAY_KEY]])
+            start = value["byteOffset"]
+            typed_values.frombytes(data[start:start + value["length"] * typed_values.itemsize])
+            if sys.byteorder != 'little':
+                typed_values.byteswap()
+            return typed_values.tolist()
+        return {key: _internalise(item, data) for key, item in value.items() if key != BINARY_KEY}
+    if isinstance(value, list):
+        return [_internalise(item, data) for item in value]
+    return value
+
+
+def write_binary_resources(header_file, resources):
+    """
+    Write the resources as headers in header_file sharing one .bin file.
+    If resources is a dict a single header is written, otherwise a list of headers.
+    Returns the URL of the .bin file relative to the header.
+    """
+    bin_url = binary_url(os.path.basename(header_file))
+    with open(os.path.join(os.path.dirname(header_file), bin_url), 'wb') as fh:
+        buffer = _BufferWriter(fh)
+        if isinstance(resources, dict):
+            headers = _externalise(resources, buffer)
+        else:
+            headers = [_externalise(resource, buffer) for resource in resources]
+
+    binary = {"URL": bin_url, "byteLength": buffer.byte_length}
+    if isinstance(headers, dict):
+        headers = {BINARY_KEY: binary, **headers}
+    else:
+        headers = [{BINARY_KEY: binary, **header} for header in headers]
+
+    write_json(header_file, headers)
+
+    return bin_url
+
+
+def read_binary_resources(header_file):
+    """
+    Read a header written by write_binary_resources back into the JSON form,
+    with Float32 values converted back to Python floats.
+    """
+    with open(header_file) as f:
+        headers = json.load(f)
+
+    buffers = {}
+    resources = []
+    for header in (headers if isinstance(headers, list) else [headers]):
+        bin_url = header[BINARY_KEY]["URL"]
+        if bin_url not in buffers:
+            with open(os.path.join(os.path.dirname(header_file), bin_url), 'rb') as fh:
+                buffers[bin_url] = fh.read()
+        resources.append(_internalise(header, buffers[bin_url]))
+
+    return resources if isinstance(headers, list) else resources[0]
@@ -0,0 +1,161 @@
+"""
+Memory budget of the split and combine stages of an export.
+
+The memory a task needs is estimated from the size of its files.  A resource
+split in memory is parsed into Python objects, measured on synthetic scenes
+at 6.3 to 6.7 times the size of the file for surfaces and lines and about 5
+times for glyphs, whichever engine splits it.  A resource split by streaming
+it holds one chunk at a time that way, along with read buffers and the memory
+mapped arrays it gathers from.  Each task run in a worker process also pays
+for the process.
+
+With a budget a resource is only split in memory when its estimate fits, and
+tasks only start while the estimates of the tasks running add up to no more
+than what is left of the budget, see json_resource.run_tasks.  Idle worker
+processes use memory too, so there are only as many as the budget allows.
+The estimates are not a hard limit, so with a budget the peak memory used is
+measured with MemorySampler and reported.
+"""
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+IN_MEMORY_FACTOR = 7
+STREAMING_OVERHEAD = 1024 * 1024 * 64
+WORKER_OVERHEAD = 1024 * 1024 * 48
+# Seconds between samples of the resident set size.
+SAMPLE_INTERVAL = 0.05
+
+_PROC_DIR = "/proc"
+
+
+def in_memory_footprint(size):
+    """
+    The estimated memory used to process a resource of size bytes in memory.
+    """
+    return IN_MEMORY_FACTOR * size
+
+
+def streaming_footprint(file_size_limit):
+    """
+    The estimated memory used to split a resource by streaming it into files of up to file_size_limit bytes.
+    """
+    return STREAMING_OVERHEAD + IN_MEMORY_FACTOR * file_size_limit
+
+
+def fits_budget(footprint, memory_budget):
+    """
+    True if a task with footprint fits in memory_budget in a worker process, or there is no budget.
+    """
+    return memory_budget is None or footprint + WORKER_OVERHEAD <= memory_budget
+
+
+def task_footprint(footprint):
+    """
+    The memory a task with footprint is counted as using from the budget while it runs.
+    """
+    return footprint + WORKER_OVERHEAD
+
+
+def remaining_budget(memory_budget):
+    """
+    What is left of memory_budget once the memory this process and its worker
+    processes already use is taken off it.
+    """
+    return memory_budget - (_resident_sizes() or 0)
+
+
+def _resident_sizes():
+    """
+    The resident set size in bytes of this process and every process descended from
+    it, or None where the platform does not report them.
+    """
+    try:
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        parents = {}
+        for name in os.listdir(_PROC_DIR):
+            if name.isdigit():
+                try:
+                    with open(os.path.join(_PROC_DIR, name, "stat")) as f:
+                        # The command may hold spaces, the fields after it do not.
+                        parents[int(name)] = int(f.read().rsplit(')', 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    pass
+    except (OSError, ValueError, AttributeError):
+        return None
+
+    family = {os.getpid()}
+    found = True
+    while found:
+        found = False
+        for pid, parent in parents.items():
+            if parent in family and pid not in family:
+                family.add(pid)
+                found = True
+
+    total = 0
+    for pid in family:
+        try:
+            with open(os.path.join(_PROC_DIR, str(pid), "statm")) as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+def _own_peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemorySampler(object):
+    """
+    Context manager sampling the total resident set size of this process and its
+    worker processes on a thread, peak is the largest total seen once it exits.
+    Where the platform does not report the sizes of processes peak is the peak of
+    this process alone, over its whole life.  When it is not enabled nothing is
+    sampled and peak stays None, pass enabled=memory_budget is not None to only
+    pay for the sampling when there is a budget to report against.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, enabled=True):
+        self._interval = interval
+        self._enabled = enabled
+        self._stop = threading.Event()
+        self._thread = None
+        self.peak = None
+
+    def _sample(self):
+        size = _resident_sizes()
+        if size is not None and (self.peak is None or size > self.peak):
+            self.peak = size
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self._sample()
+
+    def __enter__(self):
+        if not self._enabled:
+            return self
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._enabled:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        if self.peak is None:
+            self.peak = _own_peak_rss()
+        return False
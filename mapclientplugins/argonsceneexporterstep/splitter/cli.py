@@ -0,0 +1,225 @@
+"""
+Command line post-processing of webGL exports.
+
+Splits, combines and reports on the webGL exports named by any number of
+metadata files or glob patterns, without the MAP Client.  Exports are
+processed by a pool of jobs processes, each export using up to workers
+processes of its own, and a JSON summary of every export is printed once
+they are all done.  Sizes are given as for the step, 18 MiB, 703 KiB etc.
+
+    argon-webgl-output split -s "18 MiB" -d "exports/*/*_metadata.json"
+    argon-webgl-output pipeline --split-size "18 MiB" --combine-size "703 KiB" -j 4 "exports/**/*_metadata.json"
+    argon-webgl-output stats "exports/*/*_metadata.json"
+
+With --memory-budget the budget is shared equally between the jobs, and the
+summary of each export has the peak memory it used, see splitter.budget.
+
+The exit status is 1 if any export failed, the summary has the error.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from mapclientplugins.argonsceneexporterstep.splitter.budget import MemorySampler
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import (
+    ENGINES, ENGINE_AUTO, FILE_SIZE_LIMIT, MAX_UINT16_VERTICES, MEMORY_LIMIT, OUTPUT_FORMATS, OUTPUT_FORMAT_JSON, SPLIT_ORDERS,
+    SPLIT_ORDER_FACES, combine_webgl_output, compress_webgl_output, deduplicate_webgl_output_frames,
+    reduce_webgl_output_precision, run_tasks, split_webgl_output, webgl_output_statistics)
+from mapclientplugins.argonsceneexporterstep.splitter.precision import parse_significant_digits
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+COMMAND_SPLIT = "split"
+COMMAND_COMBINE = "combine"
+COMMAND_PIPELINE = "pipeline"
+COMMAND_STATS = "stats"
+COMBINE_SIZE_LIMIT = 703 * 1024
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+
+def _size(text):
+    size = convert_to_bytes(text)
+    if size == -1:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}', expected a number and a unit from B, KiB, MiB, GiB, TiB")
+    return size
+
+
+def _significant_digits(text):
+    try:
+        return parse_significant_digits(text)
+    except Exception as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _processes(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"invalid number of processes '{text}'")
+    return value if value > 0 else None
+
+
+def metadata_files(patterns):
+    """
+    The metadata files matching the glob patterns, in order without repeats.  A
+    pattern that matches nothing is kept, so that it is reported as missing.
+    """
+    files = {}
+    for pattern in patterns:
+        for file_name in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+            files.setdefault(file_name, None)
+    return list(files)
+
+
+def process_export(command, meta_file, options):
+    """
+    Run command on the webGL export of meta_file, returns the summary of the export.
+    Errors are reported in the summary rather than raised.
+    """
+    summary = {"metadata": meta_file, "status": STATUS_OK}
+    start = time.perf_counter()
+    try:
+        statistics = webgl_output_statistics(meta_file)
+        if command == COMMAND_STATS:
+            summary["statistics"] = statistics
+        else:
+            summary["before"] = statistics
+            workers = options["workers"]
+            memory_budget = options["memory_budget"]
+            with MemorySampler(enabled=memory_budget is not None) as sampler:
+                if command in [COMMAND_SPLIT, COMMAND_PIPELINE]:
+                    if options["digits"] or options["quantize_bits"]:
+                        report = reduce_webgl_output_precision(meta_file, options["digits"], options["quantize_bits"], options["memory_limit"],
+                                                               workers)
+                        summary["precision"] = report["totals"]
+                    if options["morph_tolerance"] is not None:
+                        report = deduplicate_webgl_output_frames(meta_file, options["morph_tolerance"], options["memory_limit"], workers)
+                        summary["morph_frames"] = report["totals"]
+                    split_webgl_output(meta_file, options["split_size"], options["delete"], options["memory_limit"], options["engine"],
+                                       workers, options["format"], options["order"], options["max_vertices"], memory_budget=memory_budget)
+                if command in [COMMAND_COMBINE, COMMAND_PIPELINE]:
+                    summary["packing"] = combine_webgl_output(meta_file, options["combine_size"], options["delete"], workers,
+                                                              options["format"], memory_budget=memory_budget)
+                if options["compress"]:
+                    summary["compression"] = compress_webgl_output(meta_file, workers)["totals"]
+            summary["memory"] = {"budget": memory_budget, "peak_rss": sampler.peak}
+            summary["after"] = webgl_output_statistics(meta_file)
+    except Exception as e:
+        summary["status"] = STATUS_ERROR
+        summary["error"] = f"{type(e).__name__}: {e}"
+
+    summary["wall_time"] = time.perf_counter() - start
+    return summary
+
+
+def run_command(command, patterns, options, jobs=1):
+    """
+    Run command on the exports of the metadata files matching patterns with up to
+    jobs exports at a time, set jobs to None for one for each CPU.  Returns the
+    summary of each export and the totals over all of them.
+    """
+    start = time.perf_counter()
+    files = metadata_files(patterns)
+
+    def _progress(index, summary):
+        print(f"[{index + 1}/{len(files)}] {summary['status']} {summary['metadata']}", file=sys.stderr)
+
+    summaries = run_tasks(process_export, [(command, meta_file, options) for meta_file in files], jobs, _progress)
+    succeeded = [summary for summary in summaries if summary["status"] == STATUS_OK]
+    totals = {
+        "exports": len(summaries),
+        "succeeded": len(succeeded),
+        "failed": len(summaries) - len(succeeded),
+        "wall_time": time.perf_counter() - start,
+    }
+    if command == COMMAND_STATS:
+        totals["bytes"] = sum(summary["statistics"]["bytes"] for summary in succeeded)
+        totals["files"] = sum(summary["statistics"]["files"] for summary in succeeded)
+    else:
+        totals["bytes_before"] = sum(summary["before"]["bytes"] for summary in succeeded)
+        totals["bytes_after"] = sum(summary["after"]["bytes"] for summary in succeeded)
+        totals["files_before"] = sum(summary["before"]["files"] for summary in succeeded)
+        totals["files_after"] = sum(summary["after"]["files"] for summary in succeeded)
+        totals["peak_rss"] = max([summary["memory"]["peak_rss"] or 0 for summary in succeeded], default=0)
+
+    return {"command": command, "exports": summaries, "totals": totals}
+
+
+def _parse_arguments(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("metadata", nargs="+", help="WebGL metadata files or glob patterns, ** matches any directories")
+    common.add_argument("-j", "--jobs", type=_processes, default=1, help="Number of exports processed at a time, 0 for one per CPU")
+    common.add_argument("-w", "--workers", type=_processes, default=1, help="Number of processes used for each export, 0 for one per CPU")
+    common.add_argument("--summary", help="Write the JSON summary to this file rather than printing it")
+
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("-d", "--delete", action="store_true", help="Delete files that are split or combined", default=False)
+    output.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT_JSON, help="Format to write files in")
+    output.add_argument("-c", "--compress", action="store_true", help="Write pre-compressed sidecars of the output files", default=False)
+    output.add_argument("-b", "--memory-budget", type=_size,
+                        help="Memory all the exports processed at a time may use, shared between the jobs, files are streamed "
+                             "and processed at the same time to fit it")
+
+    split = argparse.ArgumentParser(add_help=False)
+    split.add_argument("-e", "--engine", choices=ENGINES, default=ENGINE_AUTO, help="Engine used to split surfaces and lines")
+    split.add_argument("-o", "--order", choices=SPLIT_ORDERS, default=SPLIT_ORDER_FACES,
+                       help="Order surfaces and lines are split in, morton orders faces spatially and lists bounding boxes")
+    split.add_argument("-v", "--max-vertices", type=int,
+                       help=f"Maximum number of vertices in a split file of surfaces or lines, {MAX_UINT16_VERTICES} for 16 bit indices")
+    split.add_argument("-m", "--memory-limit", type=_size, default=MEMORY_LIMIT, help="Size above which files are split by streaming them")
+    split.add_argument("-p", "--digits", type=_significant_digits, help="Significant digits for each attribute before splitting, 'vertices=6, normals=3' etc.")
+    split.add_argument("-q", "--quantize-bits", type=int, help="Quantize positions to integers with this many bits before splitting")
+    split.add_argument("-t", "--morph-tolerance", type=float,
+                       help="Keep each distinct morph frame once before splitting, frames within this tolerance are the same, 0 for equal frames")
+
+    parser = argparse.ArgumentParser(prog="argon-webgl-output", description="Post-process webGL exports without the MAP Client.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser(COMMAND_SPLIT, parents=[common, output, split], help="Split big resources")
+    command.add_argument("-s", "--size", dest="split_size", type=_size, default=FILE_SIZE_LIMIT, help="Size limit of split files")
+    command = commands.add_parser(COMMAND_COMBINE, parents=[common, output], help="Combine small resources")
+    command.add_argument("-s", "--size", dest="combine_size", type=_size, default=COMBINE_SIZE_LIMIT, help="Size limit of combined files")
+    command = commands.add_parser(COMMAND_PIPELINE, parents=[common, output, split], help="Split big resources then combine small resources")
+    command.add_argument("--split-size", type=_size, default=FILE_SIZE_LIMIT, help="Size limit of split files")
+    command.add_argument("--combine-size", type=_size, default=COMBINE_SIZE_LIMIT, help="Size limit of combined files")
+    commands.add_parser(COMMAND_STATS, parents=[common], help="Report the resources and files of exports")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_arguments(argv)
+    options = {
+        "workers": args.workers,
+        "split_size": getattr(args, "split_size", None),
+        "combine_size": getattr(args, "combine_size", None),
+        "delete": getattr(args, "delete", False),
+        "format": getattr(args, "format", OUTPUT_FORMAT_JSON),
+        "compress": getattr(args, "compress", False),
+        "engine": getattr(args, "engine", ENGINE_AUTO),
+        "order": getattr(args, "order", SPLIT_ORDER_FACES),
+        "max_vertices": getattr(args, "max_vertices", None),
+        "memory_limit": getattr(args, "memory_limit", MEMORY_LIMIT),
+        "digits": getattr(args, "digits", None),
+        "quantize_bits": getattr(args, "quantize_bits", None),
+        "morph_tolerance": getattr(args, "morph_tolerance", None),
+        "memory_budget": None,
+    }
+
+    memory_budget = getattr(args, "memory_budget", None)
+    if memory_budget is not None:
+        options["memory_budget"] = memory_budget // (args.jobs or os.cpu_count() or 1)
+    result = run_command(args.command, args.metadata, options, args.jobs)
+    text = json.dumps(result, sort_keys=True, indent=2)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    return 1 if result["totals"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
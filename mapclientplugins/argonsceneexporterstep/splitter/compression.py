@@ -0,0 +1,109 @@
+"""
+Pre-compressed sidecars for exported files.
+
+Each file is compressed to a .gz sidecar, and to a .br sidecar when the brotli
+package is installed, so that a web server can send the compressed form
+directly.  A sidecar is only kept when it is sufficiently smaller than the
+file it is made from.
+"""
+import gzip
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODING_GZIP = "gzip"
+ENCODING_BROTLI = "br"
+SIDECAR_EXTENSIONS = {
+    ENCODING_GZIP: ".gz",
+    ENCODING_BROTLI: ".br",
+}
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+# A sidecar must save at least this fraction of the file to be kept.
+MINIMUM_SAVING = 0.1
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def available_encodings():
+    encodings = [ENCODING_GZIP]
+    if brotli is not None:
+        encodings.append(ENCODING_BROTLI)
+    return encodings
+
+
+def sidecar_file(file_name, encoding):
+    return f"{file_name}{SIDECAR_EXTENSIONS[encoding]}"
+
+
+class _BrotliWriter(object):
+    """
+    File like wrapper that brotli compresses everything written to it.
+    """
+
+    def __init__(self, fh):
+        self._fh = fh
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def write(self, data):
+        self._fh.write(self._compressor.process(data))
+
+    def close(self):
+        self._fh.write(self._compressor.finish())
+
+
+def _compress_to(file_name, compressed_file, encoding):
+    with open(file_name, 'rb') as source, open(compressed_file, 'wb') as destination:
+        if encoding == ENCODING_GZIP:
+            # A fixed mtime and no file name keep the output the same for the same input.
+            writer = gzip.GzipFile(filename='', mode='wb', compresslevel=GZIP_LEVEL, fileobj=destination, mtime=0)
+        else:
+            writer = _BrotliWriter(destination)
+        shutil.copyfileobj(source, writer, COPY_BLOCK_SIZE)
+        writer.close()
+
+
+def compress_file(file_name, encodings=None, minimum_saving=MINIMUM_SAVING):
+    """
+    Write a sidecar of file_name for each of the encodings, by default every
+    available encoding.  A sidecar that does not save at least minimum_saving
+    of the size of the file is removed, along with any sidecar left by an
+    earlier run.
+    Returns a dict with the size of the file and the size of each sidecar
+    written, None for sidecars that were not kept.
+    """
+    if encodings is None:
+        encodings = available_encodings()
+
+    size = os.path.getsize(file_name)
+    result = {"size": size}
+    for encoding in encodings:
+        compressed_file = sidecar_file(file_name, encoding)
+        temporary_file = f"{compressed_file}.tmp"
+        _compress_to(file_name, temporary_file, encoding)
+        compressed_size = os.path.getsize(temporary_file)
+        if compressed_size <= size * (1 - minimum_saving):
+            os.replace(temporary_file, compressed_file)
+            result[encoding] = compressed_size
+        else:
+            os.remove(temporary_file)
+            if os.path.exists(compressed_file):
+                os.remove(compressed_file)
+            result[encoding] = None
+
+    return result
+
+
+def compression_totals(files_report, encodings):
+    """
+    Sum a report of compress_file results by file into the bytes sent for each encoding,
+    counting the uncompressed size for files without a sidecar.
+    """
+    totals = {"files": len(files_report), "size": sum(entry["size"] for entry in files_report.values())}
+    for encoding in encodings:
+        totals[encoding] = sum(entry["size"] if entry.get(encoding) is None else entry[encoding]
+                               for entry in files_report.values())
+    return totals
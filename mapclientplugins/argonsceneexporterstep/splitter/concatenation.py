@@ -0,0 +1,109 @@
+"""
+Combination of JSON resources without parsing them.
+
+A combination file is a JSON list of resources.  Rather than loading every
+resource and serialising the list again, the bytes of each resource are
+copied straight into the combination file between the list brackets and
+separators.  Copies are made in the kernel with copy_file_range or sendfile
+where the platform has them, so memory use does not grow with the size or
+number of resources.
+"""
+import json
+import os
+
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import ITEM_SEPARATOR, serialise_json
+
+COPY_BLOCK_SIZE = 1024 * 1024 * 8
+# Bytes read from each end of a resource to find and check its JSON value.
+PROBE_SIZE = 4096
+
+_WHITESPACE = b' \t\n\r'
+_CLOSING = {b'{': b'}', b'[': b']'}
+
+
+def _value_range(fd, file_size):
+    """
+    Find the JSON object or array in the file, ignoring surrounding whitespace.
+    Returns the offset and length of the value, or None if the file does not
+    hold an object or array.
+    """
+    head = os.pread(fd, min(PROBE_SIZE, file_size), 0).lstrip(_WHITESPACE)
+    tail_size = min(PROBE_SIZE, file_size)
+    tail = os.pread(fd, tail_size, file_size - tail_size).rstrip(_WHITESPACE)
+    if not head or not tail or _CLOSING.get(head[:1]) != tail[-1:]:
+        return None
+
+    start = min(PROBE_SIZE, file_size) - len(head)
+    end = file_size - (tail_size - len(tail))
+    if end <= start:
+        return None
+
+    return start, end - start
+
+
+def _copy_range(source_fd, destination_fd, offset, count):
+    while count > 0:
+        block_size = min(count, COPY_BLOCK_SIZE)
+        copied = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                copied = os.copy_file_range(source_fd, destination_fd, block_size, offset)
+            except OSError:
+                pass
+        if copied == 0:
+            # Some file systems do not support copy_file_range, or report no bytes copied.
+            copied = _send_range(source_fd, destination_fd, offset, block_size)
+
+        if copied == 0:
+            raise Exception(f"Unexpected end of file after {offset} bytes while combining resources.")
+        offset += copied
+        count -= copied
+
+
+def _send_range(source_fd, destination_fd, offset, count):
+    if hasattr(os, 'sendfile'):
+        try:
+            return os.sendfile(destination_fd, source_fd, offset, count)
+        except OSError:
+            pass
+
+    data = os.pread(source_fd, count, offset)
+    _write_all(destination_fd, data)
+    return len(data)
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while len(view):
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def concatenate_json_resources(resource_files, combination_file):
+    """
+    Write the resources in resource_files to combination_file as a JSON list.
+    The bytes of each resource are copied without being parsed.  A resource
+    that does not start and end like a JSON object or array is parsed and
+    written again, so invalid JSON is still reported.
+    """
+    destination_fd = os.open(combination_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        _write_all(destination_fd, b'[')
+        for index, resource_file in enumerate(resource_files):
+            if index:
+                _write_all(destination_fd, ITEM_SEPARATOR.encode())
+
+            source_fd = os.open(resource_file, os.O_RDONLY)
+            try:
+                value_range = _value_range(source_fd, os.fstat(source_fd).st_size)
+                if value_range is None:
+                    with open(resource_file) as f:
+                        _write_all(destination_fd, serialise_json(json.load(f)))
+                else:
+                    _copy_range(source_fd, destination_fd, *value_range)
+            finally:
+                os.close(source_fd)
+
+        _write_all(destination_fd, b']')
+    finally:
+        os.close(destination_fd)
@@ -0,0 +1,164 @@
+"""
+Deduplication of the morph frames of time varying threejs resources.
+
+A time varying resource holds a morph entry for every time step, but often
+the entries of an attribute repeat, all of them when the attribute does not
+change over time.  Each distinct entry is kept once and a table of the entry
+used at each time step is added under the key given in
+THREEJS_MORPH_FRAME_KEYS, so time step i of morphTargets is
+morphTargets[morphTargetFrames[i]].  The table is copied into every chunk the
+resource is split into, like the metadata.
+
+With a tolerance entries are also shared when every value is within the
+tolerance of the entry kept, so no value moves by more than the tolerance.
+Resources are rewritten a block of values at a time, see rewriting.py, and
+a resource with no repeated entries is left as it is.
+"""
+import hashlib
+import json
+import math
+import os
+
+from mapclientplugins.argonsceneexporterstep.splitter.rewriting import Reduction, attribute_of, value_blocks, write_object
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import read_json
+from mapclientplugins.argonsceneexporterstep.splitter.streaming import spooled_resource
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import THREEJS_MORPH_ATTRIBUTES, THREEJS_MORPH_FRAME_KEYS
+
+
+def _frame_digest(values, tolerance):
+    """
+    A digest of the values that is the same for equal values, or with a tolerance
+    for values that round to the same multiples of the tolerance.
+    """
+    digest = hashlib.sha1()
+    for block in value_blocks(values):
+        if tolerance:
+            block = [math.floor(value / tolerance + 0.5) if math.isfinite(value) else value for value in block]
+        digest.update(json.dumps(block).encode())
+    return len(values), digest.hexdigest()
+
+
+def _difference(values, other):
+    """
+    The largest absolute difference between values and other, infinite if they cannot be compared.
+    """
+    if len(values) != len(other):
+        return math.inf
+
+    difference = 0.0
+    for block, other_block in zip(value_blocks(values), value_blocks(other)):
+        for a, b in zip(block, other_block):
+            if a != b:
+                if not (math.isfinite(a) and math.isfinite(b)):
+                    return math.inf
+                difference = max(difference, abs(a - b))
+    return difference
+
+
+def unique_frames(entries, attribute, tolerance=0.0):
+    """
+    The indices of the distinct morph entries of the attribute, and the index in
+    them of the entry for each time step, along with the largest difference of an
+    entry from the entry it is replaced by.  An entry is compared with the entry
+    of the previous time step first, as time steps that repeat are often in runs.
+    """
+    kept = []
+    digests = {}
+    frames = []
+    max_error = 0.0
+    for entry in entries:
+        values = entry.get(attribute, [])
+        digest = _frame_digest(values, tolerance)
+        candidates = [frames[-1]] if frames else []
+        if digest in digests and digests[digest] not in candidates:
+            candidates.append(digests[digest])
+
+        frame = None
+        for candidate in candidates:
+            difference = _difference(values, entries[kept[candidate]].get(attribute, []))
+            if difference <= tolerance:
+                frame = candidate
+                max_error = max(max_error, difference)
+                break
+
+        if frame is None:
+            frame = len(kept)
+            kept.append(len(frames))
+            digests.setdefault(digest, frame)
+        frames.append(frame)
+
+    return kept, frames, max_error
+
+
+def _deduplicate_content(content, tolerance):
+    """
+    The top level items of the content with the morph frames deduplicated, or None
+    if no morph entries repeat.  Returns the items, the frames before and after for
+    each morph key, and the largest change to a value.
+    """
+    items = []
+    frame_counts = {}
+    max_error = 0.0
+    for key, value in content.items():
+        if key in THREEJS_MORPH_FRAME_KEYS.values():
+            continue
+        items.append((key, value))
+        if key not in THREEJS_MORPH_ATTRIBUTES or not len(value):
+            continue
+
+        frame_key = THREEJS_MORPH_FRAME_KEYS[key]
+        kept, frames, error = unique_frames(value, THREEJS_MORPH_ATTRIBUTES[key], tolerance)
+        if frame_key in content:
+            frames = [frames[frame] for frame in content[frame_key]]
+        frame_counts[key] = [len(value), len(kept)]
+        if len(kept) < len(value):
+            items[-1] = (key, [value[index] for index in kept])
+            max_error = max(max_error, error)
+        if len(kept) < len(value) or frame_key in content:
+            items.append((frame_key, frames))
+
+    if all(before == after for before, after in frame_counts.values()):
+        return None, frame_counts, max_error
+
+    return items, frame_counts, max_error
+
+
+def _write_deduplicated(content, output_file, tolerance):
+    if not isinstance(content, dict) or "GlyphGeometriesURL" in content:
+        return None, {}, 0.0
+
+    items, frame_counts, max_error = _deduplicate_content(content, tolerance)
+    if items is not None:
+        with open(output_file, 'w') as fh:
+            write_object(fh, [(key, value, attribute_of(key, False)) for key, value in items], Reduction({}, None))
+
+    return items, frame_counts, max_error
+
+
+def deduplicate_resource_frames(resource_file, tolerance=0.0, streaming=False):
+    """
+    Rewrite the resource in resource_file with each distinct morph entry of an
+    attribute kept once, entries within tolerance of each other are treated as the
+    same.  With streaming the resource is read with the streaming reader rather
+    than loaded into memory.  Returns a dict with the size of the file before and
+    after, the number of frames before and after for each morph key, and the
+    maximum absolute change to a value.
+    """
+    size_before = os.path.getsize(resource_file)
+    temporary_file = f"{resource_file}.frames"
+    if streaming:
+        with spooled_resource(resource_file) as content:
+            items, frame_counts, max_error = _write_deduplicated(content, temporary_file, tolerance)
+    else:
+        content = read_json(resource_file)
+        items, frame_counts, max_error = _write_deduplicated(content, temporary_file, tolerance)
+
+    if items is not None:
+        os.replace(temporary_file, resource_file)
+
+    return {
+        "size_before": size_before,
+        "size_after": os.path.getsize(resource_file),
+        "frames": frame_counts,
+        "max_error": max_error,
+    }
@@ -0,0 +1,208 @@
+"""
+Timing and memory instrumentation of the stages of an export.
+
+A stage records its wall time, the CPU time and the bytes read and written,
+where the platform reports them, and the peak resident set size of this
+process during the stage.  The CPU time and bytes include those of child
+processes that finished during the stage, such as a pool of workers.
+
+On Linux the peak resident set size is reset when each stage starts, so it
+is the peak of the stage alone.  Elsewhere only the peak over the life of
+the process is reported, which is the peak of the stage only when it grew
+during the stage, otherwise the peak of the stage is None.  Tasks run in
+worker processes record the peak of their own process.  When tracemalloc is
+asked for, the peak memory allocated by Python during the stage is recorded
+as well, at the cost of slower allocation.
+
+Tasks run in worker processes are measured there with measured_call and
+added to the stage that ran them, so a report holds a measurement for each
+resource split or combined.
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+IO_COUNTERS_FILE = "/proc/self/io"
+# Writing 5 resets the peak resident set size of the process to its current size.
+CLEAR_REFS_FILE = "/proc/self/clear_refs"
+STATUS_FILE = "/proc/self/status"
+
+# Peak traced memory seen by each active stage of this process, innermost last.
+_traced_peaks = []
+# Peak resident set size seen by each active stage of this process, innermost last.
+_rss_peaks = []
+
+
+def _peak_rss():
+    """
+    The peak resident set size of this process since it started or was last reset.
+    """
+    try:
+        with open(STATUS_FILE) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _reset_peak_rss():
+    """
+    Reset the peak resident set size of this process, returns False where the platform does not allow it.
+    """
+    try:
+        with open(CLEAR_REFS_FILE, 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _io_counters():
+    """
+    The bytes read and written by this process so far, None where the platform does not report them.
+    """
+    try:
+        with open(IO_COUNTERS_FILE) as f:
+            counters = dict(line.split(':') for line in f if ':' in line)
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _cpu_time():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _difference(end, start):
+    return None if end is None or start is None else end - start
+
+
+def _maximum(*values):
+    return max([value for value in values if value is not None], default=None)
+
+
+@contextmanager
+def _measurement(name, details, trace_memory):
+    """
+    Context manager yielding the dict that holds the measurement of the stage once the block is done.
+    """
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        if _traced_peaks:
+            _traced_peaks[-1] = max(_traced_peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        _traced_peaks.append(0)
+
+    start_peak_rss = _peak_rss()
+    if _reset_peak_rss():
+        if _rss_peaks:
+            _rss_peaks[-1] = _maximum(_rss_peaks[-1], start_peak_rss)
+        start_peak_rss = None
+    _rss_peaks.append(None)
+
+    measurement = {"name": name, "details": dict(details)}
+    bytes_read, bytes_written = _io_counters()
+    cpu_time = _cpu_time()
+    start = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        measurement["wall_time"] = time.perf_counter() - start
+        measurement["cpu_time"] = _cpu_time() - cpu_time
+        peak_rss = _peak_rss()
+        if start_peak_rss is not None and (peak_rss is None or peak_rss <= start_peak_rss):
+            # The peak of the process was reached before the stage.
+            peak_rss = None
+        peak_rss = _maximum(_rss_peaks.pop(), peak_rss)
+        if _rss_peaks:
+            _rss_peaks[-1] = _maximum(_rss_peaks[-1], peak_rss)
+        measurement["peak_rss"] = peak_rss
+        end_read, end_written = _io_counters()
+        measurement["bytes_read"] = _difference(end_read, bytes_read)
+        measurement["bytes_written"] = _difference(end_written, bytes_written)
+        measurement["peak_traced"] = None
+        if tracing:
+            peak = max(_traced_peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if _traced_peaks:
+                _traced_peaks[-1] = max(_traced_peaks[-1], peak)
+            measurement["peak_traced"] = peak
+
+
+def measured_call(name, trace_memory, function, *args):
+    """
+    Call function with args, returns its result and the measurement of the call as the stage name.
+    Used to measure tasks run in worker processes.
+    """
+    with _measurement(name, {}, trace_memory) as measurement:
+        result = function(*args)
+    return result, measurement
+
+
+class Instrumentation(object):
+    """
+    The measurements of the stages of an export, in the order they started.
+    Set trace_memory to record the peak memory allocated by Python with tracemalloc.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self._stages = []
+        self._active = []
+
+    @contextmanager
+    def stage(self, name, **details):
+        """
+        Context manager measuring the block as a stage with name, details are
+        added to the measurement.  Stages started inside the block are nested.
+        """
+        with _measurement(name, details, self.trace_memory) as measurement:
+            measurement["stages"] = []
+            self.add(measurement)
+            self._active.append(measurement)
+            try:
+                yield measurement
+            finally:
+                self._active.pop()
+
+    def add(self, measurement, **details):
+        """
+        Add a measurement taken elsewhere, see measured_call, to the current stage.
+        """
+        measurement["details"].update(details)
+        (self._active[-1]["stages"] if self._active else self._stages).append(measurement)
+
+    def report(self):
+        """
+        The measurements as a dict, with the total wall and CPU time of the top level stages
+        and the largest of their peak resident set sizes.
+        """
+        return {
+            "stages": self._stages,
+            "totals": {
+                "wall_time": sum(stage["wall_time"] for stage in self._stages if "wall_time" in stage),
+                "cpu_time": sum(stage["cpu_time"] for stage in self._stages if "cpu_time" in stage),
+                "peak_rss": _maximum(*[stage.get("peak_rss") for stage in self._stages]),
+            },
+        }
+
+    def write_report(self, report_file):
+        with open(report_file, 'w') as f:
+            json.dump(self.report(), f, sort_keys=True, indent=2)
@@ -0,0 +1,165 @@
+"""
+Journal of the tasks finished by a split or combine of a webGL export.
+
+Splitting and combining a large export can take hours.  The journal is a
+file next to the metadata file, one for each operation, with a record for
+each finished task, the files it wrote and their checksums, so that an
+interrupted run can be restarted without redoing the tasks it finished.  A
+finished task is only taken from the journal when its sources and the files
+it wrote are unchanged.
+
+The metadata file is replaced in one step once every task has finished, by
+renaming a complete new metadata file over it, and source files are only
+deleted after that.  The checksum of the new metadata file is recorded
+before it is renamed, so a run interrupted after the metadata file was
+replaced only finishes deleting the source files when it is restarted.
+"""
+import hashlib
+import json
+import os
+
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import serialise_json
+
+JOURNAL_SUFFIX = ".journal"
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def file_checksum(file_name):
+    """
+    The SHA-256 checksum of the contents of file_name, as a hex string.
+    """
+    checksum = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK_SIZE), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def _source_stat(file_name):
+    if not os.path.isfile(file_name):
+        return None
+    file_stat = os.stat(file_name)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+def _read_records(journal_file):
+    records = []
+    try:
+        with open(journal_file) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # The last record was cut short when the run was interrupted.
+                    break
+    except OSError:
+        pass
+    return records
+
+
+class Journal(object):
+    """
+    The journal of one operation on the metadata file with the given parameters,
+    a dict of the arguments that change the files written.
+    """
+
+    def __init__(self, meta_file, operation, parameters):
+        self._meta_file = meta_file
+        self._meta_dir = os.path.dirname(meta_file)
+        self._journal_file = f"{meta_file}.{operation}{JOURNAL_SUFFIX}"
+        self._header = {"operation": operation, "parameters": parameters, "metadata": file_checksum(meta_file)}
+        self._tasks = {}
+        self._commit = None
+
+        records = _read_records(self._journal_file)
+        header = records[0] if records else None
+        same_operation = header is not None and all(header.get(key) == self._header[key] for key in ["operation", "parameters"])
+        commits = [record for record in records if "commit" in record]
+        if same_operation and commits and commits[-1]["commit"] == self._header["metadata"]:
+            self._commit = commits[-1]
+        elif header == self._header:
+            self._tasks = {record["task"]: record for record in records if "task" in record}
+        else:
+            self._write([self._header])
+
+    def _write(self, records, mode='w'):
+        with open(self._journal_file, mode) as f:
+            for record in records:
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _relative(self, file_name):
+        return os.path.relpath(file_name, self._meta_dir)
+
+    def _absolute(self, relative_name):
+        return os.path.join(self._meta_dir, relative_name)
+
+    def is_committed(self):
+        """
+        True if the metadata file was already replaced by an interrupted run.
+        """
+        return self._commit is not None
+
+    def finished(self, key, source_files):
+        """
+        True if the task with key finished in an earlier run and its source_files
+        and the files it wrote are unchanged, see result.
+        """
+        record = self._tasks.get(key, None)
+        if record is None:
+            return False
+        if record["sources"] != {self._relative(file_name): _source_stat(file_name) for file_name in source_files}:
+            return False
+        for relative_name, (size, checksum) in record["outputs"].items():
+            file_name = self._absolute(relative_name)
+            if not os.path.isfile(file_name) or os.path.getsize(file_name) != size or file_checksum(file_name) != checksum:
+                return False
+        return True
+
+    def result(self, key):
+        return self._tasks[key]["result"]
+
+    def record(self, key, source_files, output_files, result):
+        """
+        Record that the task with key, reading source_files, finished writing output_files with result.
+        """
+        record = {
+            "task": key,
+            "sources": {self._relative(file_name): _source_stat(file_name) for file_name in source_files},
+            "outputs": {self._relative(file_name): [os.path.getsize(file_name), file_checksum(file_name)] for file_name in output_files},
+            "result": result,
+        }
+        self._tasks[key] = record
+        self._write([record], 'a')
+
+    def commit(self, meta_content, result=None, delete_files=None):
+        """
+        Replace the metadata file with meta_content, then delete delete_files and the journal.
+        Returns result.
+        """
+        temporary_file = f"{self._meta_file}.tmp"
+        with open(temporary_file, 'wb') as f:
+            f.write(serialise_json(meta_content, sort_keys=True, default=lambda o: o.__dict__))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._commit = {
+            "commit": file_checksum(temporary_file),
+            "result": result,
+            "delete": [self._relative(file_name) for file_name in (delete_files or [])],
+        }
+        self._write([self._commit], 'a')
+        os.replace(temporary_file, self._meta_file)
+        return self.finish()
+
+    def finish(self):
+        """
+        Delete the source files of a committed run and the journal, returns the result of the run.
+        """
+        for relative_name in self._commit["delete"]:
+            file_name = self._absolute(relative_name)
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+        os.remove(self._journal_file)
+        return self._commit["result"]
@@ -1,46 +1,128 @@
-import argparse
 import json
-import math
+import operator
 import os
 import sys
 
-from copy import deepcopy
-
-from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+from array import array
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from copy import copy
+from functools import lru_cache, partial
+from itertools import accumulate
+from json.encoder import encode_basestring_ascii
+
+from mapclientplugins.argonsceneexporterstep.splitter.binary_resource import (
+    binary_url, is_binary_header, read_binary_resources, write_binary_resources)
+from mapclientplugins.argonsceneexporterstep.splitter.budget import (
+    fits_budget, in_memory_footprint, remaining_budget, streaming_footprint, task_footprint)
+from mapclientplugins.argonsceneexporterstep.splitter.compression import available_encodings, compress_file, compression_totals
+from mapclientplugins.argonsceneexporterstep.splitter.concatenation import concatenate_json_resources
+from mapclientplugins.argonsceneexporterstep.splitter.deduplication import deduplicate_resource_frames
+from mapclientplugins.argonsceneexporterstep.splitter.instrumentation import measured_call
+from mapclientplugins.argonsceneexporterstep.splitter.journal import Journal
+from mapclientplugins.argonsceneexporterstep.splitter.morph import (
+    BlockValueCosts, morph_base_cost, morph_data, morph_value_costs, split_morph_entries, value_positions)
+from mapclientplugins.argonsceneexporterstep.splitter.packing import pack, packing_report
+from mapclientplugins.argonsceneexporterstep.splitter.precision import reduce_resource_precision
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import (
+    ITEM_SEPARATOR, KEY_SEPARATOR, compact_text, read_json, write_json)
+from mapclientplugins.argonsceneexporterstep.splitter.streaming import spooled_resource
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import (
+    THREEJS_TYPE_TRIANGLE, THREEJS_TYPE_MATERIAL, THREEJS_TYPE_VERTEX_TEX_COORD, THREEJS_TYPE_VERTEX_NORMAL,
+    THREEJS_TYPE_FACE_COLOUR, THREEJS_TYPE_VERTEX_COLOUR, THREEJS_COMMON_KEYS)
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import json_list_key_size, json_number_size
 
 FILE_SIZE_LIMIT = 1024 * 1024 * 18
-
-# Threejs types.
-THREEJS_TYPE_TRIANGLE = 0
-THREEJS_TYPE_MATERIAL = 2
-THREEJS_TYPE_VERTEX_TEX_COORD = 8
-THREEJS_TYPE_VERTEX_NORMAL = 32
-THREEJS_TYPE_FACE_COLOUR = 64
-THREEJS_TYPE_VERTEX_COLOUR = 128
+# Resources bigger than this are split with the streaming splitter.
+MEMORY_LIMIT = 1024 * 1024 * 512
+STREAMABLE_TYPES = ["Surfaces", "Lines", "Glyph"]
+FACE_TYPES = ["Surfaces", "Lines"]
+# Keys of glyph resources holding a flat list of 3 values per glyph for each time index.
+GLYPH_LIST_KEYS = ["axis1", "axis2", "axis3", "positions", "scale"]
+# Number of glyphs serialised at a time when splitting glyph resources.
+GLYPH_WINDOW_SIZE = 8192
+
+# Face splitting engines.
+ENGINE_AUTO = "auto"
+ENGINE_PYTHON = "python"
+ENGINE_NUMPY = "numpy"
+ENGINES = [ENGINE_AUTO, ENGINE_PYTHON, ENGINE_NUMPY]
+
+# Formats split and combined resources are written in.
+OUTPUT_FORMAT_JSON = "json"
+OUTPUT_FORMAT_BINARY = "binary"
+OUTPUT_FORMATS = [OUTPUT_FORMAT_JSON, OUTPUT_FORMAT_BINARY]
+# Metadata key of the format of each resource, written for the binary output format.
+FORMAT_KEY = "Format"
+
+# Orders the faces of surfaces and lines are split in.
+SPLIT_ORDER_FACES = "faces"
+SPLIT_ORDER_MORTON = "morton"
+SPLIT_ORDERS = [SPLIT_ORDER_FACES, SPLIT_ORDER_MORTON]
+# Vertices a chunk can have for its indices to fit Uint16, leaving 65535 for primitive restart.
+MAX_UINT16_VERTICES = 65535
+# The fewest bytes a vertex takes in a resource, '0, 0, 0, '.
+MINIMUM_VERTEX_BYTES = 9
 
 
 def _pad_or_truncate(some_list, target_len):
     return some_list[:target_len] + [0] * (target_len - len(some_list))
 
 
-def _split_file(big_file, splits_required, content_type):
+def _split_file(big_file, file_size_limit, content_type, streaming=False, engine=ENGINE_AUTO, output_format=OUTPUT_FORMAT_JSON,
+                split_order=SPLIT_ORDER_FACES, max_vertices=None):
+    """
+    Split a resource, returns the URLs of the split files and a dict of metadata
+    key to a list with a value for each split file, see _split_faces.  The URLs are
+    None when the resource does not need splitting.
+    """
     split_files = []
+    chunk_metadata = {}
+    base_dir = os.path.dirname(big_file["full_path"])
 
-    with open(big_file["full_path"]) as f:
-        large_content = json.load(f)
+    if streaming and content_type in STREAMABLE_TYPES:
+        with spooled_resource(big_file["full_path"]) as large_content:
+            if content_type == "Glyph":
+                return _split_glyphs(base_dir, big_file["URL"], large_content, file_size_limit, output_format), chunk_metadata
+            if _within_limits(big_file, large_content, file_size_limit, max_vertices):
+                return None, chunk_metadata
+            return _split_faces(base_dir, big_file["URL"], large_content, file_size_limit, engine, output_format, split_order,
+                                max_vertices, streaming=True)
 
-    base_dir = os.path.dirname(big_file["full_path"])
+    large_content = read_json(big_file["full_path"])
+
+    if content_type in FACE_TYPES and _within_limits(big_file, large_content, file_size_limit, max_vertices):
+        return None, chunk_metadata
 
     if content_type == "Surfaces":
-        split_files = _split_faces(base_dir, big_file["URL"], large_content, splits_required)
+        split_files, chunk_metadata = _split_faces(base_dir, big_file["URL"], large_content, file_size_limit, engine, output_format,
+                                                   split_order, max_vertices)
     elif content_type == "Glyph":
-        split_files = _split_glyphs(base_dir, big_file["URL"], large_content, splits_required)
+        split_files = _split_glyphs(base_dir, big_file["URL"], large_content, file_size_limit, output_format)
     elif content_type == "Lines":
-        split_files = _split_faces(base_dir, big_file["URL"], large_content, splits_required)
+        split_files, chunk_metadata = _split_faces(base_dir, big_file["URL"], large_content, file_size_limit, engine, output_format,
+                                                   split_order, max_vertices)
     else:
         print(f"Asked to split type: '{content_type}', but this resource type is not supported.")
 
-    return split_files
+    return split_files, chunk_metadata
+
+
+def _needs_split(size, content_type, file_size_limit, max_vertices):
+    if size > file_size_limit:
+        return True
+    # A resource that is too small to hold more than max_vertices vertices is not read.
+    return max_vertices is not None and content_type in FACE_TYPES and size > MINIMUM_VERTEX_BYTES * max_vertices
+
+
+def _within_limits(big_file, large_content, file_size_limit, max_vertices):
+    """
+    True if a faces based resource is within both the size and vertex limits.
+    """
+    if big_file["size"] > file_size_limit:
+        return False
+    return max_vertices is None or len(large_content.get("vertices", [])) // 3 <= max_vertices
 
 
 def _form_split_url(base_url, chunk_index):
@@ -48,220 +130,502 @@ def _form_split_url(base_url, chunk_index):
     return f"{base_name}_split_{chunk_index + 1}{ext}"
 
 
-def _split_glyphs(base_dir, file_url, large_content, splits_required):
+def _split_glyphs(base_dir, file_url, large_content, file_size_limit, output_format=OUTPUT_FORMAT_JSON):
     split_urls = []
-    split_glyph_data = _split_glyph_data(large_content, splits_required)
-    for index, chunk in enumerate(split_glyph_data):
+    splitter = _GlyphSplitter(large_content)
+    for index, chunk in enumerate(splitter.iter_chunks(file_size_limit)):
         split_url = _form_split_url(file_url, index)
         split_urls.append(split_url)
-        with open(os.path.join(base_dir, split_url), 'w') as f:
-            json.dump(chunk, f)
+        split_file = os.path.join(base_dir, split_url)
+        if output_format == OUTPUT_FORMAT_JSON:
+            with open(split_file, 'w') as f:
+                f.write(splitter.chunk_text(*chunk))
+        else:
+            _write_resource(split_file, splitter.chunk_data(chunk[0], chunk[1]), output_format)
 
     return split_urls
 
 
-def _split_glyph_data(data, num_chunks=5):
-    chunks = []
-    metadata = data.get("metadata", {"number_of_vertices": 0})
-    num_entries = metadata["number_of_vertices"]
-    labels = data.get("label", [])
+def _as_list(values):
+    return values if isinstance(values, list) else values.tolist()
 
-    # Identify keys that should be split into smaller lists.
-    list_keys = ["axis1", "axis2", "axis3", "positions", "scale"]
-    step_size = math.ceil(num_entries / num_chunks)
 
-    for i in range(0, num_entries, step_size):
-        # Create the base structure with shared metadata.
+def _json_tokens(values):
+    """
+    The values serialised, one string for each value.
+    """
+    if len(values) == 0:
+        return []
+    return compact_text(_as_list(values))[1:-1].split(ITEM_SEPARATOR)
+
+
+class _GlyphSplitter(object):
+    """
+    Splits a glyph resource with any number of time indices into chunks.
+
+    The glyphs are worked through a window at a time.  The values of each
+    window are serialised once, the serialised sizes decide where each chunk
+    is cut and the same text is joined to write the chunk, so no chunk is
+    built as Python objects unless asked for.  Every chunk shares the values
+    of one metadata template.  The arrays of the resource only need to support
+    len and slicing.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self._metadata = data.get("metadata", {"number_of_vertices": 0})
+        self._num_entries = self._metadata["number_of_vertices"]
+        self._labels = data.get("label", [])
+        self._list_keys = [key for key in GLYPH_LIST_KEYS if key in data]
+        self._arrays = [values for key in self._list_keys for values in data[key].values()]
+        self._array_lengths = [len(values) for values in self._arrays]
+        self._base_size = len(self.chunk_text(0, 0, [], [[] for _ in self._arrays]))
+
+    def number_of_vertices(self, start, end):
+        if len(self._array_lengths):
+            return (min(3 * end, self._array_lengths[0]) - min(3 * start, self._array_lengths[0])) // 3
+        return max(0, min(end, len(self._labels)) - start)
+
+    def _first_values(self, start):
+        # Lists that get values have no separator before their first value.
+        return (start < len(self._labels)) + sum(3 * start < length for length in self._array_lengths)
+
+    def _size(self, start, end, costs):
+        return (self._base_size + len(str(self.number_of_vertices(start, end))) - 1 + costs -
+                len(ITEM_SEPARATOR) * self._first_values(start))
+
+    def chunk_data(self, start, end):
         chunk = {
-            "GlyphGeometriesURL": data.get("GlyphGeometriesURL", ""),
-            "metadata": deepcopy(metadata),
-            "label": labels[i: i + step_size],
+            "GlyphGeometriesURL": self._data.get("GlyphGeometriesURL", ""),
+            "metadata": dict(self._metadata, number_of_vertices=self.number_of_vertices(start, end)),
+            "label": self._labels[start:end],
         }
+        # Flat lists hold 3 values per label.
+        for key in self._list_keys:
+            chunk[key] = {index: _as_list(values[3 * start:3 * end]) for index, values in self._data[key].items()}
+        return chunk
+
+    def chunk_text(self, start, end, label_tokens, array_tokens):
+        """
+        The chunk from start to end serialised as write_json would, from the serialised values.
+        """
+        metadata = dict(self._metadata, number_of_vertices=self.number_of_vertices(start, end))
+        parts = [f'{{"GlyphGeometriesURL"{KEY_SEPARATOR}{compact_text(self._data.get("GlyphGeometriesURL", ""))}{ITEM_SEPARATOR}'
+                 f'"metadata"{KEY_SEPARATOR}{compact_text(metadata)}{ITEM_SEPARATOR}"label"{KEY_SEPARATOR}[',
+                 ITEM_SEPARATOR.join(label_tokens), ']']
+        tokens = iter(array_tokens)
+        for key in self._list_keys:
+            parts.append(f'{ITEM_SEPARATOR}{compact_text(key)}{KEY_SEPARATOR}{{')
+            parts.append(ITEM_SEPARATOR.join(f'{compact_text(index)}{KEY_SEPARATOR}[{ITEM_SEPARATOR.join(next(tokens))}]'
+                                             for index in self._data[key]))
+            parts.append('}')
+        parts.append('}')
+        return ''.join(parts)
+
+    def _window_costs(self, label_tokens, array_tokens, window_length):
+        separator_size = len(ITEM_SEPARATOR)
+        costs = [separator_size + len(token) for token in label_tokens]
+        costs.extend([0] * (window_length - len(costs)))
+        for tokens in array_tokens:
+            sizes = iter(map(len, tokens))
+            glyph_costs = [3 * separator_size + a + b + c for a, b, c in zip(sizes, sizes, sizes)]
+            # A partial glyph at the end of a short array.
+            remainder = sum(separator_size + size for size in sizes)
+            if remainder:
+                glyph_costs.append(remainder)
+            glyph_costs.extend([0] * (window_length - len(glyph_costs)))
+            costs = list(map(operator.add, costs, glyph_costs))
+        return costs
+
+    def iter_chunks(self, file_size_limit):
+        """
+        Generator over the chunks, a chunk is cut when the next glyph would take it
+        over file_size_limit bytes once serialised.  Yields the start and end glyph
+        of each chunk with its serialised labels and arrays for chunk_text.
+        """
+        widest_number = len(str(self._num_entries))
+        start = 0
+        costs = 0
+        label_tokens = []
+        array_tokens = [[] for _ in self._arrays]
+        for window_start in range(0, self._num_entries, GLYPH_WINDOW_SIZE):
+            window_end = min(self._num_entries, window_start + GLYPH_WINDOW_SIZE)
+            window_labels = [encode_basestring_ascii(label) if isinstance(label, str) else compact_text(label)
+                             for label in self._labels[window_start:window_end]]
+            window_arrays = [_json_tokens(values[3 * window_start:3 * window_end]) for values in self._arrays]
+            cumulative_costs = [0] + list(accumulate(self._window_costs(window_labels, window_arrays, window_end - window_start)))
+
+            position = 0
+            while position < window_end - window_start:
+                # Take the glyphs that fit with the widest number of vertices, then any more that fit exactly.
+                budget = (file_size_limit - self._base_size - widest_number + 1 + len(ITEM_SEPARATOR) * self._first_values(start) -
+                          costs)
+                end = max(position, bisect_right(cumulative_costs, cumulative_costs[position] + budget) - 1)
+                while end < window_end - window_start and self._size(
+                        start, window_start + end + 1, costs + cumulative_costs[end + 1] - cumulative_costs[position]) <= file_size_limit:
+                    end += 1
+
+                label_tokens.extend(window_labels[position:end])
+                for tokens, window_tokens in zip(array_tokens, window_arrays):
+                    tokens.extend(window_tokens[3 * position:3 * end])
+                costs += cumulative_costs[end] - cumulative_costs[position]
+                if end < window_end - window_start:
+                    chunk_end = window_start + end
+                    if chunk_end == start:
+                        needed = self._size(start, start + 1, cumulative_costs[position + 1] - cumulative_costs[position])
+                        raise Exception(f"Cannot split glyphs into files of at most {file_size_limit} bytes, a single glyph needs {needed} bytes.")
+                    yield start, chunk_end, label_tokens, array_tokens
+                    start = chunk_end
+                    costs = 0
+                    label_tokens = []
+                    array_tokens = [[] for _ in self._arrays]
+                position = end
+
+        if self._num_entries > start:
+            yield start, self._num_entries, label_tokens, array_tokens
+
+
+def _split_faces(base_dir, file_url, large_content, file_size_limit, engine=ENGINE_AUTO, output_format=OUTPUT_FORMAT_JSON,
+                 split_order=SPLIT_ORDER_FACES, max_vertices=None, streaming=False):
+    """
+    Split a faces based resource, returns the URLs of the split files and a dict of
+    metadata key to a list with a value for each split file.  Resources split in
+    spatial order list the "BoundingBox" of each split file, and resources split
+    with max_vertices list the "IndexWidth" each split file needs.  A streamed
+    resource has the sizes of its values worked out as the chunks need them.
+    """
+    split_files = []
+    chunk_metadata = {}
+    if split_order == SPLIT_ORDER_MORTON:
+        # Spatial ordering uses numpy, so it is only imported for the resources that need it.
+        from mapclientplugins.argonsceneexporterstep.splitter.spatial import bounding_box
+        large_content = _spatially_ordered(large_content, base_dir)
+        chunk_metadata["BoundingBox"] = []
+    if max_vertices is not None:
+        chunk_metadata["IndexWidth"] = []
+
+    for chunk_index, split_data in enumerate(_face_chunks(large_content, file_size_limit, engine, max_vertices, streaming)):
+        split_url = _form_split_url(file_url, chunk_index)
+        split_files.append(split_url)
+        if "BoundingBox" in chunk_metadata:
+            chunk_metadata["BoundingBox"].append(bounding_box(split_data.get("vertices", []), split_data.get("scale", None)))
+        if "IndexWidth" in chunk_metadata:
+            chunk_metadata["IndexWidth"].append(_index_width(split_data))
+
+        split_file = os.path.join(base_dir, split_url)
+        _write_resource(split_file, split_data, output_format, file_size_limit)
 
-        # Calculate start and end indices for the flat lists (3 values per label).
-        start_idx = i * 3
-        end_idx = (i + step_size) * 3
+    return split_files, chunk_metadata
 
-        resized = False
-        chunk["metadata"]["number_of_vertices"] = len(chunk["label"])
 
-        # Slice the lists inside each dictionary key.
-        for key in list_keys:
-            if key in data:
-                sliced_data = {}
-                for index in data[key]:
-                    sliced_data[index] = data[key][index][start_idx:end_idx]
-                    if not resized:
-                        resized = True
-                        chunk["metadata"]["number_of_vertices"] = len(sliced_data[index]) // 3
-                chunk[key] = sliced_data
+def _index_width(split_data):
+    """
+    The bits needed for the indices of a chunk, 16 when every index fits a Uint16.
+    """
+    uvs = split_data.get("uvs", [[]])
+    largest_count = max(len(split_data.get("vertices", [])) // 3, len(split_data.get("normals", [])) // 3,
+                        len(split_data.get("colors", [])), len(uvs[0]) // 2 if len(uvs) else 0)
+    return 16 if largest_count <= 2 ** 16 else 32
 
-        chunks.append(chunk)
 
-    return chunks
+def _spatially_ordered(large_content, spool_dir):
+    """
+    A shallow copy of large_content with the faces sorted by the Morton code of their centroid.
+    """
+    from mapclientplugins.argonsceneexporterstep.splitter.spatial import morton_order, reorder_faces
+    faces = large_content["faces"]
+    unit_starts = _face_units(large_content)
+    order = morton_order(faces, unit_starts, large_content["vertices"])
+    ordered_content = large_content.copy()
+    ordered_content["faces"] = reorder_faces(faces, unit_starts, order, spool_dir)
+    return ordered_content
 
 
-def _split_faces(base_dir, file_url, large_content, splits_required):
-    split_files = []
+def _face_units(large_content):
+    """
+    The start of each unit of faces that is kept together when the faces are
+    reordered, followed by the end of the faces.  Lines are kept in pairs.
+    """
+    from mapclientplugins.argonsceneexporterstep.splitter import vectorised
+    faces = large_content["faces"]
+    data_len = len(faces)
+    face_mask = vectorised.face_mask_of(large_content)
+    if face_mask is not None:
+        unit = vectorised.FACE_MASK_STRIDES[face_mask] * (2 if face_mask == THREEJS_TYPE_TRIANGLE else 1)
+        unit_starts = array('q', range(0, data_len, unit))
+        unit_starts.append(data_len)
+        return unit_starts
+
+    unit_starts = array('q')
+    index = 0
+    while index < data_len:
+        unit_starts.append(index)
+        end = _face_end(faces, index)
+        if faces[index] == THREEJS_TYPE_TRIANGLE and end < data_len and faces[end] == THREEJS_TYPE_TRIANGLE:
+            end = _face_end(faces, end)
+        index = end
+    unit_starts.append(data_len)
+    return unit_starts
+
+
+def _write_resource(resource_file, content, output_format, size_limit=None):
+    if output_format == OUTPUT_FORMAT_BINARY:
+        write_binary_resources(resource_file, content)
+    else:
+        # Resources are at most the file size limit, so are encoded in one go, see
+        # serialisation.serialise_json for how the size_limit is kept to.
+        write_json(resource_file, content, size_limit=size_limit)
+
+
+def _read_resource(resource_file):
+    content = read_json(resource_file)
+
+    if is_binary_header(content) or (isinstance(content, list) and len(content) and is_binary_header(content[0])):
+        content = read_binary_resources(resource_file)
+
+    return content
+
+
+def _face_chunks(large_content, file_size_limit, engine, max_vertices=None, streaming=False):
+    """
+    Choose the engine to split a faces based resource with.  The NumPy engine is
+    used when it is available and every face has the same supported face mask.
+    """
+    if engine == ENGINE_PYTHON:
+        return _iter_face_chunks(large_content, file_size_limit, max_vertices, streaming)
+
+    # The numpy engine is imported when first used, so that loading the splitter does not load numpy.
+    from mapclientplugins.argonsceneexporterstep.splitter import vectorised
+    face_mask = vectorised.face_mask_of(large_content)
+    if face_mask is not None:
+        return vectorised.iter_face_chunks(large_content, file_size_limit, face_mask, max_vertices, streaming)
+
+    if engine == ENGINE_NUMPY:
+        if not vectorised.is_available():
+            raise Exception("Cannot split with the numpy engine, numpy is not installed.")
+        raise Exception("Cannot split with the numpy engine, the faces do not all have the same supported face mask.")
+
+    return _iter_face_chunks(large_content, file_size_limit, max_vertices, streaming)
+
+
+def _iter_face_chunks(large_content, file_size_limit, max_vertices=None, streaming=False):
+    """
+    Generator over the chunks of a faces based resource.  Each chunk is yielded
+    as soon as it is full, so only one chunk is held in memory at a time.
+    A chunk is full when the next face would take it over file_size_limit bytes
+    once serialised, or over max_vertices vertices when that is given, cutting
+    greedily like this gives the fewest chunks.
+    The large_content arrays only need to support len, indexing and slicing.  With
+    streaming the bytes of the morph values are worked out a block of values at a
+    time as they are needed, rather than for every value up front.
+    """
     faces = large_content["faces"]
-    vertices = large_content.get("vertices", None)
-    normals = large_content.get("normals", None)
-    colours = large_content.get("colors", None)
     uvs = large_content.get("uvs", None)
-    morph_colours = large_content.get("morphColors", None)
+    value_stores = {
+        "vertices": large_content.get("vertices", None),
+        "normals": large_content.get("normals", None),
+        "colors": large_content.get("colors", None),
+        "uvs": None if uvs is None else uvs[0],
+    }
+    morphs = _FaceMorphs(morph_data(large_content), value_stores, streaming)
 
     common_items = {}
-    for common_key in ["metadata", "materials"]:
+    for common_key in THREEJS_COMMON_KEYS:
         if common_key in large_content:
-            common_items[common_key] = large_content[common_key].copy()
+            common_items[common_key] = copy(large_content[common_key])
 
     data_len = len(faces)
-    chunk_size = data_len // splits_required
     index = 0
-    chunk_progress = 0
-
-    split_faces = []
-    split_vertices = []
-    split_normals = []
-    split_colours = []
-    split_uvs = []
-    split_morph_colours = []
-    current_faces = []
-    current_vertices = []
-    current_normals = []
-    current_colours = []
-    current_uvs = []
-    morph_colours_count = 0 if morph_colours is None else len(morph_colours)
-    current_morph_colours = [{} for _ in range(morph_colours_count)]
-    face_vertex_map = {}
-    face_normal_map = {}
-    face_colour_map = {}
-    face_uvs_map = {}
-    face_morph_colour_map = {}
-
+    chunk = _FaceChunk(common_items, value_stores, morphs)
     while index < data_len:
-        face_mask = faces[index]
-        current_faces.append(face_mask)
-        index += 1
-        chunk_progress += 1
-        # We always have vertices.
-        current_faces.extend(
-            _map_values(current_vertices, face_vertex_map, faces[index: index + 3], vertices))
-        index += 3
-        chunk_progress += 3
-        if face_mask == THREEJS_TYPE_TRIANGLE and chunk_progress >= chunk_size and index < data_len:
+        end = _face_end(faces, index)
+        if faces[index] == THREEJS_TYPE_TRIANGLE and chunk.line_count % 2 == 0 and end < data_len and faces[end] == THREEJS_TYPE_TRIANGLE:
             # These aren't really triangles they are interpreted as lines so, we can't
             # break on an odd number of vertex pairs.
-            # If we are even do nothing otherwise add one more face on to make it even.
-            even = (len(current_faces) - len(current_faces) // 4) % 2 == 0
-            if not even:
-                current_faces.append(face_mask)
-                index += 1
-                chunk_progress += 1
-                current_faces.extend(
-                    _map_values(current_vertices, face_vertex_map, faces[index: index + 3], vertices))
-                index += 3
-                chunk_progress += 3
-        if face_mask & THREEJS_TYPE_VERTEX_NORMAL:
-            current_faces.extend(
-                _map_values(current_normals, face_normal_map, faces[index: index + 3], normals))
-            index += 3
-            chunk_progress += 3
-        if face_mask & THREEJS_TYPE_VERTEX_COLOUR:
-            current_faces.extend(
-                _map_values(current_colours, face_colour_map, faces[index: index + 3], colours, size=1))
-            _update_morph_colours(current_morph_colours, face_morph_colour_map, faces, index, morph_colours)
-            index += 3
-            chunk_progress += 3
-        if face_mask & THREEJS_TYPE_VERTEX_TEX_COORD:
-            current_faces.extend(
-                _map_values(current_uvs, face_uvs_map, faces[index: index + 3], uvs[0], size=2))
-            index += 3
-            chunk_progress += 3
-        if face_mask & THREEJS_TYPE_FACE_COLOUR:
-            raise Exception(f"Cannot handle face mask: {face_mask}. Not dealing with {THREEJS_TYPE_FACE_COLOUR}")
-        if face_mask & THREEJS_TYPE_MATERIAL:
-            raise Exception(f"Cannot handle face mask: {face_mask}. Not dealing with {THREEJS_TYPE_MATERIAL}")
-
-        if chunk_progress >= chunk_size:
-            if len(current_faces):
-                split_faces.append(current_faces[:])
-            if len(current_vertices):
-                split_vertices.append(current_vertices[:])
-            if len(current_normals):
-                split_normals.append(current_normals[:])
-            if len(current_colours):
-                split_colours.append(current_colours[:])
-            if len(current_uvs):
-                split_uvs.append(current_uvs[:])
-            if len(current_morph_colours):
-                split_morph_colours.append(current_morph_colours.copy())
-
-            chunk_progress = 0
-            current_faces = []
-            current_vertices = []
-            current_normals = []
-            current_colours = []
-            current_uvs = []
-            current_morph_colours = [{} for _ in range(morph_colours_count)]
-            face_vertex_map = {}
-            face_normal_map = {}
-            face_colour_map = {}
-            face_uvs_map = {}
-            face_morph_colour_map = {}
+            # Take the faces two at a time so that a chunk always has pairs.
+            end = _face_end(faces, end)
+
+        cost = chunk.cost(faces, index, end)
+        too_many_vertices = max_vertices is not None and chunk.vertex_count(faces, index, end) > max_vertices
+        if len(chunk.faces) and (chunk.size + cost > file_size_limit or too_many_vertices):
+            yield chunk.data()
+            chunk = _FaceChunk(common_items, value_stores, morphs)
+            cost = chunk.cost(faces, index, end)
+            too_many_vertices = max_vertices is not None and chunk.vertex_count(faces, index, end) > max_vertices
+
+        if chunk.size + cost > file_size_limit:
+            raise Exception(f"Cannot split faces into files of at most {file_size_limit} bytes, a single face needs {chunk.size + cost} bytes.")
+        if too_many_vertices:
+            raise Exception(f"Cannot split faces into chunks of at most {max_vertices} vertices, "
+                            f"a single face needs {chunk.vertex_count(faces, index, end)} vertices.")
+
+        chunk.add(faces, index, end, cost)
+        index = end
 
     # Mop up any remaining bits and pieces.
-    if len(current_faces):
-        split_faces.append(current_faces[:])
-    if len(current_vertices):
-        split_vertices.append(current_vertices[:])
-    if len(current_normals):
-        split_normals.append(current_normals[:])
-    if len(current_colours):
-        split_colours.append(current_colours[:])
-    if len(current_uvs):
-        split_uvs.append(current_uvs[:])
-    if len(current_morph_colours):
-        split_morph_colours.append(current_morph_colours.copy())
-
-    for chunk_index, split_face_values in enumerate(split_faces):
-        split_data = common_items.copy()
+    if len(chunk.faces):
+        yield chunk.data()
 
-        split_url = _form_split_url(file_url, chunk_index)
-        split_files.append(split_url)
 
-        split_data["faces"] = split_face_values
-        if len(split_vertices):
-            split_data["vertices"] = split_vertices[chunk_index]
-        if len(split_normals):
-            split_data["normals"] = split_normals[chunk_index]
-        if len(split_colours):
-            split_data["colors"] = split_colours[chunk_index]
-        if len(split_uvs):
-            split_data["uvs"] = [split_uvs[chunk_index]]
-        if len(split_morph_colours):
-            split_data["morphColors"] = split_morph_colours[chunk_index]
+# The values a face can reference, in the order they appear in a face, with
+# the face mask bit that signals them and the number of numbers in a value.
+FACE_ATTRIBUTES = [
+    ("vertices", None, 3),
+    ("normals", THREEJS_TYPE_VERTEX_NORMAL, 3),
+    ("colors", THREEJS_TYPE_VERTEX_COLOUR, 1),
+    ("uvs", THREEJS_TYPE_VERTEX_TEX_COORD, 2),
+]
 
-        split_file = os.path.join(base_dir, split_url)
-        with open(split_file, 'w') as f:
-            json.dump(split_data, f)
 
-    return split_files
+_ATTRIBUTE_SIZES = {key: size for key, _, size in FACE_ATTRIBUTES}
+
+
+@lru_cache(maxsize=None)
+def _face_attributes(face_mask):
+    if face_mask & THREEJS_TYPE_FACE_COLOUR:
+        raise Exception(f"Cannot handle face mask: {face_mask}. Not dealing with {THREEJS_TYPE_FACE_COLOUR}")
+    if face_mask & THREEJS_TYPE_MATERIAL:
+        raise Exception(f"Cannot handle face mask: {face_mask}. Not dealing with {THREEJS_TYPE_MATERIAL}")
+
+    return tuple((key, size) for key, mask_bit, size in FACE_ATTRIBUTES if mask_bit is None or face_mask & mask_bit)
+
+
+def _face_end(faces, index):
+    return index + 1 + 3 * len(_face_attributes(faces[index]))
+
 
+class _FaceChunk(object):
+    """
+    The faces of one split chunk and the values they reference, remapped so that
+    the chunk stands on its own.  Tracks the size of the chunk when serialised.
+    """
+
+    def __init__(self, common_items, value_stores, morphs):
+        self._common_items = common_items
+        self._value_stores = value_stores
+        self._morphs = morphs
+        self.faces = []
+        self.values = {key: [] for key, _, _ in FACE_ATTRIBUTES}
+        self._value_maps = {key: {} for key, _, _ in FACE_ATTRIBUTES}
+        self.line_count = 0
+        self.size = len(compact_text(self.data()))
+
+    def _value_cost(self, key, size, source_value, first):
+        cost = len(ITEM_SEPARATOR) * size + sum(
+            map(json_number_size, self._value_stores[key][size * source_value:size * source_value + size]))
+        if first:
+            cost += json_list_key_size(key) - len(ITEM_SEPARATOR)
+        if key in self._morphs.value_costs:
+            cost += self._morphs.value_costs[key][source_value]
+            if first:
+                cost += self._morphs.base_costs[key]
+        return cost
+
+    def cost(self, faces, start, end):
+        """
+        The number of bytes that adding the faces from start to end would add to the chunk.
+        """
+        cost = 0
+        faces_count = len(self.faces)
+        pending_maps = {key: {} for key, _, _ in FACE_ATTRIBUTES}
+        index = start
+        while index < end:
+            face_mask = faces[index]
+            cost += json_number_size(face_mask) + (len(ITEM_SEPARATOR) if faces_count else 0)
+            faces_count += 1
+            index += 1
+            for key, size in _face_attributes(face_mask):
+                value_map = self._value_maps[key]
+                pending_map = pending_maps[key]
+                for source_value in faces[index: index + 3]:
+                    mapped_value = value_map.get(source_value, None)
+                    if mapped_value is None:
+                        mapped_value = pending_map.get(source_value, None)
+                    if mapped_value is None:
+                        mapped_value = len(value_map) + len(pending_map)
+                        pending_map[source_value] = mapped_value
+                        cost += self._value_cost(key, size, source_value, mapped_value == 0)
+                    cost += len(str(mapped_value)) + len(ITEM_SEPARATOR)
+                index += 3
+
+        return cost
+
+    def vertex_count(self, faces, start, end):
+        """
+        The number of vertices the chunk would have after adding the faces from start to end.
+        """
+        value_map = self._value_maps["vertices"]
+        new_vertices = set()
+        index = start
+        while index < end:
+            new_vertices.update(source_value for source_value in faces[index + 1:index + 4] if source_value not in value_map)
+            index = _face_end(faces, index)
+
+        return len(value_map) + len(new_vertices)
+
+    def add(self, faces, start, end, cost):
+        index = start
+        while index < end:
+            face_mask = faces[index]
+            self.faces.append(face_mask)
+            if face_mask == THREEJS_TYPE_TRIANGLE:
+                self.line_count += 1
+            index += 1
+            for key, size in _face_attributes(face_mask):
+                self.faces.extend(
+                    _map_values(self.values[key], self._value_maps[key], faces[index: index + 3], self._value_stores[key], size=size))
+                index += 3
 
-def _update_morph_colours(current_morph_colours, face_morph_colour_map, faces, index, morph_colours):
-    if morph_colours is not None:
-        for source_value in faces[index: index + 3]:
-            if source_value not in face_morph_colour_map:
+        self.size += cost
 
-                for index_colour, morph_colour in enumerate(morph_colours):
-                    if "name" not in current_morph_colours[index_colour]:
-                        current_morph_colours[index_colour]["name"] = morph_colours[index_colour]["name"]
-                        current_morph_colours[index_colour]["colors"] = []
+    def data(self):
+        return _form_face_chunk(self._common_items, self.faces, self.values["vertices"], self.values["normals"],
+                                self.values["colors"], self.values["uvs"], self._morphs.split(self._value_maps))
+
+
+class _FaceMorphs(object):
+    """
+    The morph data of a faces based resource, with the bytes each source value
+    adds to a chunk through the morph entries.  With streaming the bytes are
+    worked out a block of values at a time, rather than kept for every value.
+    """
+
+    def __init__(self, morphs, value_stores, streaming=False):
+        self._morphs = morphs
+        self.value_costs = {}
+        self.base_costs = {}
+        for key, (_, entries) in morphs.items():
+            size = _ATTRIBUTE_SIZES[key]
+            value_store = value_stores.get(key, None)
+            count = 0 if value_store is None else len(value_store) // size
+            if streaming:
+                self.value_costs[key] = BlockValueCosts([entry[key] for entry in entries], size, count)
+            else:
+                self.value_costs[key] = morph_value_costs(entries, key, size, count)
+            self.base_costs[key] = morph_base_cost(entries, key)
 
-                    face_morph_colour_map[source_value] = len(current_morph_colours[0]["colors"]) - 1
-                    value = morph_colour["colors"][source_value]
-                    current_morph_colours[index_colour]["colors"].append(value)
+    def split(self, value_maps):
+        """
+        The morph data for a chunk, keyed by morph key, from the value maps of the chunk.
+        """
+        return {morph_key: split_morph_entries(entries, key, value_positions(value_maps[key], _ATTRIBUTE_SIZES[key]))
+                for key, (morph_key, entries) in self._morphs.items()}
+
+
+def _form_face_chunk(common_items, faces, vertices, normals, colours, uvs, morphs):
+    split_data = common_items.copy()
+    split_data["faces"] = faces
+    if len(vertices):
+        split_data["vertices"] = vertices
+    if len(normals):
+        split_data["normals"] = normals
+    if len(colours):
+        split_data["colors"] = colours
+    if len(uvs):
+        split_data["uvs"] = [uvs]
+    split_data.update(morphs)
+
+    return split_data
 
 
 def _list_in(a, b):
@@ -344,35 +708,263 @@ def _analyse_resources(meta_content, meta_dir):
     return analysed_files
 
 
-def split_webgl_output(meta_file, file_size_limit, delete_split_source=False):
-    with open(meta_file) as f:
-        meta_content = json.load(f)
+def split_webgl_output(meta_file, file_size_limit, delete_split_source=False, memory_limit=MEMORY_LIMIT, engine=ENGINE_AUTO, workers=1,
+                       output_format=OUTPUT_FORMAT_JSON, split_order=SPLIT_ORDER_FACES, max_vertices_per_chunk=None, instrumentation=None,
+                       progress=None, morph_frame_tolerance=None, memory_budget=None):
+    """
+    Split the resources of a webGL export that are bigger than file_size_limit, or
+    for surfaces and lines that have more than max_vertices_per_chunk vertices.
+    Resources bigger than memory_limit are split by streaming them from disk, so that
+    the memory used depends on the size of the split files and not the size of the resource.
+    Set memory_limit to None to always split resources in memory.
+    The engine is one of ENGINES, by default the NumPy engine is used for
+    surfaces and lines when it can be and the Python engine otherwise.
+    Resources are split with up to workers processes, set workers to None to use
+    one process for each CPU.  The output does not depend on the number of workers.
+    The split files are written in the output_format, one of OUTPUT_FORMATS, for the
+    binary format the .bin files are listed under "BinaryURL" in the metadata, and
+    the format of every resource is given by FORMAT_KEY, as resources that are not
+    split stay JSON.
+    With the split_order SPLIT_ORDER_MORTON the faces of surfaces and lines are sorted
+    by the Morton code of their centroid before splitting, so each split file covers a
+    compact region, and the bounding box of each split file is listed under "BoundingBox".
+    When max_vertices_per_chunk is given the split files of surfaces and lines also have at
+    most that many vertices, set it to MAX_UINT16_VERTICES so that every split file can use
+    16 bit indices, the index width of each split file is listed under "IndexWidth".
+    Finished resources are recorded in a journal, see journal.Journal, so that an
+    interrupted split continues from where it stopped when it is run again.  The
+    metadata file is replaced once every resource is split, and the split sources are
+    only deleted after that.
+    When an instrumentation.Instrumentation is given the split of each resource is
+    measured and added to its current stage, with the resource URL as a detail.
+    When progress is given it is called with the number of resources split out of
+    the total and the bytes written so far, see _progress_counter.
+    When morph_frame_tolerance is given the morph frames of the resources are first
+    deduplicated with that tolerance, see deduplicate_webgl_output_frames, so the
+    repeated frames are not copied into every split file.
+    With a memory_budget resources whose estimated footprint in memory does not fit
+    it are split by streaming them, and resources are only split at the same time
+    while their estimated footprints fit it, see budget.py.
+    """
+    journal = Journal(meta_file, "split", {
+        "file_size_limit": file_size_limit, "delete_split_source": delete_split_source, "output_format": output_format,
+        "split_order": split_order, "max_vertices_per_chunk": max_vertices_per_chunk, "morph_frame_tolerance": morph_frame_tolerance})
+    if journal.is_committed():
+        return journal.finish()
+
+    if morph_frame_tolerance is not None:
+        # Resources already deduplicated by an interrupted run are left as they are, keeping the journal valid.
+        deduplicate_webgl_output_frames(meta_file, morph_frame_tolerance, memory_limit, workers)
+
+    meta_content = read_json(meta_file)
 
     meta_dir = os.path.dirname(meta_file)
     analysed_resources = _analyse_resources(meta_content, meta_dir)
 
     new_meta_content = meta_content.copy()
+    tasks = []
+    task_levels = []
+    footprints = []
     for resource in analysed_resources:
         size = resource["size"]
-        if size > file_size_limit:
-            splits_required = math.ceil(size / file_size_limit)
-            split_files = _split_file(resource, splits_required, resource.get('type', 'none'))
-            new_meta_content[resource["meta_index"]]["URL"] = split_files
-            if delete_split_source:
-                os.remove(resource["full_path"])
+        content_type = resource.get('type', 'none')
+        if _needs_split(size, content_type, file_size_limit, max_vertices_per_chunk):
+            streaming, footprint = _split_strategy(size, content_type, file_size_limit, memory_limit, memory_budget)
+            tasks.append((resource, file_size_limit, content_type, streaming, engine, output_format, split_order, max_vertices_per_chunk))
+            task_levels.append((resource, None))
+            footprints.append(footprint)
         if "LOD" in resource:
             for level in resource["LOD"]["Levels"]:
                 size = resource["LOD"]["Levels"][level]["size"]
-                if size > file_size_limit:
-                    splits_required = math.ceil(size / file_size_limit)
-                    split_files = _split_file(resource["LOD"]["Levels"][level], splits_required, resource.get('type', 'none'))
-                    new_meta_content[resource["meta_index"]]["LOD"]["Levels"][level]["URL"] = split_files
-                    if delete_split_source:
-                        os.remove(resource["LOD"]["Levels"][level]["full_path"])
+                if _needs_split(size, content_type, file_size_limit, max_vertices_per_chunk):
+                    streaming, footprint = _split_strategy(size, content_type, file_size_limit, memory_limit, memory_budget)
+                    tasks.append((resource["LOD"]["Levels"][level], file_size_limit, content_type, streaming, engine, output_format,
+                                  split_order, max_vertices_per_chunk))
+                    task_levels.append((resource, level))
+                    footprints.append(footprint)
+
+    results = _run_journaled_tasks(journal, _split_file, tasks, [task[0]["URL"] for task in tasks],
+                                   [[task[0]["full_path"]] for task in tasks], _split_output_files, workers,
+                                   instrumentation, "split_resource", "resource", progress, footprints, memory_budget)
+    delete_files = []
+    for (resource, level), (split_files, chunk_metadata) in zip(task_levels, results):
+        if split_files is None:
+            continue
+        if level is None:
+            meta_item = new_meta_content[resource["meta_index"]]
+            source_file = resource["full_path"]
+        else:
+            meta_item = new_meta_content[resource["meta_index"]]["LOD"]["Levels"][level]
+            source_file = resource["LOD"]["Levels"][level]["full_path"]
+
+        meta_item["URL"] = split_files
+        if output_format == OUTPUT_FORMAT_BINARY:
+            meta_item["BinaryURL"] = [binary_url(split_file) for split_file in split_files]
+        meta_item.update(chunk_metadata)
+        if delete_split_source:
+            delete_files.append(source_file)
+
+    if output_format == OUTPUT_FORMAT_BINARY:
+        _mark_formats(new_meta_content)
 
     # split_meta_file = os.path.join(meta_dir, 'split_' + os.path.basename(meta_file))
-    with open(meta_file, 'w') as f:
-        json.dump(new_meta_content, f, default=lambda o: o.__dict__, sort_keys=True, indent=2)
+    journal.commit(new_meta_content, delete_files=delete_files)
+
+
+def _mark_formats(meta_content):
+    """
+    Record the format of each resource of the metadata under FORMAT_KEY, so that the
+    resources that are not split or combined, and stay JSON, can be told from the
+    binary resources next to them without reading them.
+    """
+    for item in meta_content:
+        if isinstance(item, dict) and "URL" in item and item.get("Type", None) != "View":
+            for entry in [item] + list(item.get("LOD", {}).get("Levels", {}).values()):
+                entry[FORMAT_KEY] = OUTPUT_FORMAT_BINARY if "BinaryURL" in entry else OUTPUT_FORMAT_JSON
+
+
+def _split_output_files(task, result):
+    big_file, output_format = task[0], task[5]
+    split_files, _ = result
+    base_dir = os.path.dirname(big_file["full_path"])
+    output_files = [os.path.join(base_dir, split_file) for split_file in split_files or []]
+    if output_format == OUTPUT_FORMAT_BINARY:
+        output_files.extend([binary_url(output_file) for output_file in output_files])
+    return output_files
+
+
+def run_tasks(task_function, tasks, workers, on_result=None, footprints=None, memory_budget=None):
+    """
+    Call task_function with the arguments of each task, using a pool of worker
+    processes when more than one worker is asked for.  The results are returned
+    in the same order as the tasks.  When on_result is given it is called with
+    the index and result of each task as the task finishes, if it raises an
+    exception the tasks that have not started are cancelled.
+    With a memory_budget and the estimated footprints of the tasks, tasks are
+    started in order while the footprints of the tasks running, see
+    budget.task_footprint, add up to no more than what is left of the
+    memory_budget, and there are no more workers than could run at once.
+    A task is always started when no other task is running.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    results = [None] * len(tasks)
+    if workers < 2 or len(tasks) < 2:
+        for index, task in enumerate(tasks):
+            results[index] = task_function(*task)
+            if on_result is not None:
+                on_result(index, results[index])
+        return results
+
+    if memory_budget is None or footprints is None:
+        footprints, memory_budget = [0] * len(tasks), None
+    else:
+        footprints = [task_footprint(footprint) for footprint in footprints]
+        memory_budget = remaining_budget(memory_budget)
+        workers = max(1, min(workers, memory_budget // min(footprints)))
+
+    pending = deque(range(len(tasks)))
+    running = {}
+
+    def _can_start(index):
+        if len(running) >= workers:
+            return False
+        return not running or memory_budget is None or sum(footprints[other] for other in running.values()) + footprints[index] <= memory_budget
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        try:
+            while pending or running:
+                while pending and _can_start(pending[0]):
+                    index = pending.popleft()
+                    running[executor.submit(task_function, *tasks[index])] = index
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    results[index] = future.result()
+                    if on_result is not None:
+                        on_result(index, results[index])
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+    return results
+
+
+def _progress_counter(progress, total, done=0):
+    """
+    Returns a function to call with the bytes written by each task as it finishes,
+    that calls progress with the number of tasks done out of total and the bytes
+    written so far.  Progress is called once with the tasks already done straight
+    away.  Progress may raise an exception to stop the tasks, see run_tasks.
+    """
+    if progress is None:
+        return lambda bytes_written: None
+
+    counts = {"done": done, "bytes_written": 0}
+
+    def _task_done(bytes_written):
+        counts["done"] += 1
+        counts["bytes_written"] += bytes_written
+        progress(counts["done"], total, counts["bytes_written"])
+
+    progress(done, total, 0)
+    return _task_done
+
+
+def _run_journaled_tasks(journal, task_function, tasks, keys, sources, output_files, workers, instrumentation=None,
+                         stage_name=None, key_name=None, progress=None, footprints=None, memory_budget=None):
+    """
+    Run the tasks as run_tasks, each identified in the journal by its key and the
+    list of its source files, with the estimated footprints of the tasks counted
+    against the memory_budget.  The results of tasks finished by an earlier run are
+    taken from the journal, and every other task is recorded as it finishes with
+    the files given by output_files(task, result).  With instrumentation each task
+    that is run is measured as the stage_name, with its key as the key_name detail.
+    Tasks taken from the journal count as done for progress, see _progress_counter.
+    """
+    if instrumentation is not None:
+        task_function = partial(measured_call, stage_name, instrumentation.trace_memory, task_function)
+
+    results = [None] * len(tasks)
+    pending = []
+    for index, key in enumerate(keys):
+        if journal.finished(key, sources[index]):
+            results[index] = journal.result(key)
+        else:
+            pending.append(index)
+    task_done = _progress_counter(progress, len(tasks), len(tasks) - len(pending))
+
+    def _record(pending_index, result):
+        index = pending[pending_index]
+        if instrumentation is not None:
+            result, measurement = result
+            instrumentation.add(measurement, **{key_name: keys[index]})
+        results[index] = result
+        written_files = output_files(tasks[index], result)
+        journal.record(keys[index], sources[index], written_files, result)
+        task_done(sum(os.path.getsize(file_name) for file_name in written_files))
+
+    run_tasks(task_function, [tasks[index] for index in pending], workers, _record,
+               None if footprints is None else [footprints[index] for index in pending], memory_budget)
+    return results
+
+
+def _use_streaming(size, memory_limit):
+    return memory_limit is not None and size > memory_limit
+
+
+def _split_strategy(size, content_type, file_size_limit, memory_limit, memory_budget):
+    """
+    Whether to split a resource of size bytes by streaming it, and its estimated
+    footprint.  A resource is streamed when it is bigger than memory_limit, or when
+    splitting it in memory would not fit the memory_budget.  Only some types of
+    resource can be streamed, the others are split in memory regardless.
+    """
+    streaming = _use_streaming(size, memory_limit) or not fits_budget(in_memory_footprint(size), memory_budget)
+    if streaming and content_type in STREAMABLE_TYPES:
+        return True, streaming_footprint(file_size_limit)
+    return streaming, in_memory_footprint(size)
 
 
 def _combination_file_name(url, index):
@@ -381,9 +973,32 @@ def _combination_file_name(url, index):
     return combined_url
 
 
-def combine_webgl_output(meta_file, file_size_limit, delete_combined_source=False):
-    with open(meta_file) as f:
-        meta_content = json.load(f)
+def combine_webgl_output(meta_file, file_size_limit, delete_combined_source=False, workers=1, output_format=OUTPUT_FORMAT_JSON,
+                         instrumentation=None, progress=None, memory_budget=None):
+    """
+    Combine the small resources of a webGL export into files of up to file_size_limit.
+    Combination files are written with up to workers processes, set workers to None
+    to use one process for each CPU.
+    The combination files are written in the output_format, one of OUTPUT_FORMATS, for
+    the binary format the .bin files are listed under "BinaryURL" in the metadata, and
+    the format of every resource is marked as for split_webgl_output.
+    Resources are packed into the fewest files for each level of detail, returns
+    a packing report for each level, see packing.packing_report.
+    As for split_webgl_output, finished combination files are recorded in a journal
+    so that an interrupted combine continues from where it stopped, and the combined
+    sources are only deleted once the metadata file is replaced.
+    When an instrumentation.Instrumentation is given the writing of each combination
+    file is measured and added to its current stage, with the file URL as a detail.
+    Progress is reported for each combination file as for split_webgl_output.
+    With a memory_budget combination files are only written at the same time while
+    the estimated footprints of their resources in memory fit it, see budget.py.
+    """
+    journal = Journal(meta_file, "combine", {
+        "file_size_limit": file_size_limit, "delete_combined_source": delete_combined_source, "output_format": output_format})
+    if journal.is_committed():
+        return journal.finish()
+
+    meta_content = read_json(meta_file)
 
     meta_dir = os.path.dirname(meta_file)
     analysed_resources = _analyse_resources(meta_content, meta_dir)
@@ -406,34 +1021,19 @@ def combine_webgl_output(meta_file, file_size_limit, delete_combined_source=Fals
                 resources[level].append(lod_resource)
 
     combine = {}
+    report = {}
     for key in resources:
-        level_data = sorted(resources[key], key=lambda entry: entry['size'])
-        sizes = [d['size'] for d in level_data]
-
-        total = 0
-        count = 0
-
-        if key not in combine:
-            combine[key] = []
-
-        stack = []
-        for i, s in enumerate(sizes):
-            if total + s < file_size_limit:
-                count += 1
-                total += s
-                stack.append(level_data[i])
-            else:
-                if count < 2:
-                    break
-
-                combine[key].append(stack)
-                stack = [level_data[i]]
-                total = s
-                count = 1
-
-        if count > 1:
-            combine[key].append(stack)
-
+        level_data = resources[key]
+        # A combination file is a JSON list, each resource adds its separator and the list adds
+        # its brackets, less the separator of the first resource.
+        sizes = [d['size'] + len(ITEM_SEPARATOR) for d in level_data]
+        capacity = file_size_limit - 2 + len(ITEM_SEPARATOR)
+        bins = pack(sizes, capacity)
+        report[key] = packing_report(sizes, bins, capacity)
+        combine[key] = [[level_data[i] for i in contents] for contents in bins if len(contents) > 1]
+
+    tasks = []
+    footprints = []
     for key in combine:
         for i, combine_resources in enumerate(combine[key]):
             filename = _combination_file_name(combine_resources[0]["URL"], i)
@@ -441,54 +1041,241 @@ def combine_webgl_output(meta_file, file_size_limit, delete_combined_source=Fals
             for j, resource in enumerate(combine_resources):
                 combine_filenames.append(resource["full_path"])
                 if key == 'none':
-                    new_meta_content[resource["meta_index"]]["URL"] = filename
-                    new_meta_content[resource["meta_index"]]["Index"] = j
+                    meta_item = new_meta_content[resource["meta_index"]]
                 else:
-                    new_meta_content[resource["meta_index"]]["LOD"]["Levels"][key]["URL"] = filename
-                    new_meta_content[resource["meta_index"]]["LOD"]["Levels"][key]["Index"] = j
+                    meta_item = new_meta_content[resource["meta_index"]]["LOD"]["Levels"][key]
+                meta_item["URL"] = filename
+                meta_item["Index"] = j
+                if output_format == OUTPUT_FORMAT_BINARY:
+                    meta_item["BinaryURL"] = binary_url(filename)
+
+            tasks.append((combine_filenames, filename, False, meta_dir, output_format))
+            footprints.append(in_memory_footprint(sum(resource["size"] for resource in combine_resources)))
 
-            _combine_data_files(combine_filenames, filename, delete_combined_source, meta_dir)
+    _run_journaled_tasks(journal, _combine_data_files, tasks, [task[1] for task in tasks], [task[0] for task in tasks],
+                         _combination_output_files, workers, instrumentation, "combine_group", "combination", progress,
+                         footprints, memory_budget)
 
-    with open(meta_file, 'w') as f:
-        json.dump(new_meta_content, f, default=lambda o: o.__dict__, sort_keys=True, indent=2)
+    if output_format == OUTPUT_FORMAT_BINARY:
+        _mark_formats(new_meta_content)
 
+    delete_files = [_file for task in tasks for _file in task[0]] if delete_combined_source else []
+    return journal.commit(new_meta_content, report, delete_files)
 
-def _combine_data_files(combined_files, current_combination_filename, delete_combined_source, meta_dir):
+
+def _combination_output_files(task, result):
+    combination_file = os.path.join(task[3], task[1])
+    if task[4] == OUTPUT_FORMAT_BINARY:
+        return [combination_file, binary_url(combination_file)]
+    return [combination_file]
+
+
+def _combine_data_files(combined_files, current_combination_filename, delete_combined_source, meta_dir, output_format=OUTPUT_FORMAT_JSON):
     if len(combined_files):
-        combined_data = []
-        for _file in combined_files:
-            with open(_file) as fh:
-                data = json.load(fh)
-            combined_data.append(data)
+        combination_file = os.path.join(meta_dir, current_combination_filename)
+        if output_format == OUTPUT_FORMAT_BINARY:
+            _write_resource(combination_file, [_read_resource(_file) for _file in combined_files], output_format)
+        else:
+            concatenate_json_resources(combined_files, combination_file)
 
-            if delete_combined_source:
+        if delete_combined_source:
+            for _file in combined_files:
                 os.remove(_file)
 
-        with open(os.path.join(meta_dir, current_combination_filename), "w") as fh:
-            json.dump(combined_data, fh)
 
+def _precision_resources(meta_content, meta_dir):
+    """
+    The resource files of the metadata in JSON form, split or not, including levels of detail.
+    """
+    resources = {}
+    for item in meta_content:
+        if item.get("Type", None) == "View" or "BinaryURL" in item:
+            continue
+        entries = [item] + list(item.get("LOD", {}).get("Levels", {}).values())
+        for entry in entries:
+            if "BinaryURL" in entry:
+                continue
+            referenced_files({key: entry[key] for key in ["URL", "GlyphGeometriesURL"] if key in entry}, meta_dir, resources)
+
+    return [resource for resource in resources if os.path.isfile(resource)]
 
-def _parse_arguments():
-    parser = argparse.ArgumentParser(prog="json_resource_splitter")
-    parser.add_argument("webgl_meta", help="A webGL metadata file")
-    parser.add_argument("-s", "--size", help="Set text description of split limit, 1MB, 3GB etc.")
-    parser.add_argument("-d", "--delete", action="store_true", help="Delete big files that are split", default=False)
 
-    return parser.parse_args()
+def reduce_webgl_output_precision(meta_file, significant_digits=None, quantization_bits=None, memory_limit=MEMORY_LIMIT, workers=1,
+                                  report_file=None, progress=None):
+    """
+    Rewrite the resources of a webGL export with reduced precision, see
+    precision.reduce_resource_precision.  This is best done before the resources
+    are split so that the split files are filled with the smaller values.
+    Resources bigger than memory_limit are streamed from disk, and resources are
+    rewritten with up to workers processes, set workers to None to use one process
+    for each CPU.  Returns a report of the bytes saved and the errors introduced
+    for each resource along with totals, the report is also written to report_file
+    if given.  Progress is reported for each resource as for split_webgl_output.
+    """
+    meta_content = read_json(meta_file)
+
+    meta_dir = os.path.dirname(meta_file)
+    resources = _precision_resources(meta_content, meta_dir)
+    tasks = [(resource, significant_digits, quantization_bits, _use_streaming(os.path.getsize(resource), memory_limit))
+             for resource in resources]
+    task_done = _progress_counter(progress, len(tasks))
+    results = run_tasks(reduce_resource_precision, tasks, workers, lambda index, result: task_done(result["size_after"]))
+
+    files_report = {os.path.relpath(resource, meta_dir): result for resource, result in zip(resources, results)}
+    max_errors = {}
+    for result in results:
+        for attribute, error in result["max_errors"].items():
+            max_errors[attribute] = max(max_errors.get(attribute, 0.0), error)
+    report = {
+        "files": files_report,
+        "totals": {
+            "files": len(results),
+            "size_before": sum(result["size_before"] for result in results),
+            "size_after": sum(result["size_after"] for result in results),
+            "bytes_saved": sum(result["size_before"] - result["size_after"] for result in results),
+            "max_errors": max_errors,
+            "max_position_error": max([result["max_position_error"] for result in results], default=0.0),
+        },
+    }
 
+    if report_file is not None:
+        with open(report_file, 'w') as f:
+            json.dump(report, f, sort_keys=True, indent=2)
 
-def main():
-    args = _parse_arguments()
+    return report
 
-    if not os.path.isfile(args.webgl_meta):
-        sys.exit(3)
 
-    if args.size:
-        size_limit = convert_to_bytes(args.size)
-    else:
-        size_limit = FILE_SIZE_LIMIT
+def deduplicate_webgl_output_frames(meta_file, tolerance=0.0, memory_limit=MEMORY_LIMIT, workers=1, report_file=None, progress=None):
+    """
+    Rewrite the time varying resources of a webGL export with each distinct morph
+    frame kept once, see deduplication.deduplicate_resource_frames.  As for
+    reduce_webgl_output_precision this is best done before the resources are split,
+    resources bigger than memory_limit are streamed from disk and resources are
+    rewritten with up to workers processes.  Returns a report of the bytes saved and
+    the frames kept for each resource along with totals, the report is also written
+    to report_file if given.  Progress is reported for each resource as for split_webgl_output.
+    """
+    meta_content = read_json(meta_file)
+
+    meta_dir = os.path.dirname(meta_file)
+    resources = _precision_resources(meta_content, meta_dir)
+    tasks = [(resource, tolerance, _use_streaming(os.path.getsize(resource), memory_limit)) for resource in resources]
+    task_done = _progress_counter(progress, len(tasks))
+    results = run_tasks(deduplicate_resource_frames, tasks, workers, lambda index, result: task_done(result["size_after"]))
+
+    files_report = {os.path.relpath(resource, meta_dir): result for resource, result in zip(resources, results) if result["frames"]}
+    report = {
+        "files": files_report,
+        "totals": {
+            "files": len(files_report),
+            "size_before": sum(result["size_before"] for result in files_report.values()),
+            "size_after": sum(result["size_after"] for result in files_report.values()),
+            "bytes_saved": sum(result["size_before"] - result["size_after"] for result in files_report.values()),
+            "frames_before": sum(before for result in files_report.values() for before, _ in result["frames"].values()),
+            "frames_after": sum(after for result in files_report.values() for _, after in result["frames"].values()),
+            "max_error": max([result["max_error"] for result in results], default=0.0),
+        },
+    }
+
+    if report_file is not None:
+        with open(report_file, 'w') as f:
+            json.dump(report, f, sort_keys=True, indent=2)
+
+    return report
+
+
+def referenced_files(value, meta_dir, files):
+    """
+    Add the files named by any URL in the metadata value to files, in the order they are found.
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key.endswith("URL"):
+                for url in (item if isinstance(item, list) else [item]):
+                    if isinstance(url, str):
+                        files.setdefault(os.path.normpath(os.path.join(meta_dir, url)), None)
+            else:
+                referenced_files(item, meta_dir, files)
+    elif isinstance(value, list):
+        for item in value:
+            referenced_files(item, meta_dir, files)
+
+
+def compress_webgl_output(meta_file, workers=1, encodings=None, report_file=None, progress=None):
+    """
+    Write pre-compressed sidecars for the metadata file and every file it refers to,
+    using up to workers processes, set workers to None to use one process for each CPU.
+    The encodings are from compression.available_encodings(), by default all of them.
+    Sidecars that do not pay off are not kept.  Returns a report of the size of each
+    file and of its sidecars along with the total bytes sent for each encoding, the
+    report is also written to report_file if given.  Progress is reported for each
+    file as for split_webgl_output, counting the bytes of the sidecars kept.
+    """
+    meta_content = read_json(meta_file)
+
+    if encodings is None:
+        encodings = available_encodings()
+
+    meta_dir = os.path.dirname(meta_file)
+    files = {os.path.normpath(meta_file): None}
+    referenced_files(meta_content, meta_dir, files)
+    files = [file_name for file_name in files if os.path.isfile(file_name)]
+
+    task_done = _progress_counter(progress, len(files))
+    results = run_tasks(compress_file, [(file_name, encodings) for file_name in files], workers,
+                         lambda index, result: task_done(sum(result[encoding] or 0 for encoding in encodings)))
+    files_report = {os.path.relpath(file_name, meta_dir): result for file_name, result in zip(files, results)}
+    report = {
+        "files": files_report,
+        "totals": compression_totals(files_report, encodings),
+    }
+
+    if report_file is not None:
+        with open(report_file, 'w') as f:
+            json.dump(report, f, sort_keys=True, indent=2)
+
+    return report
+
+
+def webgl_output_statistics(meta_file):
+    """
+    Statistics of a webGL export: the number of resources of each type, how many
+    resources are split or combined, and the number and bytes of the files the
+    metadata file refers to, including itself, with the largest of them and any
+    that are missing.
+    """
+    meta_content = read_json(meta_file)
+
+    meta_dir = os.path.dirname(meta_file)
+    files = {os.path.normpath(meta_file): None}
+    referenced_files(meta_content, meta_dir, files)
+    sizes = {file_name: os.path.getsize(file_name) for file_name in files if os.path.isfile(file_name)}
+
+    types = {}
+    for item in meta_content:
+        content_type = item.get("Type", "not-specified")
+        types[content_type] = types.get(content_type, 0) + 1
+    largest_file = max(sizes, key=sizes.get) if sizes else None
+    return {
+        "resources": sum(count for content_type, count in types.items() if content_type != "View"),
+        "types": types,
+        "split_resources": sum(isinstance(item.get("URL", None), list) for item in meta_content),
+        "combined_resources": sum("Index" in item for item in meta_content),
+        "files": len(sizes),
+        "bytes": sum(sizes.values()),
+        "largest_file": None if largest_file is None else {"file": os.path.relpath(largest_file, meta_dir), "size": sizes[largest_file]},
+        "missing_files": [os.path.relpath(file_name, meta_dir) for file_name in files if file_name not in sizes],
+    }
+
+
+def main():
+    """
+    Split the webGL export of a metadata file, see the split command of cli.py
+    for the options.
+    """
+    from mapclientplugins.argonsceneexporterstep.splitter.cli import COMMAND_SPLIT, main as cli_main
 
-    split_webgl_output(args.webgl_meta, size_limit, args.delete)
+    sys.exit(cli_main([COMMAND_SPLIT] + sys.argv[1:]))
 
 
 if __name__ == "__main__":
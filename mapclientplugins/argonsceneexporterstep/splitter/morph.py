@@ -0,0 +1,133 @@
+"""
+Splitting of the morph data of threejs resources.
+
+Time varying resources hold a copy of an attribute for every time step, as a
+list of morph entries.  Taken together the morph entries of an attribute form
+a time step by value table.  A chunk only needs the columns of the table for
+the values it references, so each time step is gathered with the chunk's
+remap of the attribute in one operation.
+
+The bytes each value adds to a chunk through the morph entries are worked out
+for every value up front, see morph_value_costs, except for streamed resources
+where they are worked out a block of values at a time as the chunks need them,
+see BlockValueCosts, so that the memory used does not grow with the resource.
+"""
+from collections import OrderedDict
+from operator import add, itemgetter
+
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import ITEM_SEPARATOR, compact_text
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import THREEJS_MORPH_ATTRIBUTES
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import json_value_sizes
+
+# Values sized at a time by BlockValueCosts, and the number of blocks it keeps.
+BLOCK_VALUES = 16384
+CACHED_BLOCKS = 16
+
+
+def morph_data(large_content):
+    """
+    Return a dict of attribute to (morph key, morph entries) for the morph data of the resource.
+    """
+    morphs = {}
+    for morph_key, attribute in THREEJS_MORPH_ATTRIBUTES.items():
+        entries = large_content.get(morph_key, None)
+        if entries is not None and len(entries):
+            morphs[attribute] = (morph_key, entries)
+    return morphs
+
+
+def value_positions(source_indices, size):
+    """
+    The positions in a value store of the numbers of the source_indices, for values of size numbers.
+    """
+    return [size * source_index + offset for source_index in source_indices for offset in range(size)]
+
+
+def gather(value_store, positions):
+    """
+    Gather the numbers at positions from value_store, keeping the original
+    Python objects so that the chunk serialises exactly as before.
+    """
+    if len(positions) == 0:
+        return []
+    if len(positions) == 1:
+        return [value_store[positions[0]]]
+    return list(itemgetter(*positions)(value_store))
+
+
+def _empty_entry(entry, attribute):
+    return {key: [] if key == attribute else value for key, value in entry.items()}
+
+
+def morph_value_costs(entries, attribute, size, count):
+    """
+    The bytes the morph entries add to a chunk for each of the count source
+    values of the attribute, with a separator for every number.
+    """
+    costs = [0] * count
+    for entry in entries:
+        number_sizes = iter(json_value_sizes(entry[attribute][:size * count]))
+        value_costs = [len(ITEM_SEPARATOR) * size + sum(sizes) for sizes in zip(*[number_sizes] * size)]
+        value_costs.extend([0] * (count - len(value_costs)))
+        costs = list(map(add, costs, value_costs))
+    return costs
+
+
+class BlockValueCosts(object):
+    """
+    The bytes each value adds to a chunk, for values of size numbers held in each
+    of the stores, with a separator for every number.  A store shorter than the
+    others adds nothing for the values past its end.  The bytes are worked out a
+    block of BLOCK_VALUES values at a time as they are needed, keeping the
+    CACHED_BLOCKS used last, so the memory used does not grow with the stores.
+    """
+
+    def __init__(self, stores, size, count):
+        self._stores = stores
+        self._size = size
+        self._count = count
+        self._blocks = OrderedDict()
+
+    def _block(self, block_index):
+        block = self._blocks.get(block_index, None)
+        if block is not None:
+            self._blocks.move_to_end(block_index)
+            return block
+
+        start = block_index * BLOCK_VALUES
+        block = [0] * (min(start + BLOCK_VALUES, self._count) - start)
+        for store in self._stores:
+            number_sizes = iter(json_value_sizes(store[self._size * start:self._size * (start + len(block))]))
+            value_costs = [len(ITEM_SEPARATOR) * self._size + sum(sizes) for sizes in zip(*[number_sizes] * self._size)]
+            value_costs.extend([0] * (len(block) - len(value_costs)))
+            block = list(map(add, block, value_costs))
+
+        self._blocks[block_index] = block
+        if len(self._blocks) > CACHED_BLOCKS:
+            self._blocks.popitem(last=False)
+        return block
+
+    def __getitem__(self, source_index):
+        return self._block(source_index // BLOCK_VALUES)[source_index % BLOCK_VALUES]
+
+
+def morph_base_cost(entries, attribute):
+    """
+    The bytes the morph entries add to a chunk when it gets its first value of
+    the attribute, less the separator of the first number of each entry.
+    """
+    # An entry is written as {} until then.
+    return sum(len(compact_text(_empty_entry(entry, attribute))) - 2 - len(ITEM_SEPARATOR) for entry in entries)
+
+
+def split_morph_entries(entries, attribute, positions):
+    """
+    The morph entries for a chunk that references the numbers at positions of the
+    attribute, see value_positions.  A chunk without any values of the attribute
+    gets empty entries.
+    """
+    if len(positions) == 0:
+        return [{} for _ in entries]
+
+    return [{key: gather(value, positions) if key == attribute else value for key, value in entry.items()}
+            for entry in entries]
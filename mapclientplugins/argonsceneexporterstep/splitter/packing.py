@@ -0,0 +1,129 @@
+"""
+Packing of resources into combination files.
+
+Resources are packed into as few bins as possible, where the sizes in a bin
+must add up to no more than the capacity of the bin.  First fit decreasing is
+used for any number of resources, small sets of resources are then packed
+with an exact branch and bound search that starts from the first fit
+decreasing packing.
+"""
+import math
+
+# Largest number of items packed with the exact solver.
+EXACT_PACKING_LIMIT = 20
+# Number of search nodes the exact solver visits before settling for the best packing found.
+EXACT_PACKING_NODE_LIMIT = 50000
+
+
+def first_fit_decreasing(sizes, capacity):
+    """
+    Pack the sizes into bins of capacity with first fit decreasing.
+    Returns a list of bins, each bin a list of indices into sizes.
+    Sizes bigger than capacity are put in a bin of their own.
+    """
+    bins = []
+    loads = []
+    for index in sorted(range(len(sizes)), key=lambda i: sizes[i], reverse=True):
+        size = sizes[index]
+        for bin_index, load in enumerate(loads):
+            if load + size <= capacity:
+                bins[bin_index].append(index)
+                loads[bin_index] += size
+                break
+        else:
+            bins.append([index])
+            loads.append(size)
+
+    return bins
+
+
+def _lower_bound(sizes, capacity):
+    return math.ceil(sum(sizes) / capacity) if len(sizes) else 0
+
+
+def exact_packing(sizes, capacity, node_limit=EXACT_PACKING_NODE_LIMIT):
+    """
+    Pack the sizes into the fewest bins of capacity.
+    Every size must be no more than capacity.  The search stops after visiting
+    node_limit nodes, in which case the best packing found so far is returned.
+    Returns a list of bins, each bin a list of indices into sizes.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i], reverse=True)
+    best = [first_fit_decreasing(sizes, capacity)]
+    lower_bound = _lower_bound(sizes, capacity)
+    bins = []
+    loads = []
+    nodes = [0]
+
+    def _search(position):
+        if len(best[0]) == lower_bound or nodes[0] >= node_limit:
+            return
+        nodes[0] += 1
+
+        if position == len(order):
+            if len(bins) < len(best[0]):
+                best[0] = [list(contents) for contents in bins]
+            return
+
+        index = order[position]
+        size = sizes[index]
+        remaining = sum(sizes[i] for i in order[position:])
+        if len(bins) + math.ceil(max(0, remaining - sum(capacity - load for load in loads)) / capacity) >= len(best[0]):
+            return
+
+        tried = set()
+        for bin_index, load in enumerate(loads):
+            # Bins with the same load lead to the same packings.
+            if load + size <= capacity and load not in tried:
+                tried.add(load)
+                bins[bin_index].append(index)
+                loads[bin_index] += size
+                _search(position + 1)
+                loads[bin_index] -= size
+                bins[bin_index].pop()
+
+        if len(bins) + 1 < len(best[0]):
+            bins.append([index])
+            loads.append(size)
+            _search(position + 1)
+            loads.pop()
+            bins.pop()
+
+    _search(0)
+    return best[0]
+
+
+def pack(sizes, capacity, exact_limit=EXACT_PACKING_LIMIT):
+    """
+    Pack the sizes into as few bins of capacity as possible.
+    Sizes bigger than capacity are put in a bin of their own, the remaining
+    sizes are packed exactly when there are no more than exact_limit of them
+    and with first fit decreasing otherwise.
+    Returns a list of bins, each bin a list of indices into sizes.
+    """
+    oversized = [[index] for index, size in enumerate(sizes) if size > capacity]
+    fitting = [index for index, size in enumerate(sizes) if size <= capacity]
+    fitting_sizes = [sizes[index] for index in fitting]
+    if len(fitting) <= exact_limit:
+        bins = exact_packing(fitting_sizes, capacity)
+    else:
+        bins = first_fit_decreasing(fitting_sizes, capacity)
+
+    return [[fitting[index] for index in contents] for contents in bins] + oversized
+
+
+def packing_report(sizes, bins, capacity):
+    """
+    Describe how well the sizes were packed into the bins.
+    The lower bound is the fewest bins any packing could use, and the fill is
+    the fraction of the capacity of the bins that is used, ignoring bins that
+    hold a single size bigger than capacity.
+    """
+    fitting_sizes = [size for size in sizes if size <= capacity]
+    fitting_bins = len(bins) - (len(sizes) - len(fitting_sizes))
+    return {
+        "items": len(sizes),
+        "bins": len(bins),
+        "lower_bound": len(sizes) - len(fitting_sizes) + _lower_bound(fitting_sizes, capacity),
+        "fill": sum(fitting_sizes) / (fitting_bins * capacity) if fitting_bins else 1.0,
+    }
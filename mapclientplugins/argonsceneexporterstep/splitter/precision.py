@@ -0,0 +1,147 @@
+"""
+Precision reduction of threejs JSON and glyph resources.
+
+Floating point values are rounded to a number of significant digits chosen
+for each attribute, and positions can optionally be quantized to integers.
+Quantized positions use the threejs "scale" key, which the loader divides
+the vertices by, so the resource stays readable by existing clients.  The
+scale is chosen so that the largest extent of the bounding box of the
+positions spans 2 ** bits - 1 steps.
+
+Only the step size is bounded by the bits, not the integers themselves.
+The threejs loader has no offset to add back, so positions are not moved to
+the minimum of the bounding box first, and a mesh far from the origin has
+integers much larger than 2 ** bits.  Each axis spans at most 2 ** bits - 1
+steps, so the integers of an axis still differ by at most that much.
+
+Resources are rewritten a block of values at a time, so a resource held as
+memory-mapped views by the streaming reader is never expanded into Python
+lists, see rewriting.py.
+"""
+import math
+import os
+import re
+
+from mapclientplugins.argonsceneexporterstep.splitter.rewriting import Reduction, attribute_of, value_blocks, write_object
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import ITEM_SEPARATOR, read_json
+from mapclientplugins.argonsceneexporterstep.splitter.streaming import spooled_resource
+
+ATTRIBUTES = ["vertices", "normals", "colors", "uvs", "axes"]
+QUANTIZATION_KEY = "scale"
+
+_DIGITS_REGEX = re.compile(r'\s*(\w+)\s*=\s*(\d+)\s*$')
+
+
+def parse_significant_digits(text):
+    """
+    Parse a description like 'vertices=6, normals=3' into a dict of attribute to
+    significant digits.  Raises an exception for unknown attributes or bad values.
+    """
+    significant_digits = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        m = _DIGITS_REGEX.match(part)
+        if m is None or m.group(1) not in ATTRIBUTES or int(m.group(2)) < 1:
+            raise Exception(f"Invalid significant digits '{part.strip()}', expected <attribute>=<digits> "
+                            f"with an attribute from {', '.join(ATTRIBUTES)}.")
+        significant_digits[m.group(1)] = int(m.group(2))
+
+    return significant_digits
+
+
+def _position_arrays(content):
+    if "GlyphGeometriesURL" in content:
+        return []
+    arrays = [content.get("vertices", [])]
+    arrays.extend(entry.get("vertices", []) for entry in content.get("morphTargets", []))
+    return arrays
+
+
+def _quantization_scale(content, quantization_bits):
+    """
+    The scale that maps the largest extent of the bounding box of the positions onto
+    2 ** quantization_bits - 1 steps, or None if the positions cannot be quantized.
+    Positions are scaled about the origin, see the module notes.
+    """
+    if not quantization_bits or QUANTIZATION_KEY in content:
+        return None
+
+    lower = [math.inf] * 3
+    upper = [-math.inf] * 3
+    for positions in _position_arrays(content):
+        for block in value_blocks(positions):
+            if any(type(value) is not float or not math.isfinite(value) for value in block):
+                return None
+            for axis in range(3):
+                lower[axis] = min(lower[axis], min(block[axis::3], default=math.inf))
+                upper[axis] = max(upper[axis], max(block[axis::3], default=-math.inf))
+
+    extent = max(b - a for a, b in zip(lower, upper))
+    if not math.isfinite(extent) or extent <= 0.0:
+        return None
+
+    return (2 ** quantization_bits - 1) / extent
+
+
+def _reduce_geometries(geometries, output_file, significant_digits):
+    """
+    Glyph geometry files hold a list of geometries, they are rounded but not quantized.
+    """
+    reduction = Reduction(significant_digits, None)
+    with open(output_file, 'w') as fh:
+        fh.write('[')
+        for index, geometry in enumerate(geometries):
+            if index:
+                fh.write(ITEM_SEPARATOR)
+            write_object(fh, [(key, value, attribute_of(key, False)) for key, value in geometry.items()], reduction)
+        fh.write(']')
+
+    return reduction
+
+
+def _reduce_content(content, output_file, significant_digits, quantization_bits):
+    if isinstance(content, list):
+        return _reduce_geometries(content, output_file, significant_digits)
+
+    quantization_scale = _quantization_scale(content, quantization_bits)
+    reduction = Reduction(significant_digits, quantization_scale)
+    is_glyph = "GlyphGeometriesURL" in content
+    items = [(key, value, attribute_of(key, is_glyph)) for key, value in content.items()]
+    if quantization_scale is not None:
+        items.append((QUANTIZATION_KEY, quantization_scale, None))
+    with open(output_file, 'w') as fh:
+        write_object(fh, items, reduction)
+
+    return reduction
+
+
+def reduce_resource_precision(resource_file, significant_digits=None, quantization_bits=None, streaming=False):
+    """
+    Rewrite the resource in resource_file with its floating point values rounded to
+    the significant_digits given for each attribute, a dict of attribute to digits.
+    When quantization_bits is given the positions are quantized to integers with the
+    threejs scale key, unless the resource is already quantized.  With streaming the
+    resource is read with the streaming reader rather than loaded into memory.
+    Returns a dict with the size of the file before and after, the maximum absolute
+    error introduced for each attribute and the maximum distance a position moved.
+    """
+    if significant_digits is None:
+        significant_digits = {}
+
+    size_before = os.path.getsize(resource_file)
+    temporary_file = f"{resource_file}.precision"
+    if streaming:
+        with spooled_resource(resource_file) as content:
+            reduction = _reduce_content(content, temporary_file, significant_digits, quantization_bits)
+    else:
+        content = read_json(resource_file)
+        reduction = _reduce_content(content, temporary_file, significant_digits, quantization_bits)
+
+    os.replace(temporary_file, resource_file)
+    return {
+        "size_before": size_before,
+        "size_after": os.path.getsize(resource_file),
+        "max_errors": reduction.max_errors,
+        "max_position_error": reduction.max_position_error,
+    }
@@ -0,0 +1,134 @@
+"""
+Rewriting of threejs JSON and glyph resources a block of values at a time.
+
+A resource is written back out key by key, with the arrays of numbers of each
+attribute passed through a Reduction a block of values at a time, so a
+resource held as memory-mapped views by the streaming reader is never
+expanded into Python lists.  A Reduction with no significant digits and no
+quantization scale writes the values unchanged.
+"""
+import math
+
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import ITEM_SEPARATOR, KEY_SEPARATOR, compact_text
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import THREEJS_MORPH_ATTRIBUTES
+
+# Glyph arrays are dicts of time to array, mapped to the attribute they are rounded as.
+GLYPH_ATTRIBUTES = {
+    "positions": "vertices",
+    "axis1": "axes",
+    "axis2": "axes",
+    "axis3": "axes",
+    "scale": "axes",
+}
+# Number of values rewritten at a time, a multiple of 3 so positions stay whole.
+BLOCK_SIZE = 3 * 65536
+
+
+def _round_significant(value, digits):
+    if type(value) is not float or not math.isfinite(value) or value == 0.0:
+        return value
+    return float(f"{value:.{digits - 1}e}")
+
+
+class Reduction(object):
+    """
+    The precision reduction of one resource, keeping track of the errors it introduces.
+    """
+
+    def __init__(self, significant_digits, quantization_scale):
+        self._significant_digits = significant_digits
+        self._quantization_scale = quantization_scale
+        self.max_errors = {}
+        self.max_position_error = 0.0
+
+    def is_active(self, attribute):
+        if attribute == "vertices" and self._quantization_scale is not None:
+            return True
+        return attribute in self._significant_digits
+
+    def reduce(self, attribute, values):
+        if attribute == "vertices" and self._quantization_scale is not None:
+            scale = self._quantization_scale
+            reduced = [round(value * scale) if math.isfinite(value) else value for value in values]
+            restored = [value / scale if math.isfinite(value) else value for value in reduced]
+        else:
+            digits = self._significant_digits[attribute]
+            reduced = [_round_significant(value, digits) for value in values]
+            restored = reduced
+
+        errors = [abs(a - b) for a, b in zip(values, restored) if math.isfinite(a)]
+        if errors:
+            self.max_errors[attribute] = max(self.max_errors.get(attribute, 0.0), max(errors))
+        if attribute == "vertices" and len(values) % 3 == 0:
+            for index in range(0, len(values), 3):
+                error = math.hypot(values[index] - restored[index], values[index + 1] - restored[index + 1],
+                                   values[index + 2] - restored[index + 2])
+                if error > self.max_position_error:
+                    self.max_position_error = error
+
+        return reduced
+
+
+def value_blocks(values):
+    """
+    The values as lists of up to BLOCK_SIZE values, values may be a list or a memory-mapped view.
+    """
+    for start in range(0, len(values), BLOCK_SIZE):
+        yield list(values[start:start + BLOCK_SIZE])
+
+
+def _write_array(fh, values, attribute, reduction):
+    fh.write('[')
+    for index, block in enumerate(value_blocks(values)):
+        if index:
+            fh.write(ITEM_SEPARATOR)
+        if attribute is not None and reduction.is_active(attribute):
+            block = reduction.reduce(attribute, block)
+        fh.write(compact_text(block)[1:-1])
+    fh.write(']')
+
+
+def _write_value(fh, value, attribute, reduction):
+    """
+    Write value as JSON, reducing the precision of any arrays of numbers in it
+    as the given attribute.  Strings and numbers are written unchanged.
+    """
+    if isinstance(value, memoryview):
+        _write_array(fh, value, attribute, reduction)
+    elif attribute is None or not isinstance(value, (dict, list)):
+        fh.write(compact_text(value))
+    elif isinstance(value, dict):
+        write_object(fh, [(key, item, attribute) for key, item in value.items()], reduction)
+    elif len(value) and isinstance(value[0], (dict, list, memoryview)):
+        fh.write('[')
+        for index, item in enumerate(value):
+            if index:
+                fh.write(ITEM_SEPARATOR)
+            _write_value(fh, item, attribute, reduction)
+        fh.write(']')
+    else:
+        _write_array(fh, value, attribute, reduction)
+
+
+def write_object(fh, items, reduction):
+    """
+    Write a dict as JSON, items is a list of (key, value, attribute) tuples.
+    """
+    fh.write('{')
+    for index, (key, value, attribute) in enumerate(items):
+        if index:
+            fh.write(ITEM_SEPARATOR)
+        fh.write(compact_text(key) + KEY_SEPARATOR)
+        _write_value(fh, value, attribute, reduction)
+    fh.write('}')
+
+
+def attribute_of(key, is_glyph):
+    """
+    The attribute the values under key are rewritten as, or None to write them unchanged.
+    """
+    if is_glyph:
+        return GLYPH_ATTRIBUTES.get(key, None)
+    if key in ["vertices", "normals", "colors", "uvs"]:
+        return key
+    return THREEJS_MORPH_ATTRIBUTES.get(key, None)
@@ -0,0 +1,162 @@
+"""
+Reading and writing JSON with the fastest backend installed.
+
+Resources are parsed with orjson, simdjson or ujson when one is installed,
+and written with orjson or ujson, falling back to the json module otherwise.
+Files are read through a memory map, and written compactly, without spaces
+after separators, with every backend.  Floats are written as the shortest
+text that reads back as the same value.  Every writer of the splitter uses
+SEPARATORS, and sizes are planned with compact_text, so planned sizes match
+the files written.
+
+The backends do not all agree with the json module, so their results are
+checked and the json module is used instead when they differ:
+
+* orjson reads NaN and Infinity as errors, and ujson and simdjson may reject
+  them too, so a file a fast backend cannot parse is parsed again with json.
+* orjson writes NaN and Infinity as null, so output of a value holding NaN or
+  Infinity is written again with json, as are values a fast backend cannot
+  serialise.
+* orjson writes small floats without an exponent, 0.00001 rather than 1e-05,
+  so output that is over the size limit it is written for is written again
+  with json, which is never longer than the sizes the splitter plans with.
+"""
+import importlib
+import json
+import math
+import mmap
+import os
+
+BACKEND_ORJSON = "orjson"
+BACKEND_SIMDJSON = "simdjson"
+BACKEND_UJSON = "ujson"
+BACKEND_JSON = "json"
+# In order of preference, simdjson only parses.
+BACKENDS = [BACKEND_ORJSON, BACKEND_SIMDJSON, BACKEND_UJSON, BACKEND_JSON]
+PARSING_BACKENDS = BACKENDS
+SERIALISING_BACKENDS = [BACKEND_ORJSON, BACKEND_UJSON, BACKEND_JSON]
+# Separators of the compact JSON every backend writes.
+ITEM_SEPARATOR = ','
+KEY_SEPARATOR = ':'
+SEPARATORS = (ITEM_SEPARATOR, KEY_SEPARATOR)
+
+_modules = {}
+
+
+def _module(backend):
+    if backend not in _modules:
+        try:
+            _modules[backend] = importlib.import_module(backend)
+        except ImportError:
+            _modules[backend] = None
+    return _modules[backend]
+
+
+def available_backends(backends=BACKENDS):
+    """
+    The backends of backends that are installed, in order of preference.
+    """
+    return [backend for backend in backends if _module(backend) is not None]
+
+
+def _chosen_backend(backend, backends):
+    if backend is None:
+        return available_backends(backends)[0]
+    if backend not in backends or _module(backend) is None:
+        raise Exception(f"JSON backend '{backend}' is not installed or cannot be used, available: {', '.join(available_backends(backends))}.")
+    return backend
+
+
+def _parse(backend, data):
+    if backend == BACKEND_ORJSON:
+        return _module(backend).loads(data)
+    return _module(backend).loads(bytes(data))
+
+
+def parse_json(data, backend=None):
+    """
+    Parse the JSON in data, bytes or a buffer of bytes, with backend, by default
+    the preferred backend installed.
+    """
+    backend = _chosen_backend(backend, PARSING_BACKENDS)
+    if backend != BACKEND_JSON:
+        try:
+            return _parse(backend, data)
+        except ValueError:
+            pass
+
+    return _parse(BACKEND_JSON, data)
+
+
+def read_json(file_name, backend=None):
+    """
+    Parse the JSON file file_name through a memory map, see parse_json.
+    """
+    with open(file_name, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return parse_json(b'', backend)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as data:
+                return parse_json(data, backend)
+
+
+def compact_text(value, sort_keys=False, default=None):
+    """
+    Value serialised by the json module with SEPARATORS, as it is written to file.
+    """
+    return json.dumps(value, separators=SEPARATORS, sort_keys=sort_keys, default=default)
+
+
+def _has_non_finite(value):
+    """
+    True if value holds a float that is NaN or infinite, which orjson writes as null.
+    """
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(map(_has_non_finite, value.values()))
+    if isinstance(value, (list, tuple)):
+        try:
+            # Lists of numbers are summed in C, the sum is only not finite if a value is or it overflows.
+            if math.isfinite(sum(value)):
+                return False
+        except (TypeError, OverflowError):
+            pass
+        return any(map(_has_non_finite, value))
+    return False
+
+
+def _serialise(backend, value, sort_keys, default):
+    module = _module(backend)
+    if backend == BACKEND_ORJSON:
+        return module.dumps(value, default=default, option=module.OPT_SORT_KEYS if sort_keys else 0)
+    if backend == BACKEND_UJSON:
+        return module.dumps(value, sort_keys=sort_keys, default=default, escape_forward_slashes=False).encode()
+    return compact_text(value, sort_keys, default).encode()
+
+
+def serialise_json(value, sort_keys=False, size_limit=None, default=None, backend=None):
+    """
+    Serialise value as compact JSON bytes with backend, by default the preferred
+    backend installed.  When size_limit is given and the output of a fast backend
+    is bigger than it, the value is serialised with json instead, see the module
+    notes.  Default is called for objects that cannot otherwise be serialised.
+    """
+    backend = _chosen_backend(backend, SERIALISING_BACKENDS)
+    if backend != BACKEND_JSON:
+        try:
+            text = _serialise(backend, value, sort_keys, default)
+            if (size_limit is None or len(text) <= size_limit) and not (b'null' in text and _has_non_finite(value)):
+                return text
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    return _serialise(BACKEND_JSON, value, sort_keys, default)
+
+
+def write_json(file_name, value, sort_keys=False, size_limit=None, default=None, backend=None):
+    """
+    Write value to file_name as compact JSON, see serialise_json.
+    """
+    with open(file_name, 'wb') as f:
+        f.write(serialise_json(value, sort_keys, size_limit, default, backend))
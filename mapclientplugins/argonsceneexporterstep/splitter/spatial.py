@@ -0,0 +1,171 @@
+"""
+Spatially coherent ordering of the faces of threejs resources.
+
+Before a resource is split, its faces can be sorted by the Morton code of
+their centroid.  Sorting by Morton code visits the cells of an octree over
+the mesh depth first.  Each chunk cut from the sorted faces then covers a
+compact region of the mesh, and the chunks share fewer vertices.  A viewer
+can use the bounding box of each chunk to cull chunks, or to load only the
+chunks that are in view.
+
+Faces are moved in units, so that lines stay in pairs, and a unit is placed
+by the centroid of its first face.
+"""
+import mmap
+import tempfile
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bits of each coordinate in a Morton code, three coordinates fit in 63 bits.
+MORTON_BITS = 21
+# Number of units reordered at a time.
+REORDER_BLOCK_SIZE = 65536
+
+_MORTON_MASKS = [
+    (32, 0x1f00000000ffff),
+    (16, 0x1f0000ff0000ff),
+    (8, 0x100f00f00f00f00f),
+    (4, 0x10c30c30c30c30c3),
+    (2, 0x1249249249249249),
+]
+
+
+def _spread_bits(value):
+    """
+    Spread the bits of value so that there are two zero bits between each of them.
+    """
+    for shift, mask in _MORTON_MASKS:
+        value = (value | value << shift) & mask
+    return value
+
+
+def _bounds(vertices):
+    lower = [min(vertices[axis::3]) for axis in range(3)]
+    upper = [max(vertices[axis::3]) for axis in range(3)]
+    return lower, upper
+
+
+def _cell_scale(lower, upper):
+    """
+    The scale from positions to octree cells, the octree is a cube so that a
+    thin mesh is not divided more finely across its thickness.
+    """
+    extent = max(b - a for a, b in zip(lower, upper))
+    return (2 ** MORTON_BITS - 1) / extent if extent > 0 else 0.0
+
+
+def _morton_codes_python(faces, unit_starts, vertices):
+    lower, upper = _bounds(vertices)
+    scale = _cell_scale(lower, upper)
+    codes = []
+    for start in unit_starts[:-1]:
+        a, b, c = faces[start + 1:start + 4]
+        code = 0
+        for axis in range(3):
+            centroid = (vertices[3 * a + axis] + vertices[3 * b + axis] + vertices[3 * c + axis]) / 3
+            code |= _spread_bits(int((centroid - lower[axis]) * scale)) << axis
+        codes.append(code)
+    return codes
+
+
+def _morton_codes_numpy(faces, unit_starts, vertices):
+    positions = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    lower = positions.min(axis=0)
+    upper = positions.max(axis=0)
+    scale = _cell_scale(lower.tolist(), upper.tolist())
+    starts = np.asarray(unit_starts, dtype=np.int64)[:-1]
+    corners = np.asarray(faces, dtype=np.int64)[starts[:, None] + np.arange(1, 4)]
+    corner_positions = positions[corners]
+    # Summed in the same order as the Python codes, so both give the same order.
+    centroids = (corner_positions[:, 0] + corner_positions[:, 1] + corner_positions[:, 2]) / 3
+    cells = ((centroids - lower) * scale).astype(np.uint64)
+    codes = np.zeros(len(starts), dtype=np.uint64)
+    for axis in range(3):
+        value = cells[:, axis]
+        for shift, mask in _MORTON_MASKS:
+            value = (value | value << np.uint64(shift)) & np.uint64(mask)
+        codes |= value << np.uint64(axis)
+    return codes
+
+
+def morton_order(faces, unit_starts, vertices):
+    """
+    The order of the units of faces by the Morton code of the centroid of their
+    first face, unit_starts is the start of each unit followed by the end of the faces.
+    Units with the same code keep their original order.
+    """
+    if len(unit_starts) < 2:
+        return []
+
+    if np is not None:
+        return np.argsort(_morton_codes_numpy(faces, unit_starts, vertices), kind='stable')
+
+    codes = _morton_codes_python(faces, unit_starts, vertices)
+    return sorted(range(len(codes)), key=codes.__getitem__)
+
+
+def _reordered_blocks(faces, unit_starts, order):
+    """
+    Generator over the faces in their new order, a block of units at a time.
+    """
+    if np is not None:
+        face_array = np.asarray(faces, dtype=np.int64)
+        starts = np.asarray(unit_starts, dtype=np.int64)
+        lengths = np.diff(starts)
+        for block_start in range(0, len(order), REORDER_BLOCK_SIZE):
+            units = order[block_start:block_start + REORDER_BLOCK_SIZE]
+            unit_lengths = lengths[units]
+            offsets = np.cumsum(unit_lengths) - unit_lengths
+            positions = np.repeat(starts[units] - offsets, unit_lengths) + np.arange(int(unit_lengths.sum()))
+            yield array('q', face_array[positions].tobytes())
+        return
+
+    for block_start in range(0, len(order), REORDER_BLOCK_SIZE):
+        block = array('q')
+        for unit in order[block_start:block_start + REORDER_BLOCK_SIZE]:
+            block.extend(faces[unit_starts[unit]:unit_starts[unit + 1]])
+        yield block
+
+
+def reorder_faces(faces, unit_starts, order, spool_dir=None):
+    """
+    The faces with their units in the given order.  A list of faces gives a list,
+    otherwise the faces are written to a temporary file in spool_dir and returned
+    as a memory-mapped view, so that resources read by the streaming reader are
+    not brought into memory.
+    """
+    if isinstance(faces, list):
+        reordered = []
+        for block in _reordered_blocks(faces, unit_starts, order):
+            reordered.extend(block.tolist())
+        return reordered
+
+    if len(faces) == 0:
+        return []
+
+    with tempfile.TemporaryFile(prefix='.faces_', dir=spool_dir) as fh:
+        for block in _reordered_blocks(faces, unit_starts, order):
+            block.tofile(fh)
+        fh.flush()
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast('q')
+
+
+def bounding_box(vertices, scale=None):
+    """
+    The axis aligned bounding box of vertices as [[min x, min y, min z], [max x, max y, max z]],
+    positions quantized with the threejs scale are divided by it.  None if there are no vertices.
+    """
+    if len(vertices) < 3:
+        return None
+
+    lower, upper = _bounds(vertices)
+    if scale:
+        lower = [value / scale for value in lower]
+        upper = [value / scale for value in upper]
+    return [lower, upper]
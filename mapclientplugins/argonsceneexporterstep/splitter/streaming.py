@@ -0,0 +1,376 @@
+"""
+Incremental reading of threejs JSON resources.
+
+A resource is parsed without ever holding it in memory as Python objects.  The
+large numeric arrays (faces, vertices, normals, colours, uvs, morph data and
+glyph data) are spooled into native typed arrays on disk and handed back as
+memory-mapped views, which can be indexed and sliced just like the lists
+produced by ``json.load``.
+"""
+import json
+import mmap
+import os
+import shutil
+import tempfile
+
+from array import array
+from contextlib import contextmanager
+from json.decoder import scanstring
+
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import THREEJS_MORPH_ATTRIBUTES
+
+READ_BLOCK_SIZE = 1024 * 1024 * 4
+
+# Top level arrays that are spooled to disk, the 'uvs' are an array of these arrays.
+NUMERIC_KEYS = ["faces", "vertices", "normals", "colors"]
+NESTED_NUMERIC_KEYS = ["uvs"]
+# Top level arrays of objects, each object has a single numeric array.
+MORPH_KEYS = THREEJS_MORPH_ATTRIBUTES
+# Top level objects of glyph resources, each object maps time indices to numeric arrays.
+KEYED_NUMERIC_KEYS = ["axis1", "axis2", "axis3", "positions", "scale"]
+
+_WHITESPACE = ' \t\n\r'
+_FLOAT_MARKERS = ('.', 'e', 'E', 'N', 'I')
+
+
+class _JSONStreamReader(object):
+    """
+    Reads JSON text from a file handle a block at a time.
+    """
+
+    def __init__(self, fh, block_size=READ_BLOCK_SIZE):
+        self._fh = fh
+        self._block_size = block_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        if self._eof:
+            return False
+
+        data = self._fh.read(self._block_size)
+        if not data:
+            self._eof = True
+            return False
+
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skip any whitespace and return the next character without consuming it.
+        Returns an empty string at the end of the file.
+        """
+        while True:
+            buffer = self._buffer
+            pos = self._pos
+            buffer_len = len(buffer)
+            while pos < buffer_len and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < buffer_len:
+                return buffer[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, character):
+        found = self.peek()
+        if found != character:
+            raise ValueError(f"Expected '{character}' but found '{found}' while streaming JSON.")
+        self._pos += 1
+
+    def next_is(self, character):
+        """
+        Consume the next character if it is the given character.
+        """
+        if self.peek() == character:
+            self._pos += 1
+            return True
+        return False
+
+    def read_string(self):
+        self.expect('"')
+        while True:
+            try:
+                value, end = scanstring(self._buffer, self._pos)
+                self._pos = end
+                return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+    def read_value(self):
+        """
+        Read a complete JSON value of any type and return it as Python objects.
+        Only suitable for values that are known to be small.
+        """
+        self.peek()
+        start = self._pos
+        pos = start
+        depth = 0
+        in_string = False
+        escaped = False
+        while True:
+            buffer = self._buffer
+            buffer_len = len(buffer)
+            while pos < buffer_len:
+                character = buffer[pos]
+                pos += 1
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif character == '\\':
+                        escaped = True
+                    elif character == '"':
+                        in_string = False
+                        if depth == 0:
+                            return self._finish_value(start, pos)
+                elif character == '"':
+                    in_string = True
+                elif character in '[{':
+                    depth += 1
+                elif character in ']}':
+                    if depth == 0:
+                        return self._finish_value(start, pos - 1)
+                    depth -= 1
+                    if depth == 0:
+                        return self._finish_value(start, pos)
+                elif depth == 0 and (character == ',' or character in _WHITESPACE):
+                    return self._finish_value(start, pos - 1)
+
+            offset = pos - start
+            if not self._fill():
+                return self._finish_value(start, pos)
+            start = self._pos
+            pos = start + offset
+
+    def _finish_value(self, start, end):
+        self._pos = end
+        return json.loads(self._buffer[start:end])
+
+    def read_number_blocks(self):
+        """
+        Generator over the contents of an array of numbers, yields the text of
+        whole numbers separated by commas, a block at a time.
+        """
+        self.expect('[')
+        while True:
+            buffer = self._buffer
+            end = buffer.find(']', self._pos)
+            if end != -1:
+                segment = buffer[self._pos:end]
+                self._pos = end + 1
+                if segment.strip():
+                    yield segment
+                return
+
+            last_comma = buffer.rfind(',', self._pos)
+            if last_comma != -1:
+                segment = buffer[self._pos:last_comma]
+                self._pos = last_comma + 1
+                yield segment
+
+            if not self._fill():
+                raise ValueError("Unterminated array while streaming JSON.")
+
+
+class _NumberSpool(object):
+    """
+    A growing on disk array of numbers.  Numbers are stored as 64-bit
+    integers until the first non-integer value is seen, at which point the
+    spool is converted to 64-bit floats.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, 'wb')
+        self.typecode = 'q'
+        self.length = 0
+
+    def append(self, segment):
+        tokens = segment.split(',')
+        if self.typecode == 'q' and any(marker in segment for marker in _FLOAT_MARKERS):
+            self._convert_to_float()
+
+        if self.typecode == 'q':
+            values = array('q', map(int, tokens))
+        else:
+            values = array('d', map(float, tokens))
+
+        values.tofile(self._fh)
+        self.length += len(values)
+
+    def _convert_to_float(self):
+        self._fh.close()
+        integers = array('q')
+        with open(self.path, 'rb') as fh:
+            integers.fromfile(fh, self.length)
+        self._fh = open(self.path, 'wb')
+        array('d', integers).tofile(self._fh)
+        self.typecode = 'd'
+
+    def close(self):
+        self._fh.close()
+
+
+class _SpooledResource(object):
+    """
+    Owns the spool files and memory maps for one streamed resource.
+    """
+
+    def __init__(self, spool_dir):
+        self._spool_dir = spool_dir
+        self._spools = []
+        self._maps = []
+        self._views = []
+        self.content = {}
+
+    def new_spool(self):
+        spool = _NumberSpool(os.path.join(self._spool_dir, f"spool_{len(self._spools)}.bin"))
+        self._spools.append(spool)
+        return spool
+
+    def spool_array(self, reader):
+        spool = self.new_spool()
+        for segment in reader.read_number_blocks():
+            spool.append(segment)
+        spool.close()
+        return spool
+
+    def view(self, spool):
+        if spool.length == 0:
+            return []
+
+        with open(spool.path, 'rb') as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        view = memoryview(mapped).cast(spool.typecode)
+        self._views.append(view)
+        return view
+
+    def close(self):
+        self.content = {}
+        for view in self._views:
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._views = []
+        self._maps = []
+
+
+def _read_morph_entries(reader, resource, numeric_key):
+    entries = []
+    reader.expect('[')
+    if reader.next_is(']'):
+        return entries
+
+    while True:
+        entry = {}
+        reader.expect('{')
+        if not reader.next_is('}'):
+            while True:
+                key = reader.read_string()
+                reader.expect(':')
+                if key == numeric_key and reader.peek() == '[':
+                    entry[key] = resource.spool_array(reader)
+                else:
+                    entry[key] = reader.read_value()
+                if not reader.next_is(','):
+                    reader.expect('}')
+                    break
+        entries.append(entry)
+        if not reader.next_is(','):
+            reader.expect(']')
+            return entries
+
+
+def _read_nested_arrays(reader, resource):
+    spools = []
+    reader.expect('[')
+    if reader.next_is(']'):
+        return spools
+
+    while True:
+        spools.append(resource.spool_array(reader))
+        if not reader.next_is(','):
+            reader.expect(']')
+            return spools
+
+
+def _read_keyed_arrays(reader, resource):
+    spools = {}
+    reader.expect('{')
+    if reader.next_is('}'):
+        return spools
+
+    while True:
+        key = reader.read_string()
+        reader.expect(':')
+        if reader.peek() == '[':
+            spools[key] = resource.spool_array(reader)
+        else:
+            spools[key] = reader.read_value()
+        if not reader.next_is(','):
+            reader.expect('}')
+            return spools
+
+
+def _parse_resource(fh, resource):
+    reader = _JSONStreamReader(fh)
+    parsed = {}
+    reader.expect('{')
+    if reader.next_is('}'):
+        return parsed
+
+    while True:
+        key = reader.read_string()
+        reader.expect(':')
+        is_array = reader.peek() == '['
+        if key in NUMERIC_KEYS and is_array:
+            parsed[key] = resource.spool_array(reader)
+        elif key in NESTED_NUMERIC_KEYS and is_array:
+            parsed[key] = _read_nested_arrays(reader, resource)
+        elif key in MORPH_KEYS and is_array:
+            parsed[key] = _read_morph_entries(reader, resource, MORPH_KEYS[key])
+        elif key in KEYED_NUMERIC_KEYS and reader.peek() == '{':
+            parsed[key] = _read_keyed_arrays(reader, resource)
+        else:
+            parsed[key] = reader.read_value()
+
+        if not reader.next_is(','):
+            reader.expect('}')
+            return parsed
+
+
+def _map_spools(resource, value):
+    if isinstance(value, _NumberSpool):
+        return resource.view(value)
+    if isinstance(value, list):
+        return [_map_spools(resource, item) for item in value]
+    if isinstance(value, dict):
+        return {key: _map_spools(resource, item) for key, item in value.items()}
+    return value
+
+
+@contextmanager
+def spooled_resource(resource_file):
+    """
+    Context manager that streams a threejs JSON resource from disk.
+
+    Yields a dict with the same layout as ``json.load`` would return, but with
+    every large numeric array replaced by a read-only memory-mapped view.  The
+    views are only valid inside the context.  Integer valued arrays are kept as
+    integers, an array with any non-integer value is held as floats.
+    """
+    spool_dir = tempfile.mkdtemp(prefix='.spool_', dir=os.path.dirname(resource_file) or None)
+    resource = _SpooledResource(spool_dir)
+    try:
+        with open(resource_file) as fh:
+            parsed = _parse_resource(fh, resource)
+        resource.content = _map_spools(resource, parsed)
+        yield resource.content
+    finally:
+        resource.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
@@ -0,0 +1,305 @@
+"""
+Synthetic webGL exports for benchmarking the splitter.
+
+Scenes are written in the threejs JSON format of the webGL exporter, a
+metadata file listing surfaces, lines and glyphs, optionally with levels of
+detail and with morph colours for a number of time steps.  Surfaces and
+lines are wavy square grids, so neighbouring faces share vertices as they do
+in real exports.  Resources are written a block of values at a time, so
+scenes of several GiB can be generated without holding them in memory, and
+the same arguments always give the same files.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import types
+
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import (
+    THREEJS_TYPE_TRIANGLE, THREEJS_TYPE_VERTEX_NORMAL, THREEJS_TYPE_VERTEX_COLOUR)
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+SURFACE_FACE_MASK = THREEJS_TYPE_VERTEX_NORMAL | THREEJS_TYPE_VERTEX_COLOUR
+# Grid rows, or glyphs, written at a time.
+BLOCK_SIZE = 256
+# Grid side, or number of glyphs, of the resources measured to size a scene.
+PROBE_SIZE = 64
+# Levels of detail and how many grid points of the full resource each step of the level spans.
+LOD_LEVELS = {"medium": 2, "far": 4}
+GLYPH_GEOMETRY_SIDE = 4
+GRID_EXTENT = 100.0
+WAVE_HEIGHT = 10.0
+NOISE = 0.01
+
+
+def _write_value(fh, value):
+    """
+    Write value as JSON, a generator of lists is written as one array a block at a time.
+    """
+    if isinstance(value, types.GeneratorType):
+        fh.write('[')
+        first = True
+        for block in value:
+            if len(block):
+                fh.write(('' if first else ', ') + json.dumps(block)[1:-1])
+                first = False
+        fh.write(']')
+    elif isinstance(value, dict):
+        fh.write('{')
+        for index, (key, item) in enumerate(value.items()):
+            fh.write(('' if index == 0 else ', ') + json.dumps(key) + ': ')
+            _write_value(fh, item)
+        fh.write('}')
+    elif isinstance(value, list) and any(isinstance(item, (dict, types.GeneratorType)) for item in value):
+        fh.write('[')
+        for index, item in enumerate(value):
+            if index:
+                fh.write(', ')
+            _write_value(fh, item)
+        fh.write(']')
+    else:
+        fh.write(json.dumps(value))
+
+
+def _write_resource(file_name, content):
+    with open(file_name, 'w') as fh:
+        _write_value(fh, content)
+    return os.path.getsize(file_name)
+
+
+def _measured_size(content):
+    fh = io.StringIO()
+    _write_value(fh, content)
+    return fh.tell()
+
+
+def _height(x, y, phase=0.0):
+    return WAVE_HEIGHT * math.sin(x / 10.0 + phase) * math.cos(y / 15.0)
+
+
+def _grid_vertices(side, seed):
+    rng = random.Random(seed)
+    step = GRID_EXTENT / max(side - 1, 1)
+    for row_start in range(0, side, BLOCK_SIZE):
+        block = []
+        for row in range(row_start, min(row_start + BLOCK_SIZE, side)):
+            y = row * step
+            for column in range(side):
+                x = column * step
+                block.extend([x + rng.uniform(-NOISE, NOISE), y + rng.uniform(-NOISE, NOISE), _height(x, y) + rng.uniform(-NOISE, NOISE)])
+        yield block
+
+
+def _grid_normals(side):
+    step = GRID_EXTENT / max(side - 1, 1)
+    for row_start in range(0, side, BLOCK_SIZE):
+        block = []
+        for row in range(row_start, min(row_start + BLOCK_SIZE, side)):
+            y = row * step
+            for column in range(side):
+                x = column * step
+                dx = WAVE_HEIGHT / 10.0 * math.cos(x / 10.0) * math.cos(y / 15.0)
+                dy = -WAVE_HEIGHT / 15.0 * math.sin(x / 10.0) * math.sin(y / 15.0)
+                length = math.sqrt(dx * dx + dy * dy + 1.0)
+                block.extend([-dx / length, -dy / length, 1.0 / length])
+        yield block
+
+
+def _colour(value):
+    """
+    The hex colour of value in [-1, 1] on a blue to red scale.
+    """
+    t = min(max((value + 1.0) / 2.0, 0.0), 1.0)
+    return (int(255 * t) << 16) | (int(255 * (1.0 - abs(2.0 * t - 1.0))) << 8) | int(255 * (1.0 - t))
+
+
+def _grid_colours(side, phase=0.0):
+    step = GRID_EXTENT / max(side - 1, 1)
+    for row_start in range(0, side, BLOCK_SIZE):
+        yield [_colour(_height(column * step, row * step, phase) / WAVE_HEIGHT)
+               for row in range(row_start, min(row_start + BLOCK_SIZE, side)) for column in range(side)]
+
+
+def _surface_faces(side):
+    """
+    Two triangles for each cell of the grid, with the same indices for the vertex, normal and colour of each corner.
+    """
+    for row_start in range(0, side - 1, BLOCK_SIZE):
+        block = []
+        for row in range(row_start, min(row_start + BLOCK_SIZE, side - 1)):
+            for column in range(side - 1):
+                a = row * side + column
+                b = a + 1
+                c = a + side
+                d = c + 1
+                block.extend([SURFACE_FACE_MASK, a, b, d, a, b, d, a, b, d, SURFACE_FACE_MASK, a, d, c, a, d, c, a, d, c])
+        yield block
+
+
+def _line_faces(side):
+    """
+    A line along each row of the grid, each segment a pair of degenerate triangles.
+    """
+    for row_start in range(0, side, BLOCK_SIZE):
+        block = []
+        for row in range(row_start, min(row_start + BLOCK_SIZE, side)):
+            for column in range(side - 1):
+                a = row * side + column
+                b = a + 1
+                block.extend([THREEJS_TYPE_TRIANGLE, a, b, b, THREEJS_TYPE_TRIANGLE, b, a, a])
+        yield block
+
+
+def _metadata(side, face_count):
+    return {"version": 4, "type": "Geometry", "generator": "synthetic", "vertices": side * side, "faces": face_count}
+
+
+def surface_content(side, time_steps=0, seed=0):
+    """
+    The content of a surface resource on a grid of side by side vertices, with
+    morph colours for time_steps time steps when not zero.  Arrays are generators.
+    """
+    content = {
+        "metadata": _metadata(side, 2 * (side - 1) ** 2),
+        "materials": [{"DbgColor": 15658734, "DbgIndex": 0, "DbgName": "default", "vertexColors": True}],
+        "vertices": _grid_vertices(side, seed),
+        "normals": _grid_normals(side),
+        "colors": _grid_colours(side),
+        "faces": _surface_faces(side),
+    }
+    if time_steps:
+        content["morphColors"] = [{"name": f"time_{index}", "colors": _grid_colours(side, 2.0 * math.pi * index / time_steps)}
+                                  for index in range(time_steps)]
+    return content
+
+
+def lines_content(side, seed=0):
+    """
+    The content of a lines resource along the rows of a grid of side by side vertices.
+    """
+    return {
+        "metadata": _metadata(side, 2 * side * (side - 1)),
+        "materials": [{"DbgColor": 15658734, "DbgIndex": 0, "DbgName": "default"}],
+        "vertices": _grid_vertices(side, seed),
+        "faces": _line_faces(side),
+    }
+
+
+def _glyph_values(count, seed, scale=1.0):
+    rng = random.Random(seed)
+    for start in range(0, count, BLOCK_SIZE):
+        yield [scale * rng.uniform(-1.0, 1.0) for _ in range(3 * min(BLOCK_SIZE, count - start))]
+
+
+def glyph_content(count, geometry_url, time_steps=0, seed=0):
+    """
+    The content of a glyph resource with count glyphs, for one time or time_steps time steps.
+    """
+    times = [str(index) for index in range(max(time_steps, 1))]
+    content = {
+        "GlyphGeometriesURL": geometry_url,
+        "metadata": {"number_of_vertices": count, "number_of_time_steps": len(times)},
+        "label": [f"glyph {index + 1}" for index in range(count)],
+    }
+    for key_index, key in enumerate(["axis1", "axis2", "axis3", "positions", "scale"]):
+        scale = GRID_EXTENT if key == "positions" else 1.0
+        content[key] = {time: _glyph_values(count, seed + 1000 * key_index + time_index, scale) for time_index, time in enumerate(times)}
+    return content
+
+
+def _grid_side(size, content_function):
+    """
+    The grid side that makes the resource from content_function(side) about size bytes.
+    """
+    probe_size = _measured_size(content_function(PROBE_SIZE))
+    return max(2, round(PROBE_SIZE * math.sqrt(size / probe_size)))
+
+
+def _glyph_count(size, time_steps):
+    probe_size = _measured_size(glyph_content(PROBE_SIZE, "", time_steps))
+    return max(1, round(PROBE_SIZE * size / probe_size))
+
+
+def generate_scene(output_dir, size, surfaces=2, lines=1, glyphs=1, lod=False, time_steps=0, seed=0):
+    """
+    Write a synthetic webGL export to output_dir and return its metadata file.
+    The surfaces, lines and glyphs resources share about size bytes equally,
+    with morph colours or glyph times for time_steps time steps when not zero.
+    With lod the surfaces also have coarser levels of detail, see LOD_LEVELS.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    resource_count = surfaces + lines + glyphs
+    resource_size = size / max(resource_count, 1)
+
+    meta_content = []
+    surface_side = _grid_side(resource_size, lambda side: surface_content(side, time_steps))
+    for index in range(surfaces):
+        url = f"surface_{index + 1}.json"
+        side = surface_side
+        _write_resource(os.path.join(output_dir, url), surface_content(side, time_steps, seed + index))
+        item = {"Type": "Surfaces", "URL": url, "RegionPath": "", "GroupName": f"surface {index + 1}", "MorphColours": bool(time_steps)}
+        if lod:
+            levels = {}
+            for level, stride in LOD_LEVELS.items():
+                level_url = f"surface_{index + 1}_{level}.json"
+                _write_resource(os.path.join(output_dir, level_url), surface_content(max(2, (side - 1) // stride + 1), time_steps, seed + index))
+                levels[level] = {"URL": level_url}
+            item["LOD"] = {"Levels": levels}
+        meta_content.append(item)
+
+    lines_side = _grid_side(resource_size, lines_content)
+    for index in range(lines):
+        url = f"lines_{index + 1}.json"
+        _write_resource(os.path.join(output_dir, url), lines_content(lines_side, seed + surfaces + index))
+        meta_content.append({"Type": "Lines", "URL": url, "RegionPath": "", "GroupName": f"lines {index + 1}"})
+
+    if glyphs:
+        geometry_url = "glyph_geometry.json"
+        _write_resource(os.path.join(output_dir, geometry_url), [surface_content(GLYPH_GEOMETRY_SIDE)])
+    glyph_count = _glyph_count(resource_size, time_steps)
+    for index in range(glyphs):
+        url = f"glyph_{index + 1}.json"
+        _write_resource(os.path.join(output_dir, url), glyph_content(glyph_count, geometry_url, time_steps, seed + surfaces + lines + index))
+        meta_content.append({"Type": "Glyph", "URL": url, "GlyphGeometriesURL": geometry_url, "RegionPath": "", "GroupName": f"glyph {index + 1}"})
+
+    view_url = "view.json"
+    with open(os.path.join(output_dir, view_url), 'w') as f:
+        json.dump({"farPlane": 500.0, "nearPlane": 0.5, "eyePosition": [50.0, -150.0, 150.0], "targetPosition": [50.0, 50.0, 0.0],
+                   "upVector": [0.0, 0.0, 1.0], "viewAngle": 40.0}, f)
+    meta_content.append({"Type": "View", "URL": view_url})
+
+    meta_file = os.path.join(output_dir, "synthetic_metadata.json")
+    with open(meta_file, 'w') as f:
+        json.dump(meta_content, f, sort_keys=True, indent=2)
+
+    return meta_file
+
+
+def _parse_arguments():
+    parser = argparse.ArgumentParser(prog="synthetic_webgl_scene")
+    parser.add_argument("output_dir", help="Directory to write the scene to")
+    parser.add_argument("-s", "--size", default="16 MiB", help="Set text description of the size of the resources, 1MiB, 2GiB etc.")
+    parser.add_argument("--surfaces", type=int, default=2, help="Number of surfaces resources")
+    parser.add_argument("--lines", type=int, default=1, help="Number of lines resources")
+    parser.add_argument("--glyphs", type=int, default=1, help="Number of glyph resources")
+    parser.add_argument("-l", "--lod", action="store_true", help="Add levels of detail to the surfaces", default=False)
+    parser.add_argument("-t", "--time-steps", type=int, default=0, help="Number of time steps of morph colours and glyphs")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random perturbations")
+
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_arguments()
+    size = convert_to_bytes(args.size)
+    if size == -1:
+        raise Exception(f"Invalid size '{args.size}'.")
+
+    meta_file = generate_scene(args.output_dir, size, args.surfaces, args.lines, args.glyphs, args.lod, args.time_steps, args.seed)
+    print(meta_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Constants describing the threejs JSON format written by the webGL exporter.
+"""
+
+# Threejs types.
+THREEJS_TYPE_TRIANGLE = 0
+THREEJS_TYPE_MATERIAL = 2
+THREEJS_TYPE_VERTEX_TEX_COORD = 8
+THREEJS_TYPE_VERTEX_NORMAL = 32
+THREEJS_TYPE_FACE_COLOUR = 64
+THREEJS_TYPE_VERTEX_COLOUR = 128
+
+# Top level keys holding the morph entry of each time step of resources with
+# deduplicated morph frames, see deduplication.py.
+THREEJS_MORPH_FRAME_KEYS = {
+    "morphTargets": "morphTargetFrames",
+    "morphNormals": "morphNormalFrames",
+    "morphColors": "morphColorFrames",
+}
+# Top level keys copied into every chunk a resource is split into, scale is
+# used by quantized resources.
+THREEJS_COMMON_KEYS = ["metadata", "materials", "scale"] + list(THREEJS_MORPH_FRAME_KEYS.values())
+# Top level keys holding a list of morph entries, with the attribute each entry
+# has a copy of, under the same key, for every time step.
+THREEJS_MORPH_ATTRIBUTES = {
+    "morphTargets": "vertices",
+    "morphNormals": "normals",
+    "morphColors": "colors",
+}
@@ -0,0 +1,196 @@
+"""
+Merging of webGL exports of slices of the time steps of a scene.
+
+A time varying scene can be exported in parallel by exporting contiguous
+slices of its time steps separately, each slice being a complete webGL export
+with the frames of its own time steps.  The slices are merged into one export
+by joining the morph entries of each resource, and the time keyed arrays of
+glyphs, in time step order.  An attribute that does not change within a slice
+has no morph entries in it, so the slice's own values are repeated for each
+of its time steps.  Everything else is taken from the first slice, which
+starts at the initial time as the whole export does, and files that are the
+same in every slice, such as the view, are copied from it.
+
+The metadata of the slices is merged too: a morph flag of a resource, such as
+"MorphColours", is set when it is set in any slice, and the duration of the
+settings is that of all the time steps.
+"""
+import os
+import re
+import shutil
+
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import referenced_files, run_tasks
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import read_json, write_json
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import THREEJS_MORPH_ATTRIBUTES
+
+GLYPH_TIME_KEYS = ["axis1", "axis2", "axis3", "positions", "scale", "colors"]
+METADATA_KEY = "metadata"
+TIME_STEPS_KEY = "number_of_time_steps"
+# Metadata items with a boolean for each kind of morph data of the resource start with this.
+MORPH_FLAG_PREFIX = "Morph"
+SETTINGS_TYPE = "Settings"
+DURATION_KEYS = ["Duration", "OriginalDuration"]
+
+_TRAILING_NUMBER_REGEX = re.compile(r'^(.*?)(\d+)$')
+
+
+def time_step_time(index, number_of_time_steps, initial_time, finish_time):
+    """
+    The time of time step index of number_of_time_steps from initial_time to finish_time.
+    """
+    if number_of_time_steps < 2:
+        return initial_time
+    return initial_time + (finish_time - initial_time) * index / (number_of_time_steps - 1)
+
+
+def time_step_slices(number_of_time_steps, initial_time, finish_time, slices):
+    """
+    Divide the time steps into up to slices contiguous slices of at least two time
+    steps, so that every slice is exported with morph data.  Returns a list of the
+    first time step, number of time steps, initial time and finish time of each slice.
+    """
+    slices = max(1, min(slices, number_of_time_steps // 2))
+    bounds = [round(index * number_of_time_steps / slices) for index in range(slices + 1)]
+    return [(first, last - first, time_step_time(first, number_of_time_steps, initial_time, finish_time),
+             time_step_time(last - 1, number_of_time_steps, initial_time, finish_time))
+            for first, last in zip(bounds, bounds[1:])]
+
+
+def _renumbered(name, offset):
+    """
+    The name of a morph entry of a slice as it is in the whole export, where names
+    that end in the time step number are numbered from the start of the slice.
+    """
+    m = _TRAILING_NUMBER_REGEX.match(name) if isinstance(name, str) else None
+    if m is None or offset == 0:
+        return name
+    return m.group(1) + str(int(m.group(2)) + offset).zfill(len(m.group(2)))
+
+
+def _renumbered_time(time, offset):
+    return str(int(time) + offset) if time.isdigit() else time
+
+
+def _static_entries(content, morph_key, template, first_time_step, number_of_time_steps):
+    """
+    Morph entries repeating the values of the attribute of a slice where it does not
+    change, named after the template entry of another slice.
+    """
+    attribute = THREEJS_MORPH_ATTRIBUTES[morph_key]
+    entries = []
+    for time_step in range(first_time_step, first_time_step + number_of_time_steps):
+        entry = {attribute: content.get(attribute, [])}
+        if "name" in template:
+            entry = dict(name=_renumbered(template["name"], time_step), **entry)
+        entries.append(entry)
+    return entries
+
+
+def merge_time_step_contents(contents, slices):
+    """
+    Merge the contents of a resource in each of the slices, see time_step_slices,
+    into the content of the resource for all the time steps.
+    """
+    merged = dict(contents[0])
+    for morph_key in THREEJS_MORPH_ATTRIBUTES:
+        templates = [content[morph_key][0] for content in contents if len(content.get(morph_key, []))]
+        if templates:
+            entries = []
+            for content, (first_time_step, number_of_time_steps, _, _) in zip(contents, slices):
+                if morph_key not in content:
+                    entries.extend(_static_entries(content, morph_key, templates[0], first_time_step, number_of_time_steps))
+                    continue
+                for entry in content[morph_key]:
+                    entries.append(dict(entry, name=_renumbered(entry["name"], first_time_step)) if "name" in entry else entry)
+            merged[morph_key] = entries
+
+    if "GlyphGeometriesURL" in merged:
+        time_steps = 0
+        for key in GLYPH_TIME_KEYS:
+            if isinstance(merged.get(key, None), dict):
+                merged[key] = {_renumbered_time(time, first_time_step): values
+                               for content, (first_time_step, _, _, _) in zip(contents, slices) for time, values in content[key].items()}
+                time_steps = len(merged[key])
+        if isinstance(merged.get(METADATA_KEY, None), dict) and TIME_STEPS_KEY in merged[METADATA_KEY] and time_steps:
+            merged[METADATA_KEY] = dict(merged[METADATA_KEY], **{TIME_STEPS_KEY: time_steps})
+
+    return merged
+
+
+def _file_contents(file_name):
+    with open(file_name, 'rb') as f:
+        return f.read()
+
+
+def _duration(initial_time, finish_time):
+    # In whole seconds, as the webGL exporter writes it.
+    return f"PT{int(finish_time - initial_time)}S"
+
+
+def merge_time_step_metadata(meta_contents, slices):
+    """
+    Merge the metadata of each of the slices, see time_step_slices, into the metadata
+    of the whole export.  Items are taken from the first slice, with the morph flags
+    set in any slice and the duration of the settings over all the time steps.
+    """
+    if any(len(meta_content) != len(meta_contents[0]) for meta_content in meta_contents[1:]):
+        raise Exception("Time step slices have different resources and cannot be merged.")
+
+    merged = []
+    for items in zip(*meta_contents):
+        item = items[0]
+        if isinstance(item, dict):
+            item = dict(item)
+            for key, value in item.items():
+                if key.startswith(MORPH_FLAG_PREFIX) and isinstance(value, bool):
+                    item[key] = any(other.get(key, False) for other in items)
+            if item.get("Type", None) == SETTINGS_TYPE:
+                for key in DURATION_KEYS:
+                    if key in item:
+                        item[key] = _duration(slices[0][2], slices[-1][3])
+        merged.append(item)
+    return merged
+
+
+def merge_time_step_file(slice_files, slices, output_file):
+    """
+    Write the merge of the slice_files of one resource to output_file, files that are
+    the same in every slice are copied.  Returns the size of the file written.
+    """
+    first_contents = _file_contents(slice_files[0])
+    if all(_file_contents(slice_file) == first_contents for slice_file in slice_files[1:]):
+        shutil.copyfile(slice_files[0], output_file)
+    else:
+        contents = [read_json(slice_file) for slice_file in slice_files]
+        if not all(isinstance(content, dict) for content in contents):
+            raise Exception(f"Time step slices of '{os.path.basename(output_file)}' differ and cannot be merged.")
+        write_json(output_file, merge_time_step_contents(contents, slices))
+
+    return os.path.getsize(output_file)
+
+
+def merge_time_step_exports(slice_meta_files, slices, output_dir, workers=1):
+    """
+    Merge the webGL exports of the slices of the time steps, see time_step_slices,
+    given by their metadata files, into output_dir.  The files are merged with up to
+    workers processes, set workers to None to use one process for each CPU.
+    The merged metadata file is written last, so that the metadata file is only
+    replaced once every file is merged.  Returns the metadata file written.
+    """
+    meta_contents = [read_json(meta_file) for meta_file in slice_meta_files]
+    meta_content = meta_contents[0]
+
+    first_dir = os.path.dirname(slice_meta_files[0])
+    files = {}
+    referenced_files(meta_content, first_dir, files)
+    relative_names = [os.path.relpath(file_name, first_dir) for file_name in files if os.path.isfile(file_name)]
+    tasks = []
+    for relative_name in relative_names:
+        output_file = os.path.join(output_dir, relative_name)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        tasks.append(([os.path.join(os.path.dirname(meta_file), relative_name) for meta_file in slice_meta_files], slices, output_file))
+    run_tasks(merge_time_step_file, tasks, workers)
+
+    meta_file = os.path.join(output_dir, os.path.basename(slice_meta_files[0]))
+    write_json(meta_file, merge_time_step_metadata(meta_contents, slices))
+    return meta_file
@@ -1,9 +1,13 @@
 import re
 
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import ITEM_SEPARATOR, KEY_SEPARATOR, compact_text
+
 KNOWN_SIZES = ['B', 'KiB', 'MiB', 'GiB', 'TiB']
 
 units_regex = re.compile(r'[\d]+[ ]*(B|KiB|MiB|GiB|TiB)')
 
+_NON_FINITE_SIZES = {'nan': len('NaN'), 'inf': len('Infinity'), '-inf': len('-Infinity')}
+
 
 def convert_to_bytes(input_string):
     """
@@ -20,3 +24,33 @@ def convert_to_bytes(input_string):
         power = KNOWN_SIZES.index(units)
         result = int(float(input_string.replace(units, '')) * 1024**power)
     return result
+
+
+def json_list_key_size(key):
+    """
+    The number of bytes a key adds to a serialised chunk when its list gets a first value,
+    not counting the value itself.
+    """
+    # ',"key":[]' and the uvs are a list of lists.
+    return len(ITEM_SEPARATOR) + len(compact_text(key)) + len(KEY_SEPARATOR) + (4 if key == "uvs" else 2)
+
+
+def json_number_size(value):
+    """
+    The number of bytes value takes when serialised.
+    """
+    text = repr(value)
+    return _NON_FINITE_SIZES.get(text, len(text))
+
+
+def json_value_sizes(values, block_size=1024 * 1024):
+    """
+    The number of bytes each of the numbers in values takes when serialised.
+    The values only need to support len and slicing.
+    """
+    sizes = []
+    for start in range(0, len(values), block_size):
+        block = values[start:start + block_size]
+        serialised = compact_text(block if isinstance(block, list) else block.tolist())[1:-1]
+        sizes.extend(map(len, serialised.split(ITEM_SEPARATOR)))
+    return sizes
@@ -0,0 +1,243 @@
+"""
+NumPy implementation of the face splitting engine.
+
+Handles resources where every face has the same face mask, in which case the
+faces array has a fixed stride and can be viewed as a two dimensional array.
+The serialised size of every face is calculated for a window of faces at a
+time to find where each chunk ends, and each chunk is remapped with
+vectorised operations.  The chunks produced are identical to those from
+``json_resource._iter_face_chunks``.
+"""
+
+from copy import copy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from mapclientplugins.argonsceneexporterstep.splitter.morph import (
+    BlockValueCosts, gather, morph_base_cost, morph_data, morph_value_costs, split_morph_entries)
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import ITEM_SEPARATOR, compact_text
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import (
+    THREEJS_TYPE_TRIANGLE, THREEJS_TYPE_VERTEX_TEX_COORD, THREEJS_TYPE_VERTEX_NORMAL, THREEJS_TYPE_VERTEX_COLOUR,
+    THREEJS_COMMON_KEYS)
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import json_list_key_size, json_number_size
+
+# Face mask to the number of values each face uses in the faces array.
+FACE_MASK_STRIDES = {
+    0: 4,
+    32: 7,
+    128: 7,
+    160: 10,
+    168: 13,
+}
+
+
+def is_available():
+    return np is not None
+
+
+def face_mask_of(large_content):
+    """
+    Return the face mask shared by every face of the resource, or None if the
+    faces do not all have the same supported face mask.
+    """
+    if np is None:
+        return None
+
+    faces = large_content["faces"]
+    if len(faces) == 0:
+        return None
+
+    face_mask = faces[0]
+    stride = FACE_MASK_STRIDES.get(face_mask, None)
+    if stride is None or len(faces) % stride != 0:
+        return None
+
+    face_masks = np.asarray(faces, dtype=np.int64)[::stride]
+    if not np.all(face_masks == face_mask):
+        return None
+
+    return face_mask
+
+
+def _remap_first_appearance(indices):
+    """
+    Remap indices to 0..n-1 in order of first appearance.
+    Returns the source indices in their new order, the positions where they
+    first appear (in increasing order) and the remapped indices.
+    """
+    unique, first_index, inverse = np.unique(indices, return_index=True, return_inverse=True)
+    order = np.argsort(first_index, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return unique[order], first_index[order], rank[inverse.reshape(-1)]
+
+
+def _value_positions(source_indices, size):
+    return (source_indices[:, None] * size + np.arange(size)).reshape(-1).tolist()
+
+
+def _number_sizes(value_store):
+    return np.fromiter(map(json_number_size, value_store), dtype=np.int64, count=len(value_store))
+
+
+def _digit_counts(values):
+    return np.searchsorted(_POWERS_OF_TEN, values, side='right') + 1
+
+
+_POWERS_OF_TEN = None if np is None else np.array([10 ** power for power in range(1, 19)], dtype=np.int64)
+
+
+def _morph_entries(morphs, key):
+    return morphs[key][1] if key in morphs else None
+
+
+class _Attribute(object):
+    """
+    One kind of value referenced by the faces, with the bytes each source value
+    adds to a chunk the first time the chunk uses it.  With streaming the bytes
+    are worked out a block of values at a time as they are needed, rather than
+    kept for every value.
+    """
+
+    def __init__(self, key, size, value_store, morph_entries=None, streaming=False):
+        self.key = key
+        self.size = size
+        self.value_store = value_store
+        self.morph_entries = morph_entries
+        if streaming:
+            stores = [value_store] + [entry[key] for entry in morph_entries or []]
+            self._value_costs = BlockValueCosts(stores, size, len(value_store) // size)
+        else:
+            self._value_costs = _number_sizes(value_store).reshape(-1, size).sum(axis=1) + len(ITEM_SEPARATOR) * size
+            if morph_entries:
+                self._value_costs += np.asarray(morph_value_costs(morph_entries, key, size, len(self._value_costs)),
+                                                dtype=np.int64)
+        # Bytes for the key and list when the first value is added, the first value has no separator.
+        self.base_cost = json_list_key_size(key) - len(ITEM_SEPARATOR)
+        if morph_entries:
+            self.base_cost += morph_base_cost(morph_entries, key)
+
+    def value_costs(self, source_indices):
+        """
+        The bytes each of the source_indices adds to a chunk the first time the chunk uses it.
+        """
+        if isinstance(self._value_costs, BlockValueCosts):
+            return np.fromiter(map(self._value_costs.__getitem__, source_indices.tolist()), dtype=np.int64, count=len(source_indices))
+        return self._value_costs[source_indices]
+
+
+def iter_face_chunks(large_content, file_size_limit, face_mask, max_vertices=None, streaming=False):
+    """
+    Generator over the chunks of a faces based resource where every face has face_mask.
+    A chunk is cut when the next face would take it over file_size_limit bytes once
+    serialised, or over max_vertices vertices when that is given.  With streaming the
+    memory used does not grow with the resource, see _Attribute.
+    """
+    faces = large_content["faces"]
+    uvs = large_content.get("uvs", None)
+    morphs = morph_data(large_content)
+
+    common_items = {}
+    for common_key in THREEJS_COMMON_KEYS:
+        if common_key in large_content:
+            common_items[common_key] = copy(large_content[common_key])
+
+    stride = FACE_MASK_STRIDES[face_mask]
+    face_array = np.asarray(faces, dtype=np.int64).reshape(-1, stride)
+    face_count = len(face_array)
+
+    # In the order of the columns of the face array.
+    attributes = [_Attribute("vertices", 3, large_content["vertices"], _morph_entries(morphs, "vertices"), streaming)]
+    if face_mask & THREEJS_TYPE_VERTEX_NORMAL:
+        attributes.append(_Attribute("normals", 3, large_content["normals"], _morph_entries(morphs, "normals"), streaming))
+    if face_mask & THREEJS_TYPE_VERTEX_COLOUR:
+        attributes.append(_Attribute("colors", 1, large_content["colors"], _morph_entries(morphs, "colors"), streaming))
+    if face_mask & THREEJS_TYPE_VERTEX_TEX_COORD:
+        attributes.append(_Attribute("uvs", 2, uvs[0], streaming=streaming))
+
+    skeleton = common_items.copy()
+    skeleton["faces"] = []
+    for morph_key, entries in morphs.values():
+        skeleton[morph_key] = [{} for _ in entries]
+    # Size of a chunk before any faces are added, the first face has no separator.
+    base_size = len(compact_text(skeleton)) - len(ITEM_SEPARATOR) + sum(attribute.base_cost for attribute in attributes)
+    face_mask_cost = json_number_size(face_mask) + len(ITEM_SEPARATOR)
+
+    start = 0
+    window = max(2, file_size_limit // (stride * 8))
+    while start < face_count:
+        chunk_faces, remaps = _plan_chunk(face_array, start, window, attributes, base_size, face_mask_cost,
+                                          file_size_limit, face_mask, max_vertices)
+        window = chunk_faces + chunk_faces // 8 + 2
+
+        chunk = face_array[start:start + chunk_faces].copy()
+        split_data = common_items.copy()
+        split_data["faces"] = None
+        morph_positions = {}
+        for attribute_index, (attribute, remap) in enumerate(zip(attributes, remaps)):
+            source_indices, first_positions, remapped = remap
+            column = 1 + 3 * attribute_index
+            source_indices = source_indices[:np.searchsorted(first_positions, 3 * chunk_faces)]
+            chunk[:, column:column + 3] = remapped[:3 * chunk_faces].reshape(-1, 3)
+            positions = _value_positions(source_indices, attribute.size)
+            values = gather(attribute.value_store, positions)
+            split_data[attribute.key] = [values] if attribute.key == "uvs" else values
+            morph_positions[attribute.key] = positions
+
+        split_data["faces"] = chunk.reshape(-1).tolist()
+        for key, (morph_key, entries) in morphs.items():
+            split_data[morph_key] = split_morph_entries(entries, key, morph_positions.get(key, []))
+
+        start += chunk_faces
+        yield split_data
+
+
+def _plan_chunk(face_array, start, window, attributes, base_size, face_mask_cost, file_size_limit, face_mask, max_vertices=None):
+    """
+    Find how many faces from start fit in a chunk of file_size_limit bytes, and of
+    at most max_vertices vertices when that is given.
+    Looks at a window of faces at a time, doubling it until the chunk ends inside it.
+    Returns the number of faces and the first appearance remap of each attribute
+    over the window.
+    """
+    remaining = len(face_array) - start
+    while True:
+        block = face_array[start:start + window]
+        block_len = len(block)
+        costs = np.full(block_len, face_mask_cost, dtype=np.int64)
+        remaps = []
+        for attribute_index, attribute in enumerate(attributes):
+            column = 1 + 3 * attribute_index
+            source_indices, first_positions, remapped = _remap_first_appearance(block[:, column:column + 3])
+            costs += (_digit_counts(remapped) + len(ITEM_SEPARATOR)).reshape(-1, 3).sum(axis=1)
+            costs += np.bincount(first_positions // 3, weights=attribute.value_costs(source_indices),
+                                 minlength=block_len).astype(np.int64)
+            remaps.append((source_indices, first_positions, remapped))
+
+        sizes = base_size + np.cumsum(costs)
+        chunk_faces = int(np.searchsorted(sizes, file_size_limit, side='right'))
+        size_faces = chunk_faces
+        if max_vertices is not None:
+            # Vertices are the first attribute, a face adds the vertices that first appear in it.
+            vertex_counts = np.cumsum(np.bincount(remaps[0][1] // 3, minlength=block_len))
+            chunk_faces = min(chunk_faces, int(np.searchsorted(vertex_counts, max_vertices, side='right')))
+        if chunk_faces == block_len and block_len < remaining:
+            window *= 2
+            continue
+
+        if face_mask == THREEJS_TYPE_TRIANGLE and chunk_faces < remaining and chunk_faces % 2:
+            # Faces with a zero face mask are lines, chunks must hold vertex pairs.
+            chunk_faces -= 1
+
+        unit_faces = 2 if face_mask == THREEJS_TYPE_TRIANGLE and remaining > 1 else 1
+        if chunk_faces == 0 and size_faces >= unit_faces:
+            needed = vertex_counts[unit_faces - 1]
+            raise Exception(f"Cannot split faces into chunks of at most {max_vertices} vertices, a single face needs {needed} vertices.")
+        if chunk_faces == 0:
+            needed = sizes[min(1, block_len - 1)] if face_mask == THREEJS_TYPE_TRIANGLE else sizes[0]
+            raise Exception(f"Cannot split faces into files of at most {file_size_limit} bytes, a single face needs {needed} bytes.")
+
+        return chunk_faces, remaps
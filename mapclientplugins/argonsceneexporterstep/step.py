@@ -4,21 +4,57 @@ MAP Client Plugin Step
 import os
 import json
 
+from functools import partial
+
 from PySide6 import QtGui, QtWidgets, QtCore
 
 from mapclient.mountpoints.workflowstep import WorkflowStepMountPoint
-from mapclientplugins.argonsceneexporterstep.configuredialog import ConfigureDialog
+from mapclientplugins.argonsceneexporterstep import __version__
+from mapclientplugins.argonsceneexporterstep.cache import (
+    ExportCache, MAX_CACHE_AGE_DAYS, MAX_CACHE_SIZE, SECONDS_PER_DAY, export_fingerprint, package_versions)
+from mapclientplugins.argonsceneexporterstep.configuration import default_config, validate_config
+from mapclientplugins.argonsceneexporterstep.worker import ExportWorker
 from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
-from mapclientplugins.argonsceneexporterstep.splitter.json_resource import split_webgl_output, combine_webgl_output
 
-from cmlibs.exporter.flatmapsvg import ArgonSceneExporter as FlatmapSVGExporter
-from cmlibs.exporter.webgl import ArgonSceneExporter as WebGLExporter
-from cmlibs.exporter.vtk import ArgonSceneExporter as VTKExporter
-from cmlibs.exporter.wavefront import ArgonSceneExporter as WavefrontExporter
-from cmlibs.exporter.stl import ArgonSceneExporter as STLExporter
-from cmlibs.exporter.thumbnail import ArgonSceneExporter as ThumbnailExporter
-from cmlibs.exporter.image import ArgonSceneExporter as ImageExporter
-from cmlibs.exporter.mbfxml import ArgonSceneExporter as MBFXMLExporter
+STAGE_REPORT_FILE = 'export_stage_report.json'
+COMPRESSION_REPORT_FILE = 'export_compression_report.json'
+# Exports that render with an OpenGL context, which Qt only allows on the main thread.
+MAIN_THREAD_EXPORT_TYPES = ['thumbnail', 'image']
+PROGRESS_LABELS = {
+    'cache': 'Checking the export cache',
+    'set_document': 'Loading the document',
+    'export': 'Exporting the scene',
+    'precision': 'Reducing precision',
+    'split': 'Splitting resources',
+    'combine': 'Combining resources',
+    'compress': 'Compressing files',
+    'cache_store': 'Storing the export in the cache',
+}
+
+
+def _export_cache(output_dir, config):
+    max_size = convert_to_bytes(config.get('cacheSize', '1 GiB'))
+    max_age = config.get('cacheMaxAge', MAX_CACHE_AGE_DAYS) * SECONDS_PER_DAY
+    return ExportCache(output_dir, MAX_CACHE_SIZE if max_size == -1 else max_size, max_age)
+
+
+def _memory_budget(config):
+    """
+    The memory limit of the config in bytes, None when it is empty or not a size.
+    """
+    memory_limit = convert_to_bytes(config.get('memoryLimit', ''))
+    return None if memory_limit == -1 else memory_limit
+
+
+def _report_stage(worker, stage):
+    """
+    Report the start of stage to the worker, if there is one, and return the
+    progress function for the stage, see ExportWorker.report.
+    """
+    if worker is None:
+        return None
+    worker.report(stage)
+    return partial(worker.report, stage)
 
 
 class ArgonSceneExporterStep(WorkflowStepMountPoint):
@@ -42,11 +78,11 @@ class ArgonSceneExporterStep(WorkflowStepMountPoint):
         # Port data:
         self._document = None  # https://opencmiss.org/1.0/rdf-schema#ArgonDocument
         # Config:
-        self._config = {'identifier': '', 'exportType': 'webgl', 'prefix': '',
-                        'timeSteps': '', 'initialTime': '', 'finishTime': '',
-                        'outputDir': '', 'splitSize': '18 MiB', 'splitFiles': False,
-                        'combineSize': '703 KiB', 'combineFiles': False}
+        self._config = default_config()
         self._model = None
+        self._instrumentation = None
+        self._worker = None
+        self._progress_dialog = None
 
     def execute(self):
         """
@@ -56,55 +92,164 @@ class ArgonSceneExporterStep(WorkflowStepMountPoint):
         """
         # Put your execute step code here before calling the '_doneExecution' method.
         # os.path.join(self._location, self._config['identifier'])
-        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.CursorShape.WaitCursor)
-        try:
-            output_dir = self._config['outputDir'] if os.path.isabs(self._config['outputDir']) else os.path.join(self._location, self._config['outputDir'])
-            output_dir = os.path.realpath(output_dir)
-            if self._config['exportType'] == 'webgl':
-                self._model = WebGLExporter(output_dir)
-                self._model.setLoD(self._config.get("LODs", False))
-            elif self._config['exportType'] == 'vtk':
-                self._model = VTKExporter(output_dir)
-            elif self._config['exportType'] == 'wavefront':
-                self._model = WavefrontExporter(output_dir)
-            elif self._config['exportType'] == 'stl':
-                self._model = STLExporter(output_dir)
-            elif self._config['exportType'] == 'flatmapsvg':
-                self._model = FlatmapSVGExporter(output_dir)
-            elif self._config['exportType'] == 'thumbnail':
-                self._model = ThumbnailExporter(output_dir)
-            elif self._config['exportType'] == 'image':
-                self._model = ImageExporter(self._config['width'], self._config['height'], output_dir)
-            elif self._config['exportType'] == 'mbfxml':
-                self._model = MBFXMLExporter(output_dir)
-            else:
-                raise NotImplementedError('Current export type selection is not implemented.')
-
-            self._model.set_document(self._document)
-            number_of_time_steps = int(self._config['timeSteps']) if self._config['timeSteps'] else None
-            initial_time = float(self._config['initialTime']) if self._config['initialTime'] else None
-            finish_time = float(self._config['finishTime']) if self._config['finishTime'] else None
-            self._model.set_parameters({
-                "prefix": self._config['prefix'],
-                "numberOfTimeSteps": number_of_time_steps,
-                "initialTime": initial_time,
-                "finishTime": finish_time,
-            })
-
-            self._model.export()
-            if self._config['exportType'] == 'webgl':
-                if self._config['splitFiles']:
-                    split_size = convert_to_bytes(self._config['splitSize'])
-                    if split_size != -1:
-                        split_webgl_output(self._model.metadata_file(), split_size, True)
-                if self._config['combineFiles']:
-                    combine_size = convert_to_bytes(self._config['combineSize'])
-                    if combine_size != -1:
-                        combine_webgl_output(self._model.metadata_file(), combine_size, True)
+        if self._worker is not None:
+            return
+
+        output_dir = self._config['outputDir'] if os.path.isabs(self._config['outputDir']) else os.path.join(self._location, self._config['outputDir'])
+        output_dir = os.path.realpath(output_dir)
+        if self._config['exportType'] in MAIN_THREAD_EXPORT_TYPES:
+            QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.CursorShape.WaitCursor)
+            try:
+                self._run_export(output_dir)
+                self._doneExecution()
+            finally:
+                QtWidgets.QApplication.restoreOverrideCursor()
+            return
+
+        self._progress_dialog = QtWidgets.QProgressDialog('Starting the export', 'Cancel', 0, 0, self._main_window)
+        self._progress_dialog.setWindowTitle('Argon Scene Exporter')
+        self._progress_dialog.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
+        self._progress_dialog.setAutoReset(False)
+        self._progress_dialog.setAutoClose(False)
+        self._progress_dialog.setMinimumDuration(0)
+        self._worker = ExportWorker(partial(self._run_export, output_dir))
+        self._worker.progress.connect(self._export_progress)
+        self._worker.finished.connect(self._export_finished)
+        self._progress_dialog.canceled.connect(self._worker.cancel)
+        self._worker.start()
+
+    def _run_export(self, output_dir, worker=None):
+        """
+        Export to output_dir, reusing a cached export when asked to.  With a worker
+        this runs on the worker thread, reporting progress and checking for
+        cancellation between stages and between the resources of a stage.
+        """
+        # The exporters and the splitter are imported when the step is first
+        # executed, so loading a workflow does not pay for them.
+        from mapclientplugins.argonsceneexporterstep.splitter.instrumentation import Instrumentation
+
+        self._instrumentation = Instrumentation()
+        cache = None
+        reused = False
+        if self._config.get('cacheResults', False):
+            _report_stage(worker, 'cache')
+            with self._instrumentation.stage('cache') as stage:
+                cache = _export_cache(output_dir, self._config)
+                fingerprint = export_fingerprint(self._document.serialize(), self._config,
+                                                 dict(package_versions(['cmlibs.exporter', 'cmlibs.zinc']), plugin=__version__))
+                reused = cache.reuse(fingerprint)
+                stage['details']['reused'] = reused
+                if not reused:
+                    cache.begin()
+
+        if not reused:
+            self._export(output_dir, worker)
+            if cache is not None:
+                _report_stage(worker, 'cache_store')
+                with self._instrumentation.stage('cache_store'):
+                    cache.store(fingerprint)
+
+        if self._config.get('stageReport', False):
+            self._instrumentation.write_report(os.path.join(output_dir, STAGE_REPORT_FILE))
 
+    def _export_progress(self, stage, done, total, bytes_written):
+        label = PROGRESS_LABELS.get(stage, stage)
+        if total:
+            label += f': {done} of {total} done, {bytes_written / 2 ** 20:.1f} MiB written'
+        self._progress_dialog.setLabelText(label)
+        self._progress_dialog.setMaximum(total)
+        self._progress_dialog.setValue(done)
+
+    def _export_finished(self):
+        worker, self._worker = self._worker, None
+        self._progress_dialog.close()
+        self._progress_dialog = None
+        if worker.cancelled:
+            QtWidgets.QMessageBox.information(self._main_window, 'Argon Scene Exporter', 'The export was cancelled.')
+        elif worker.error is not None:
+            QtWidgets.QMessageBox.critical(self._main_window, 'Argon Scene Exporter', f'The export failed: {worker.error}')
+        else:
             self._doneExecution()
-        finally:
-            QtWidgets.QApplication.restoreOverrideCursor()
+
+    def _export(self, output_dir, worker=None):
+        from mapclientplugins.argonsceneexporterstep.exporters import create_exporter, export_time_steps
+
+        number_of_time_steps = int(self._config['timeSteps']) if self._config['timeSteps'] else None
+        initial_time = float(self._config['initialTime']) if self._config['initialTime'] else None
+        finish_time = float(self._config['finishTime']) if self._config['finishTime'] else None
+        parameters = {
+            "prefix": self._config['prefix'],
+            "numberOfTimeSteps": number_of_time_steps,
+            "initialTime": initial_time,
+            "finishTime": finish_time,
+        }
+        workers = self._config.get('workers', 1)
+        if (self._config['exportType'] == 'webgl' and self._config.get('parallelTimeSteps', False) and workers > 1 and
+                number_of_time_steps is not None and number_of_time_steps >= 4 and initial_time is not None and finish_time is not None):
+            self._model = None
+            progress = _report_stage(worker, 'export')
+            with self._instrumentation.stage('export', exportType=self._config['exportType'], parallelTimeSteps=True):
+                metadata_file = export_time_steps(self._document.serialize(), self._config['exportType'], output_dir, self._config,
+                                                  parameters, workers, progress)
+        else:
+            self._model = create_exporter(self._config['exportType'], output_dir, self._config)
+            _report_stage(worker, 'set_document')
+            with self._instrumentation.stage('set_document'):
+                self._model.set_document(self._document)
+            self._model.set_parameters(parameters)
+
+            _report_stage(worker, 'export')
+            with self._instrumentation.stage('export', exportType=self._config['exportType']):
+                self._model.export()
+            metadata_file = self._model.metadata_file() if self._config['exportType'] == 'webgl' else None
+
+        if self._config['exportType'] == 'webgl':
+            from mapclientplugins.argonsceneexporterstep.splitter.budget import MemorySampler
+            from mapclientplugins.argonsceneexporterstep.splitter.json_resource import (
+                split_webgl_output, combine_webgl_output, compress_webgl_output, reduce_webgl_output_precision)
+            from mapclientplugins.argonsceneexporterstep.splitter.precision import parse_significant_digits
+
+            memory_budget = _memory_budget(self._config)
+            sample_memory = memory_budget is not None
+            significant_digits = parse_significant_digits(self._config.get('significantDigits', ''))
+            quantization_bits = self._config.get('quantizationBits', 0)
+            if significant_digits or quantization_bits:
+                progress = _report_stage(worker, 'precision')
+                with self._instrumentation.stage('precision'):
+                    reduce_webgl_output_precision(metadata_file, significant_digits, quantization_bits, workers=workers, progress=progress)
+            if self._config['splitFiles']:
+                split_size = convert_to_bytes(self._config['splitSize'])
+                if split_size != -1:
+                    progress = _report_stage(worker, 'split')
+                    with self._instrumentation.stage('split', memoryBudget=memory_budget) as stage, MemorySampler(enabled=sample_memory) as sampler:
+                        split_webgl_output(metadata_file, split_size, True, workers=workers,
+                                           output_format=self._config.get('outputFormat', 'json'),
+                                           split_order=self._config.get('splitOrder', 'faces'),
+                                           max_vertices_per_chunk=self._config.get('maxVerticesPerChunk', 0) or None,
+                                           instrumentation=self._instrumentation, progress=progress, memory_budget=memory_budget)
+                    stage['peak_total_rss'] = sampler.peak
+            if self._config['combineFiles']:
+                combine_size = convert_to_bytes(self._config['combineSize'])
+                if combine_size != -1:
+                    progress = _report_stage(worker, 'combine')
+                    with self._instrumentation.stage('combine', memoryBudget=memory_budget) as stage, MemorySampler(enabled=sample_memory) as sampler:
+                        combine_webgl_output(metadata_file, combine_size, True, workers=workers,
+                                             output_format=self._config.get('outputFormat', 'json'),
+                                             instrumentation=self._instrumentation, progress=progress, memory_budget=memory_budget)
+                    stage['peak_total_rss'] = sampler.peak
+            if self._config.get('compressFiles', False):
+                progress = _report_stage(worker, 'compress')
+                with self._instrumentation.stage('compress') as stage:
+                    report = compress_webgl_output(metadata_file, workers=workers, progress=progress,
+                                                   report_file=os.path.join(output_dir, COMPRESSION_REPORT_FILE))
+                    stage['details']['totals'] = report['totals']
+
+    def stageReport(self):
+        """
+        The time, memory and bytes read and written by each stage of the last execution,
+        see splitter.instrumentation.Instrumentation.report, None before the step is executed.
+        """
+        return None if self._instrumentation is None else self._instrumentation.report()
 
     def setPortData(self, index, dataIn):
         """
@@ -131,6 +276,9 @@ class ArgonSceneExporterStep(WorkflowStepMountPoint):
         then set:
             self._configured = True
         """
+        # Only configuring the step needs the widgets of the dialog.
+        from mapclientplugins.argonsceneexporterstep.configuredialog import ConfigureDialog
+
         dlg = ConfigureDialog(self._main_window)
         dlg.setWorkflowLocation(self._location)
         dlg.identifierOccursCount = self._identifierOccursCount
@@ -171,9 +319,4 @@ class ArgonSceneExporterStep(WorkflowStepMountPoint):
         :param string: JSON representation of the configuration in a string.
         """
         self._config.update(json.loads(string))
-
-        d = ConfigureDialog()
-        d.setWorkflowLocation(self._location)
-        d.identifierOccursCount = self._identifierOccursCount
-        d.setConfig(self._config)
-        self._configured = d.validate()
+        self._configured = validate_config(self._config, self._identifierOccursCount, self._location)
@@ -269,14 +269,164 @@ class Ui_ConfigureDialog(object):
 
         self.gridLayout_2.addWidget(self.finishTime_lineEdit, 5, 1, 1, 2)
 
+        self.label_11 = QLabel(self.pageWebGL)
+        self.label_11.setObjectName(u"label_11")
+        self.label_11.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_11, 6, 0, 1, 1)
+
+        self.spinBoxWorkers = QSpinBox(self.pageWebGL)
+        self.spinBoxWorkers.setObjectName(u"spinBoxWorkers")
+        self.spinBoxWorkers.setMinimum(1)
+        self.spinBoxWorkers.setMaximum(256)
+
+        self.gridLayout_2.addWidget(self.spinBoxWorkers, 6, 1, 1, 1)
+
+        self.label_12 = QLabel(self.pageWebGL)
+        self.label_12.setObjectName(u"label_12")
+        self.label_12.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_12, 7, 0, 1, 1)
+
+        self.comboBoxOutputFormat = QComboBox(self.pageWebGL)
+        self.comboBoxOutputFormat.addItem("")
+        self.comboBoxOutputFormat.addItem("")
+        self.comboBoxOutputFormat.setObjectName(u"comboBoxOutputFormat")
+
+        self.gridLayout_2.addWidget(self.comboBoxOutputFormat, 7, 1, 1, 1)
+
+        self.label_13 = QLabel(self.pageWebGL)
+        self.label_13.setObjectName(u"label_13")
+        self.label_13.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_13, 8, 0, 1, 1)
+
+        self.checkBoxCompressWebGLOutput = QCheckBox(self.pageWebGL)
+        self.checkBoxCompressWebGLOutput.setObjectName(u"checkBoxCompressWebGLOutput")
+
+        self.gridLayout_2.addWidget(self.checkBoxCompressWebGLOutput, 8, 1, 1, 1)
+
+        self.label_14 = QLabel(self.pageWebGL)
+        self.label_14.setObjectName(u"label_14")
+        self.label_14.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_14, 9, 0, 1, 1)
+
+        self.lineEditSignificantDigits = QLineEdit(self.pageWebGL)
+        self.lineEditSignificantDigits.setObjectName(u"lineEditSignificantDigits")
+
+        self.gridLayout_2.addWidget(self.lineEditSignificantDigits, 9, 1, 1, 1)
+
+        self.label_15 = QLabel(self.pageWebGL)
+        self.label_15.setObjectName(u"label_15")
+        self.label_15.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_15, 10, 0, 1, 1)
+
+        self.spinBoxQuantizationBits = QSpinBox(self.pageWebGL)
+        self.spinBoxQuantizationBits.setObjectName(u"spinBoxQuantizationBits")
+        self.spinBoxQuantizationBits.setMaximum(31)
+
+        self.gridLayout_2.addWidget(self.spinBoxQuantizationBits, 10, 1, 1, 1)
+
+        self.label_16 = QLabel(self.pageWebGL)
+        self.label_16.setObjectName(u"label_16")
+        self.label_16.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_16, 11, 0, 1, 1)
+
+        self.comboBoxSplitOrder = QComboBox(self.pageWebGL)
+        self.comboBoxSplitOrder.addItem("")
+        self.comboBoxSplitOrder.addItem("")
+        self.comboBoxSplitOrder.setObjectName(u"comboBoxSplitOrder")
+
+        self.gridLayout_2.addWidget(self.comboBoxSplitOrder, 11, 1, 1, 1)
+
+        self.label_17 = QLabel(self.pageWebGL)
+        self.label_17.setObjectName(u"label_17")
+        self.label_17.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_17, 12, 0, 1, 1)
+
+        self.spinBoxMaxVerticesPerChunk = QSpinBox(self.pageWebGL)
+        self.spinBoxMaxVerticesPerChunk.setObjectName(u"spinBoxMaxVerticesPerChunk")
+        self.spinBoxMaxVerticesPerChunk.setMaximum(2147483647)
+
+        self.gridLayout_2.addWidget(self.spinBoxMaxVerticesPerChunk, 12, 1, 1, 1)
+
+        self.label_20 = QLabel(self.pageWebGL)
+        self.label_20.setObjectName(u"label_20")
+        self.label_20.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_20, 13, 0, 1, 1)
+
+        self.checkBoxParallelTimeSteps = QCheckBox(self.pageWebGL)
+        self.checkBoxParallelTimeSteps.setObjectName(u"checkBoxParallelTimeSteps")
+
+        self.gridLayout_2.addWidget(self.checkBoxParallelTimeSteps, 13, 1, 1, 1)
+
+        self.label_21 = QLabel(self.pageWebGL)
+        self.label_21.setObjectName(u"label_21")
+        self.label_21.setAlignment(Qt.AlignmentFlag.AlignRight|Qt.AlignmentFlag.AlignTrailing|Qt.AlignmentFlag.AlignVCenter)
+
+        self.gridLayout_2.addWidget(self.label_21, 14, 0, 1, 1)
+
+        self.lineEditMemoryLimit = QLineEdit(self.pageWebGL)
+        self.lineEditMemoryLimit.setObjectName(u"lineEditMemoryLimit")
+
+        self.gridLayout_2.addWidget(self.lineEditMemoryLimit, 14, 1, 1, 1)
+
         self.verticalSpacer = QSpacerItem(20, 40, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
 
-        self.gridLayout_2.addItem(self.verticalSpacer, 6, 2, 1, 1)
+        self.gridLayout_2.addItem(self.verticalSpacer, 15, 2, 1, 1)
 
         self.stackedWidget.addWidget(self.pageWebGL)
 
         self.formLayout_3.setWidget(4, QFormLayout.ItemRole.SpanningRole, self.stackedWidget)
 
+        self.label_18 = QLabel(self.configGroupBox)
+        self.label_18.setObjectName(u"label_18")
+
+        self.formLayout_3.setWidget(5, QFormLayout.ItemRole.LabelRole, self.label_18)
+
+        self.horizontalLayoutCache = QHBoxLayout()
+        self.horizontalLayoutCache.setObjectName(u"horizontalLayoutCache")
+        self.checkBoxCacheResults = QCheckBox(self.configGroupBox)
+        self.checkBoxCacheResults.setObjectName(u"checkBoxCacheResults")
+
+        self.horizontalLayoutCache.addWidget(self.checkBoxCacheResults)
+
+        self.lineEditCacheMaxSize = QLineEdit(self.configGroupBox)
+        self.lineEditCacheMaxSize.setObjectName(u"lineEditCacheMaxSize")
+
+        self.horizontalLayoutCache.addWidget(self.lineEditCacheMaxSize)
+
+        self.spinBoxCacheMaxAge = QSpinBox(self.configGroupBox)
+        self.spinBoxCacheMaxAge.setObjectName(u"spinBoxCacheMaxAge")
+        self.spinBoxCacheMaxAge.setMinimum(1)
+        self.spinBoxCacheMaxAge.setMaximum(3650)
+        self.spinBoxCacheMaxAge.setValue(30)
+
+        self.horizontalLayoutCache.addWidget(self.spinBoxCacheMaxAge)
+
+        self.pushButtonClearCache = QPushButton(self.configGroupBox)
+        self.pushButtonClearCache.setObjectName(u"pushButtonClearCache")
+
+        self.horizontalLayoutCache.addWidget(self.pushButtonClearCache)
+
+
+        self.formLayout_3.setLayout(5, QFormLayout.ItemRole.FieldRole, self.horizontalLayoutCache)
+
+        self.label_19 = QLabel(self.configGroupBox)
+        self.label_19.setObjectName(u"label_19")
+
+        self.formLayout_3.setWidget(6, QFormLayout.ItemRole.LabelRole, self.label_19)
+
+        self.checkBoxStageReport = QCheckBox(self.configGroupBox)
+        self.checkBoxStageReport.setObjectName(u"checkBoxStageReport")
+
+        self.formLayout_3.setWidget(6, QFormLayout.ItemRole.FieldRole, self.checkBoxStageReport)
+
 
         self.gridLayout.addWidget(self.configGroupBox, 0, 0, 1, 1)
 
@@ -343,5 +493,71 @@ class Ui_ConfigureDialog(object):
         self.label_4.setText(QCoreApplication.translate("ConfigureDialog", u"Time Steps :", None))
         self.label.setText(QCoreApplication.translate("ConfigureDialog", u"Initial Time (s) :", None))
         self.label_2.setText(QCoreApplication.translate("ConfigureDialog", u"Finish Time (s) :", None))
+        self.label_11.setText(QCoreApplication.translate("ConfigureDialog", u"Workers :", None))
+#if QT_CONFIG(tooltip)
+        self.spinBoxWorkers.setToolTip(QCoreApplication.translate("ConfigureDialog", u"The number of processes used to split and combine the output files, and to export time steps in parallel.", None))
+#endif // QT_CONFIG(tooltip)
+        self.label_12.setText(QCoreApplication.translate("ConfigureDialog", u"Output format :", None))
+        self.comboBoxOutputFormat.setItemText(0, QCoreApplication.translate("ConfigureDialog", u"json", None))
+        self.comboBoxOutputFormat.setItemText(1, QCoreApplication.translate("ConfigureDialog", u"binary", None))
+
+#if QT_CONFIG(tooltip)
+        self.comboBoxOutputFormat.setToolTip(QCoreApplication.translate("ConfigureDialog", u"The format split and combined output files are written in, binary files hold typed arrays.", None))
+#endif // QT_CONFIG(tooltip)
+        self.label_13.setText(QCoreApplication.translate("ConfigureDialog", u"Compress output files :", None))
+#if QT_CONFIG(tooltip)
+        self.checkBoxCompressWebGLOutput.setToolTip(QCoreApplication.translate("ConfigureDialog", u"If checked, writes pre-compressed gzip and brotli copies of the output files next to them.", None))
+#endif // QT_CONFIG(tooltip)
+        self.checkBoxCompressWebGLOutput.setText("")
+        self.label_14.setText(QCoreApplication.translate("ConfigureDialog", u"Significant digits :", None))
+#if QT_CONFIG(tooltip)
+        self.lineEditSignificantDigits.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Significant digits to round each attribute to, vertices=6, normals=3 etc. Leave empty to keep full precision.", None))
+#endif // QT_CONFIG(tooltip)
+        self.label_15.setText(QCoreApplication.translate("ConfigureDialog", u"Quantization bits :", None))
+#if QT_CONFIG(tooltip)
+        self.spinBoxQuantizationBits.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Quantize positions to integers with this many bits, 0 to keep positions as floats.", None))
+#endif // QT_CONFIG(tooltip)
+        self.label_16.setText(QCoreApplication.translate("ConfigureDialog", u"Split order :", None))
+        self.comboBoxSplitOrder.setItemText(0, QCoreApplication.translate("ConfigureDialog", u"faces", None))
+        self.comboBoxSplitOrder.setItemText(1, QCoreApplication.translate("ConfigureDialog", u"morton", None))
+
+#if QT_CONFIG(tooltip)
+        self.comboBoxSplitOrder.setToolTip(QCoreApplication.translate("ConfigureDialog", u"The order faces are split in, morton splits surfaces and lines into compact regions and lists their bounding boxes.", None))
+#endif // QT_CONFIG(tooltip)
+        self.label_17.setText(QCoreApplication.translate("ConfigureDialog", u"Maximum vertices per split file :", None))
+#if QT_CONFIG(tooltip)
+        self.spinBoxMaxVerticesPerChunk.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Maximum number of vertices in a split file of surfaces or lines, 65535 lets every split file use 16 bit indices, 0 for no maximum.", None))
+#endif // QT_CONFIG(tooltip)
+        self.label_20.setText(QCoreApplication.translate("ConfigureDialog", u"Parallel time steps :", None))
+#if QT_CONFIG(tooltip)
+        self.checkBoxParallelTimeSteps.setToolTip(QCoreApplication.translate("ConfigureDialog", u"If checked, the workers export slices of the time steps in parallel, which are merged into one export. Needs the time steps, initial time and finish time.", None))
+#endif // QT_CONFIG(tooltip)
+        self.checkBoxParallelTimeSteps.setText("")
+        self.label_21.setText(QCoreApplication.translate("ConfigureDialog", u"Memory limit :", None))
+#if QT_CONFIG(tooltip)
+        self.lineEditMemoryLimit.setToolTip(QCoreApplication.translate("ConfigureDialog", u"The memory the split and combine may use, as a number with a unit, e.g. 4 GiB.  Big files are split by streaming them and fewer files are processed at the same time to fit it.  Leave empty for no limit.", None))
+#endif // QT_CONFIG(tooltip)
+        self.label_18.setText(QCoreApplication.translate("ConfigureDialog", u"Cache results :", None))
+#if QT_CONFIG(tooltip)
+        self.checkBoxCacheResults.setToolTip(QCoreApplication.translate("ConfigureDialog", u"If checked, the export is skipped when the document and configuration are unchanged since an earlier export to the output directory.", None))
+#endif // QT_CONFIG(tooltip)
+        self.checkBoxCacheResults.setText("")
+#if QT_CONFIG(tooltip)
+        self.lineEditCacheMaxSize.setToolTip(QCoreApplication.translate("ConfigureDialog", u"The maximum size of the stored exports, as a number with an optional unit, e.g. 1 GiB.", None))
+#endif // QT_CONFIG(tooltip)
+        self.lineEditCacheMaxSize.setText(QCoreApplication.translate("ConfigureDialog", u"1 GiB", None))
+#if QT_CONFIG(tooltip)
+        self.spinBoxCacheMaxAge.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Stored exports not used for this many days are removed.", None))
+#endif // QT_CONFIG(tooltip)
+        self.spinBoxCacheMaxAge.setSuffix(QCoreApplication.translate("ConfigureDialog", u" days", None))
+#if QT_CONFIG(tooltip)
+        self.pushButtonClearCache.setToolTip(QCoreApplication.translate("ConfigureDialog", u"Remove the stored exports from the output directory, the next execution always exports.", None))
+#endif // QT_CONFIG(tooltip)
+        self.pushButtonClearCache.setText(QCoreApplication.translate("ConfigureDialog", u"Clear", None))
+        self.label_19.setText(QCoreApplication.translate("ConfigureDialog", u"Write stage report :", None))
+#if QT_CONFIG(tooltip)
+        self.checkBoxStageReport.setToolTip(QCoreApplication.translate("ConfigureDialog", u"If checked, writes the time, memory and bytes read and written by each stage of the export to export_stage_report.json in the output directory.", None))
+#endif // QT_CONFIG(tooltip)
+        self.checkBoxStageReport.setText("")
     # retranslateUi
 
@@ -0,0 +1,50 @@
+"""
+Background thread for running an export.
+"""
+import threading
+
+from PySide6 import QtCore
+
+
+class ExportCancelled(Exception):
+    """
+    Raised in the export thread at the next check after cancel is called.
+    """
+
+
+class ExportWorker(QtCore.QThread):
+    """
+    Runs export_function(worker) on its own thread so the user interface stays
+    responsive.  The export calls report as it goes, which emits progress with
+    the stage, the resources done out of the total, 0 when unknown, and the bytes
+    written so far, and raises ExportCancelled once cancel has been called.
+    When the thread finishes the outcome is in cancelled and error.
+    """
+
+    progress = QtCore.Signal(str, int, int, object)
+
+    def __init__(self, export_function, parent=None):
+        super(ExportWorker, self).__init__(parent)
+        self._export_function = export_function
+        self._cancel_requested = threading.Event()
+        self.cancelled = False
+        self.error = None
+
+    def cancel(self):
+        self._cancel_requested.set()
+
+    def check_cancelled(self):
+        if self._cancel_requested.is_set():
+            raise ExportCancelled()
+
+    def report(self, stage, done=0, total=0, bytes_written=0):
+        self.check_cancelled()
+        self.progress.emit(stage, done, total, bytes_written)
+
+    def run(self):
+        try:
+            self._export_function(self)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
@@ -36,6 +36,7 @@ readme = readfile("README.rst", split=True)[3:]  # skip title
 # For requirements not hosted on PyPi place listings
 # into the 'requirements.txt' file.
 requires = ['PySide6', 'cmlibs.exporter >= 0.6.2']  # minimal requirements listing
+extras = {'fast': ['numpy', 'orjson'], 'brotli': ['brotli']}  # optional requirements for faster splitting and JSON, and brotli compression of webGL output
 source_license = readfile("LICENSE")
 
 
@@ -52,9 +53,13 @@ setup(
     author='Kay Wang',
     author_email='',
     url='',
-    packages=find_packages(exclude=['ez_setup', ]),
+    packages=find_packages(exclude=['ez_setup', 'tests', 'tests.*']),
     namespace_packages=['mapclientplugins'],
     include_package_data=True,
     zip_safe=False,
     install_requires=requires,
+    extras_require=extras,
+    entry_points={
+        'console_scripts': ['argon-webgl-output = mapclientplugins.argonsceneexporterstep.splitter.cli:main'],
+    },
 )
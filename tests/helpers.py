@@ -0,0 +1,237 @@
+"""
+Shared helpers for the tests.
+"""
+import json
+import math
+import os
+import types
+
+from mapclientplugins.argonsceneexporterstep.splitter.binary_resource import is_binary_header, read_binary_resources
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import _face_attributes, split_webgl_output
+from mapclientplugins.argonsceneexporterstep.splitter.synthetic import generate_scene, glyph_content, surface_content
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import THREEJS_MORPH_ATTRIBUTES
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+
+def write_grid(file_name, side, time):
+    """
+    Write a Zinc model of a square grid of side by side elements to file_name, with a
+    height varying with time so that the surfaces of each time differ.
+    """
+    from cmlibs.zinc.context import Context
+    from cmlibs.zinc.element import Element, Elementbasis
+    from cmlibs.zinc.field import Field
+    from cmlibs.zinc.result import RESULT_OK
+
+    context = Context("grid")
+    region = context.getDefaultRegion()
+    fieldmodule = region.getFieldmodule()
+    fieldmodule.beginChange()
+    coordinates = fieldmodule.createFieldFiniteElement(3)
+    coordinates.setName("coordinates")
+    coordinates.setTypeCoordinate(True)
+    coordinates.setManaged(True)
+    nodes = fieldmodule.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+    node_template = nodes.createNodetemplate()
+    node_template.defineField(coordinates)
+    field_cache = fieldmodule.createFieldcache()
+    for j in range(side + 1):
+        for i in range(side + 1):
+            field_cache.setNode(nodes.createNode(j * (side + 1) + i + 1, node_template))
+            coordinates.assignReal(field_cache, [float(i), float(j), 0.1 * time * (i + j)])
+    mesh = fieldmodule.findMeshByDimension(2)
+    element_template = mesh.createElementtemplate()
+    element_template.setElementShapeType(Element.SHAPE_TYPE_SQUARE)
+    eft = mesh.createElementfieldtemplate(fieldmodule.createElementbasis(2, Elementbasis.FUNCTION_TYPE_LINEAR_LAGRANGE))
+    element_template.defineField(coordinates, -1, eft)
+    for j in range(side):
+        for i in range(side):
+            first = j * (side + 1) + i + 1
+            mesh.createElement(j * side + i + 1, element_template).setNodesByIdentifier(eft, [first, first + 1, first + side + 1, first + side + 2])
+    fieldmodule.endChange()
+    if region.writeFile(file_name) != RESULT_OK:
+        raise Exception(f"Failed to write the grid '{file_name}'.")
+
+
+def grid_document_state(directory, side=6, times=(1.0, 2.0, 3.0, 4.0)):
+    """
+    The state of an Argon document showing the surfaces and lines of a grid at times,
+    with the models written to directory.  Argon ignores a time of zero, so the
+    times should not include it.
+    """
+    from cmlibs.argon.settings import mainsettings
+
+    sources = []
+    for time in times:
+        file_name = os.path.join(directory, f"grid_{time:g}.exf")
+        write_grid(file_name, side, time)
+        sources.append({"FileName": file_name, "Time": time, "Type": "FILE"})
+    graphics = [
+        {"CoordinateField": "coordinates", "FieldDomainType": "MESH2D", "Material": "white", "Type": "SURFACES", "Surfaces": {}},
+        {"CoordinateField": "coordinates", "FieldDomainType": "MESH1D", "Type": "LINES", "Lines": {}},
+    ]
+    return json.dumps({"CMLibs Argon Version": mainsettings.VERSION_LIST,
+                       "RootRegion": {"Model": {"Sources": sources}, "Scene": {"Graphics": graphics}}})
+
+
+def argon_document(document_state):
+    """
+    An Argon document loaded from document_state.
+    """
+    from cmlibs.argon.argondocument import ArgonDocument
+
+    document = ArgonDocument()
+    document.initialiseVisualisationContents()
+    document.deserialize(document_state)
+    return document
+
+
+def read_export(output_dir):
+    """
+    The parsed content of every file in output_dir, by file name.
+    """
+    contents = {}
+    for file_name in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, file_name)) as f:
+            contents[file_name] = json.load(f)
+    return contents
+
+
+def synthetic_scene(output_dir, size="256 KiB", **kwargs):
+    """
+    Write a synthetic webGL export of about size to output_dir, see
+    synthetic.generate_scene, and return its metadata file.
+    """
+    return generate_scene(output_dir, convert_to_bytes(size), **kwargs)
+
+
+def split_scene(output_dir, file_size_limit, size="256 KiB", scene=None, **kwargs):
+    """
+    Write a synthetic webGL export of about size to output_dir, with the arguments
+    of synthetic.generate_scene in scene, and split it into files of up to
+    file_size_limit with the arguments in kwargs, see split_webgl_output.
+    Returns the metadata file.
+    """
+    meta_file = synthetic_scene(output_dir, size, **(scene or {}))
+    split_webgl_output(meta_file, convert_to_bytes(file_size_limit), **kwargs)
+    return meta_file
+
+
+def output_files(output_dir):
+    """
+    The bytes of every file under output_dir, by name relative to it.
+    """
+    files = {}
+    for directory, _, file_names in os.walk(output_dir):
+        for file_name in file_names:
+            with open(os.path.join(directory, file_name), 'rb') as f:
+                files[os.path.relpath(os.path.join(directory, file_name), output_dir)] = f.read()
+    return files
+
+
+def read_meta_content(meta_file):
+    with open(meta_file) as f:
+        return json.load(f)
+
+
+def resource_items(meta_file):
+    """
+    The metadata items of the resources of the metadata file, with the content of
+    each file of the resource, in order, under "contents".
+    """
+    meta_dir = os.path.dirname(meta_file)
+    items = []
+    for item in read_meta_content(meta_file):
+        if isinstance(item, dict) and "URL" in item and item.get("Type", None) != "View":
+            urls = item["URL"] if isinstance(item["URL"], list) else [item["URL"]]
+            items.append(dict(item, contents=[read_resource(os.path.join(meta_dir, url)) for url in urls]))
+    return items
+
+
+def face_values(content):
+    """
+    The faces of a surfaces or lines resource as the values they reference rather
+    than indices, with the values of each morph entry, a tuple for each face.
+    Faces hold the same values wherever their resource is split.
+    """
+    morphs = {attribute: content.get(morph_key, []) for morph_key, attribute in THREEJS_MORPH_ATTRIBUTES.items()}
+    faces = content["faces"]
+    index = 0
+    values = []
+    while index < len(faces):
+        face = [faces[index]]
+        attributes = _face_attributes(faces[index])
+        index += 1
+        for key, size in attributes:
+            for value_index in faces[index:index + 3]:
+                face.append(tuple(content[key][size * value_index:size * value_index + size]))
+                face.extend(tuple(entry[key][size * value_index:size * value_index + size]) for entry in morphs.get(key, []))
+            index += 3
+        values.append(tuple(face))
+    return values
+
+
+def _materialised(value):
+    # Synthetic values are generated in blocks, for writing a large resource a block at a time.
+    if isinstance(value, types.GeneratorType):
+        return [number for block in value for number in block]
+    if isinstance(value, dict):
+        return {key: _materialised(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_materialised(item) for item in value]
+    return value
+
+
+def glyph_resource(count, time_steps=0):
+    """
+    The content of a synthetic glyph resource with count glyphs and time_steps time
+    steps, see synthetic.glyph_content, with its values in lists.
+    """
+    return _materialised(glyph_content(count, "glyph_geometry.json", time_steps))
+
+
+def surface_resource(side, time_steps=0):
+    """
+    The content of a synthetic surface resource on a grid of side by side vertices
+    with time_steps time steps, see synthetic.surface_content, with its values in lists.
+    """
+    return _materialised(surface_content(side, time_steps))
+
+
+def read_resource(resource_file):
+    """
+    The content of a resource in the JSON form, whether it is written as JSON or binary.
+    """
+    with open(resource_file) as f:
+        content = json.load(f)
+    if is_binary_header(content) or (isinstance(content, list) and len(content) and is_binary_header(content[0])):
+        return read_binary_resources(resource_file)
+    return content
+
+
+def resource_urls(meta_file):
+    """
+    The URLs of the resources of the metadata file, as listed in it.
+    """
+    with open(meta_file) as f:
+        meta_content = json.load(f)
+    return [item["URL"] for item in meta_content if isinstance(item, dict) and "URL" in item and item.get("Type", None) != "View"]
+
+
+def assert_close(test_case, expected, actual, rel_tol=1e-6):
+    """
+    Assert that actual has the structure of expected, with numbers within rel_tol,
+    as for values written as Float32.
+    """
+    if isinstance(expected, dict):
+        test_case.assertEqual(sorted(expected), sorted(actual))
+        for key in expected:
+            assert_close(test_case, expected[key], actual[key], rel_tol)
+    elif isinstance(expected, list):
+        test_case.assertEqual(len(expected), len(actual))
+        for expected_item, actual_item in zip(expected, actual):
+            assert_close(test_case, expected_item, actual_item, rel_tol)
+    elif isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        test_case.assertTrue(math.isclose(expected, actual, rel_tol=rel_tol, abs_tol=rel_tol), f"{actual} is not close to {expected}")
+    else:
+        test_case.assertEqual(expected, actual)
@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.binary_resource import read_binary_resources, write_binary_resources
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import (
+    FORMAT_KEY, OUTPUT_FORMAT_BINARY, OUTPUT_FORMAT_JSON, combine_webgl_output, split_webgl_output)
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+from tests.helpers import assert_close, read_resource, resource_urls, synthetic_scene
+
+SURFACE = {
+    "metadata": {"version": 4, "type": "Geometry"},
+    "vertices": [0.0, 0.5, -1.25, 3.0, 1e-3, 2.5],
+    "faces": [0, 0, 1, 70000],
+    "colors": [],
+    "morphColors": [{"name": "frame_000", "colors": [0.1, 0.2, 0.3]}],
+}
+
+
+class BinaryResourceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_round_trip(self):
+        header_file = os.path.join(self._directory, "surface.json")
+        write_binary_resources(header_file, SURFACE)
+        assert_close(self, SURFACE, read_binary_resources(header_file))
+        write_binary_resources(header_file, [SURFACE, {"vertices": [1, 2, 3]}])
+        assert_close(self, [SURFACE, {"vertices": [1, 2, 3]}], read_binary_resources(header_file))
+
+    def _split_and_combined(self, output_format):
+        output_dir = os.path.join(self._directory, output_format)
+        meta_file = synthetic_scene(output_dir, "256 KiB", surfaces=2, lines=1, glyphs=1, time_steps=2)
+        with open(meta_file) as f:
+            meta_content = json.load(f)
+        # Small surfaces that are combined, and one that is neither split nor combined.
+        for name, size in [("small_1", "6 KiB"), ("small_2", "6 KiB"), ("medium", "28 KiB")]:
+            synthetic_scene(os.path.join(output_dir, name), size, surfaces=1, lines=0, glyphs=0, seed=len(meta_content))
+            meta_content.append(dict(meta_content[0], URL=f"{name}/surface_1.json"))
+        with open(meta_file, 'w') as f:
+            json.dump(meta_content, f)
+
+        split_webgl_output(meta_file, convert_to_bytes("48 KiB"), output_format=output_format)
+        split_urls = resource_urls(meta_file)
+        combine_webgl_output(meta_file, convert_to_bytes("24 KiB"), output_format=output_format)
+        return output_dir, meta_file, split_urls
+
+    def test_split_and_combined_same_as_json(self):
+        json_dir, _, json_urls = self._split_and_combined(OUTPUT_FORMAT_JSON)
+        binary_dir, binary_meta_file, binary_urls = self._split_and_combined(OUTPUT_FORMAT_BINARY)
+        self.assertEqual(json_urls, binary_urls)
+        self.assertTrue(any(isinstance(url, list) for url in binary_urls))
+
+        with open(binary_meta_file) as f:
+            meta_content = json.load(f)
+        formats = {}
+        for item in meta_content:
+            if isinstance(item, dict) and "URL" in item and item.get("Type", None) != "View":
+                formats[item[FORMAT_KEY]] = formats.get(item[FORMAT_KEY], 0) + 1
+                self.assertEqual(item[FORMAT_KEY] == OUTPUT_FORMAT_BINARY, "BinaryURL" in item)
+                urls = item["URL"] if isinstance(item["URL"], list) else [item["URL"]]
+                for url in urls:
+                    assert_close(self, read_resource(os.path.join(json_dir, url)), read_resource(os.path.join(binary_dir, url)))
+        self.assertEqual({OUTPUT_FORMAT_BINARY: 6, OUTPUT_FORMAT_JSON: 1}, formats)
+        self.assertEqual(resource_urls(binary_meta_file), resource_urls(os.path.join(json_dir, os.path.basename(binary_meta_file))))
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from mapclientplugins.argonsceneexporterstep.splitter import json_resource
+from mapclientplugins.argonsceneexporterstep.splitter.budget import (
+    WORKER_OVERHEAD, MemorySampler, fits_budget, in_memory_footprint, streaming_footprint, task_footprint)
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import _split_strategy, run_tasks, split_webgl_output
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+from tests.helpers import output_files, synthetic_scene
+
+SCENE = {"surfaces": 3, "lines": 1, "glyphs": 1, "lod": True}
+FILE_SIZE_LIMIT = convert_to_bytes("8 KiB")
+# Resources up to about 36 KiB are split in memory within this budget, the full resolution ones are streamed.
+MEMORY_BUDGET = WORKER_OVERHEAD + convert_to_bytes("256 KiB")
+
+
+def _timed(duration):
+    start = time.monotonic()
+    time.sleep(duration)
+    return start, time.monotonic()
+
+
+class BudgetTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_fits_budget(self):
+        footprint = in_memory_footprint(1000)
+        self.assertTrue(fits_budget(footprint, None))
+        self.assertTrue(fits_budget(footprint, task_footprint(footprint)))
+        self.assertFalse(fits_budget(footprint, task_footprint(footprint) - 1))
+
+    def test_sampled_only_when_enabled(self):
+        with MemorySampler(enabled=False) as sampler:
+            pass
+        self.assertIsNone(sampler.peak)
+        with MemorySampler() as sampler:
+            pass
+        self.assertGreater(sampler.peak, 0)
+
+    def test_split_strategy(self):
+        size = convert_to_bytes("1 MiB")
+        self.assertEqual((False, in_memory_footprint(size)), _split_strategy(size, "Surfaces", FILE_SIZE_LIMIT, None, None))
+        self.assertEqual((True, streaming_footprint(FILE_SIZE_LIMIT)), _split_strategy(size, "Surfaces", FILE_SIZE_LIMIT, None, MEMORY_BUDGET))
+        # Resources that cannot be streamed are split in memory whatever the budget.
+        self.assertEqual((True, in_memory_footprint(size)), _split_strategy(size, "Points", FILE_SIZE_LIMIT, None, MEMORY_BUDGET))
+
+    def test_run_tasks_within_budget(self):
+        tasks = [(0.2,)] * 6
+        memory_budget = 2 * task_footprint(0)
+        with mock.patch.object(json_resource, "remaining_budget", lambda budget: budget):
+            results = run_tasks(_timed, tasks, 4, footprints=[0] * len(tasks), memory_budget=memory_budget)
+
+        self.assertEqual(len(tasks), len(results))
+        for start, _ in results:
+            running = sum(1 for other_start, other_end in results if other_start <= start < other_end)
+            self.assertLessEqual(running, 2)
+
+    def _split(self, name, memory_budget):
+        meta_file = synthetic_scene(os.path.join(self._directory, name), "256 KiB", **SCENE)
+        split_file = json_resource._split_file
+        strategies = {}
+
+        def _recorded_split_file(*args):
+            strategies[args[0]["URL"]] = args[3]
+            return split_file(*args)
+
+        with mock.patch.object(json_resource, "_split_file", _recorded_split_file):
+            split_webgl_output(meta_file, FILE_SIZE_LIMIT, delete_split_source=True, memory_budget=memory_budget)
+        return output_files(os.path.dirname(meta_file)), strategies
+
+    def test_split_same_within_budget(self):
+        expected_files, strategies = self._split("unbudgeted", None)
+        self.assertFalse(any(strategies.values()))
+
+        budgeted_files, strategies = self._split("budgeted", MEMORY_BUDGET)
+        self.assertTrue(any(strategies.values()))
+        self.assertFalse(all(strategies.values()))
+        self.assertEqual(expected_files, budgeted_files)
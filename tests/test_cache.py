@@ -0,0 +1,51 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.cache import export_fingerprint
+
+CONFIG = {"exportType": "webgl", "splitFiles": True, "splitSize": "18 MiB", "workers": 1}
+VERSIONS = {"cmlibs.zinc": "4.0.0"}
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._file_name = os.path.join(self._directory, "mesh.exf")
+        with open(self._file_name, 'w') as f:
+            f.write("mesh")
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _document(self, file_name):
+        return json.dumps({"RootRegion": {"Model": {"Sources": [{"Type": "FILE", "FileName": file_name}]}}})
+
+    def test_workers_ignored(self):
+        document = self._document(self._file_name)
+        self.assertEqual(export_fingerprint(document, CONFIG, VERSIONS), export_fingerprint(document, dict(CONFIG, workers=4), VERSIONS))
+        self.assertNotEqual(export_fingerprint(document, CONFIG, VERSIONS),
+                            export_fingerprint(document, dict(CONFIG, splitSize="1 MiB"), VERSIONS))
+
+    def test_file_changes_fingerprint(self):
+        document = self._document(self._file_name)
+        fingerprint = export_fingerprint(document, CONFIG, VERSIONS)
+        with open(self._file_name, 'a') as f:
+            f.write(" changed")
+        self.assertNotEqual(fingerprint, export_fingerprint(document, CONFIG, VERSIONS))
+
+    def test_relative_file_name(self):
+        # Relative names are resolved against the working directory, as the document does.
+        cwd = os.getcwd()
+        os.chdir(self._directory)
+        try:
+            document = self._document("mesh.exf")
+            fingerprint = export_fingerprint(document, CONFIG, VERSIONS)
+            with open(self._file_name, 'a') as f:
+                f.write(" changed")
+            self.assertNotEqual(fingerprint, export_fingerprint(document, CONFIG, VERSIONS))
+        finally:
+            os.chdir(cwd)
@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter import compression
+from mapclientplugins.argonsceneexporterstep.splitter.compression import ENCODING_BROTLI, ENCODING_GZIP, compress_file, sidecar_file
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import compress_webgl_output, referenced_files
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import read_json
+
+from tests.helpers import synthetic_scene
+
+SCENE = {"surfaces": 2, "lines": 1, "glyphs": 1}
+
+
+class CompressFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._file_name = os.path.join(self._directory, "resource.json")
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _write(self, data):
+        with open(self._file_name, 'wb') as f:
+            f.write(data)
+
+    def _sidecar(self, encoding):
+        with open(sidecar_file(self._file_name, encoding), 'rb') as f:
+            return f.read()
+
+    def test_gzip_round_trip(self):
+        data = json.dumps({"vertices": [0.5 * index for index in range(10000)]}).encode()
+        self._write(data)
+        result = compress_file(self._file_name, [ENCODING_GZIP])
+        self.assertEqual(len(data), result["size"])
+        self.assertEqual(len(self._sidecar(ENCODING_GZIP)), result[ENCODING_GZIP])
+        self.assertEqual(data, gzip.decompress(self._sidecar(ENCODING_GZIP)))
+
+        # The same input gives the same sidecar.
+        sidecar = self._sidecar(ENCODING_GZIP)
+        compress_file(self._file_name, [ENCODING_GZIP])
+        self.assertEqual(sidecar, self._sidecar(ENCODING_GZIP))
+
+    @unittest.skipIf(compression.brotli is None, "The brotli package is not installed")
+    def test_brotli_round_trip(self):
+        data = json.dumps({"vertices": [0.5 * index for index in range(10000)]}).encode()
+        self._write(data)
+        compress_file(self._file_name, [ENCODING_BROTLI])
+        self.assertEqual(data, compression.brotli.decompress(self._sidecar(ENCODING_BROTLI)))
+
+    def test_sidecar_that_does_not_pay_off_is_not_kept(self):
+        self._write(os.urandom(4096))
+        result = compress_file(self._file_name, [ENCODING_GZIP])
+        self.assertIsNone(result[ENCODING_GZIP])
+        self.assertEqual(["resource.json"], os.listdir(self._directory))
+
+    def test_stale_sidecar_removed(self):
+        self._write(b"0" * 4096)
+        self.assertIsNotNone(compress_file(self._file_name, [ENCODING_GZIP])[ENCODING_GZIP])
+        self._write(os.urandom(4096))
+        self.assertIsNone(compress_file(self._file_name, [ENCODING_GZIP])[ENCODING_GZIP])
+        self.assertFalse(os.path.exists(sidecar_file(self._file_name, ENCODING_GZIP)))
+
+
+class CompressOutputTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_report(self):
+        meta_file = synthetic_scene(os.path.join(self._directory, "scene"), "128 KiB", **SCENE)
+        meta_dir = os.path.dirname(meta_file)
+        report_file = os.path.join(self._directory, "report.json")
+        report = compress_webgl_output(meta_file, workers=2, encodings=[ENCODING_GZIP], report_file=report_file)
+        self.assertEqual(report, read_json(report_file))
+
+        files = {os.path.normpath(meta_file): None}
+        referenced_files(read_json(meta_file), meta_dir, files)
+        self.assertEqual(sorted(os.path.relpath(file_name, meta_dir) for file_name in files), sorted(report["files"]))
+
+        sent = 0
+        for file_name, entry in report["files"].items():
+            path = os.path.join(meta_dir, file_name)
+            self.assertEqual(os.path.getsize(path), entry["size"])
+            sidecar = sidecar_file(path, ENCODING_GZIP)
+            if entry[ENCODING_GZIP] is None:
+                self.assertFalse(os.path.exists(sidecar))
+                sent += entry["size"]
+            else:
+                self.assertEqual(os.path.getsize(sidecar), entry[ENCODING_GZIP])
+                sent += entry[ENCODING_GZIP]
+
+        totals = report["totals"]
+        self.assertEqual(len(files), totals["files"])
+        self.assertEqual(sum(entry["size"] for entry in report["files"].values()), totals["size"])
+        self.assertEqual(sent, totals[ENCODING_GZIP])
+        self.assertLess(totals[ENCODING_GZIP], totals["size"])
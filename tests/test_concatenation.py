@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mapclientplugins.argonsceneexporterstep.splitter import concatenation, json_resource
+from mapclientplugins.argonsceneexporterstep.splitter.concatenation import concatenate_json_resources
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import OUTPUT_FORMAT_JSON, _combine_data_files, combine_webgl_output
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import read_json, write_json
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+from tests.helpers import glyph_resource, output_files, surface_resource, synthetic_scene
+
+SMALL_SCENE = {"surfaces": 30, "lines": 10, "glyphs": 0, "lod": True}
+
+
+def _parsed_combination(resource_files, combination_file):
+    """
+    The combination as it was written before resources were concatenated, by parsing them.
+    """
+    json_resource._write_resource(combination_file, [read_json(resource_file) for resource_file in resource_files], OUTPUT_FORMAT_JSON)
+
+
+class ConcatenationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _resource_files(self, texts):
+        resource_files = []
+        for index, text in enumerate(texts):
+            resource_file = os.path.join(self._directory, f"resource_{index + 1}.json")
+            with open(resource_file, 'w') as f:
+                f.write(text)
+            resource_files.append(resource_file)
+        return resource_files
+
+    def _compact_resource_files(self):
+        resource_files = []
+        for index, content in enumerate([surface_resource(6, 1), glyph_resource(5, 2), surface_resource(3, 3), {}, []]):
+            resource_file = os.path.join(self._directory, f"compact_{index + 1}.json")
+            write_json(resource_file, content)
+            resource_files.append(resource_file)
+        return resource_files
+
+    def _read(self, file_name):
+        with open(file_name, 'rb') as f:
+            return f.read()
+
+    def _assert_same_as_parsed(self, resource_files):
+        combination_file = os.path.join(self._directory, "combination.json")
+        parsed_file = os.path.join(self._directory, "parsed.json")
+        _combine_data_files(resource_files, "combination.json", False, self._directory)
+        _parsed_combination(resource_files, parsed_file)
+        self.assertEqual(self._read(parsed_file), self._read(combination_file))
+
+    def test_same_as_parsed(self):
+        self._assert_same_as_parsed(self._compact_resource_files())
+
+    def test_no_resources(self):
+        combination_file = os.path.join(self._directory, "combination.json")
+        concatenate_json_resources([], combination_file)
+        self.assertEqual(b'[]', self._read(combination_file))
+
+    def test_surrounding_whitespace_dropped(self):
+        resource_files = self._resource_files([' \n{"a":[1,2]}\n\n', '\t[{"b":"]"}] '])
+        combination_file = os.path.join(self._directory, "combination.json")
+        concatenate_json_resources(resource_files, combination_file)
+        self.assertEqual(b'[{"a":[1,2]},[{"b":"]"}]]', self._read(combination_file))
+
+    def test_other_values_parsed(self):
+        # Files that do not hold an object or array are parsed and written again.
+        resource_files = self._resource_files(['{"a":1}', '"text"', ' 12.5 ', 'null'])
+        self._assert_same_as_parsed(resource_files)
+        self.assertEqual([{"a": 1}, "text", 12.5, None], read_json(os.path.join(self._directory, "combination.json")))
+
+    def test_invalid_json_reported(self):
+        resource_files = self._resource_files(['{"a":1}', '{"a":'])
+        with self.assertRaises(ValueError):
+            concatenate_json_resources(resource_files, os.path.join(self._directory, "combination.json"))
+
+    def _concatenated_with(self, resource_files, **failures):
+        """
+        Concatenate with the os functions named in failures raising or returning the given
+        value, in blocks of 100 bytes.  Returns the combination and the mocks of sendfile and pread.
+        """
+        combination_file = os.path.join(self._directory, "combination.json")
+        patches = [mock.patch.object(concatenation, "COPY_BLOCK_SIZE", 100)]
+        for function_name, failure in failures.items():
+            arguments = {"side_effect": failure} if isinstance(failure, Exception) else {"return_value": failure}
+            patches.append(mock.patch.object(os, function_name, create=True, **arguments))
+        if "sendfile" not in failures:
+            patches.append(mock.patch.object(os, "sendfile", create=True, wraps=getattr(os, "sendfile", None)))
+        patches.append(mock.patch.object(os, "pread", wraps=os.pread))
+        mocks = [patch.start() for patch in patches]
+        try:
+            concatenate_json_resources(resource_files, combination_file)
+        finally:
+            for patch in reversed(patches):
+                patch.stop()
+        return self._read(combination_file), mocks[-2], mocks[-1]
+
+    @unittest.skipUnless(hasattr(os, "sendfile"), "sendfile is not available on this platform")
+    def test_copy_falls_back_to_sendfile(self):
+        resource_files = self._compact_resource_files()
+        expected_file = os.path.join(self._directory, "expected.json")
+        _parsed_combination(resource_files, expected_file)
+        for name, failure in [("fails", OSError("not supported")), ("copies nothing", 0)]:
+            with self.subTest(f"copy_file_range {name}"):
+                combination, sendfile, _ = self._concatenated_with(resource_files, copy_file_range=failure)
+                self.assertEqual(self._read(expected_file), combination)
+                self.assertGreater(sendfile.call_count, 1)
+
+    def test_copy_falls_back_to_read_and_write(self):
+        resource_files = self._compact_resource_files()
+        expected_file = os.path.join(self._directory, "expected.json")
+        _parsed_combination(resource_files, expected_file)
+        combination, sendfile, pread = self._concatenated_with(resource_files, copy_file_range=OSError("not supported"),
+                                                               sendfile=OSError("not supported"))
+        self.assertEqual(self._read(expected_file), combination)
+        # Besides reading the ends of each resource.
+        self.assertGreater(pread.call_count, 2 * len(resource_files))
+
+
+class CombineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _combined(self, name):
+        meta_file = synthetic_scene(os.path.join(self._directory, name), "256 KiB", **SMALL_SCENE)
+        meta_dir = os.path.dirname(meta_file)
+        # Written compactly, as the splitter writes resources.
+        for file_name in os.listdir(meta_dir):
+            write_json(os.path.join(meta_dir, file_name), read_json(os.path.join(meta_dir, file_name)))
+        combine_webgl_output(meta_file, convert_to_bytes("24 KiB"), delete_combined_source=True)
+        return output_files(meta_dir)
+
+    def test_same_as_parsed_combine(self):
+        concatenated = self._combined("concatenated")
+        with mock.patch.object(json_resource, "concatenate_json_resources", _parsed_combination):
+            parsed = self._combined("parsed")
+        self.assertTrue(any("_combination_" in file_name for file_name in concatenated))
+        self.assertEqual(parsed, concatenated)
@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.deduplication import deduplicate_resource_frames, unique_frames
+from mapclientplugins.argonsceneexporterstep.splitter.threejs import THREEJS_MORPH_ATTRIBUTES, THREEJS_MORPH_FRAME_KEYS
+
+from tests.helpers import assert_close, surface_resource
+
+TOLERANCE = 1e-3
+
+
+def _shifted(values, offset):
+    return [value + offset for value in values]
+
+
+def _time_varying_surface():
+    """
+    A surface whose vertices repeat in some time steps, one of them only within
+    TOLERANCE, whose normals never change and whose colours always do.  The
+    vertices are multiples of TOLERANCE so the one within it rounds to the same.
+    """
+    content = surface_resource(4)
+    vertices = content["vertices"] = [round(value, 3) for value in content["vertices"]]
+    vertex_frames = [vertices, vertices, _shifted(vertices, 1.0), vertices, _shifted(vertices, 1.0 + TOLERANCE / 4), _shifted(vertices, 2.0)]
+    content["morphTargets"] = [{"name": f"t{index}", "vertices": frame} for index, frame in enumerate(vertex_frames)]
+    content["morphNormals"] = [{"name": f"t{index}", "normals": [0.0, 0.0, 1.0] * 16} for index in range(len(vertex_frames))]
+    content["morphColors"] = [{"name": f"t{index}", "colors": [float(index)] * 16} for index in range(len(vertex_frames))]
+    return content
+
+
+def _expanded(content):
+    """
+    The content with the morph entries for every time step, as a client reads them through the frame tables.
+    """
+    expanded = {key: value for key, value in content.items() if key not in THREEJS_MORPH_FRAME_KEYS.values()}
+    for morph_key, frame_key in THREEJS_MORPH_FRAME_KEYS.items():
+        if frame_key in content:
+            expanded[morph_key] = [content[morph_key][frame] for frame in content[frame_key]]
+    return expanded
+
+
+def _without_names(content):
+    # Entries kept stand in for the time steps they replace, names included.
+    return {key: [{name: value for name, value in entry.items() if name != "name"} for entry in value] if key in THREEJS_MORPH_ATTRIBUTES
+            else value for key, value in content.items()}
+
+
+class UniqueFramesTestCase(unittest.TestCase):
+
+    def test_repeated_frames(self):
+        entries = [{"vertices": [0.0, 1.0, 2.0]}, {"vertices": [0.0, 1.0, 2.0]}, {"vertices": [3.0, 1.0, 2.0]}, {"vertices": [0.0, 1.0, 2.0]}]
+        self.assertEqual(([0, 2], [0, 0, 1, 0], 0.0), unique_frames(entries, "vertices"))
+
+    def test_tolerance(self):
+        entries = [{"vertices": [0.0, 1.0, 2.0]}, {"vertices": [0.0, 1.0, 2.0 + TOLERANCE / 2]}]
+        self.assertEqual(([0, 1], [0, 1], 0.0), unique_frames(entries, "vertices"))
+        kept, frames, max_error = unique_frames(entries, "vertices", TOLERANCE)
+        self.assertEqual(([0], [0, 0]), (kept, frames))
+        self.assertAlmostEqual(TOLERANCE / 2, max_error)
+
+    def test_runs(self):
+        # The entry of the previous time step is shared even if the values round to other multiples of the tolerance.
+        entries = [{"vertices": [0.0]}, {"vertices": [TOLERANCE * 0.6]}, {"vertices": [0.0]}]
+        kept, frames, max_error = unique_frames(entries, "vertices", TOLERANCE)
+        self.assertEqual(([0], [0, 0, 0]), (kept, frames))
+        self.assertAlmostEqual(TOLERANCE * 0.6, max_error)
+
+    def test_non_finite_values(self):
+        entries = [{"vertices": [math.nan, 1.0, 2.0]}, {"vertices": [0.0, 1.0, 2.0]}, {"vertices": [math.inf, 1.0, 2.0]},
+                   {"vertices": [math.inf, 1.0, 2.0]}]
+        self.assertEqual(([0, 1, 2], [0, 1, 2, 2], 0.0), unique_frames(entries, "vertices", TOLERANCE))
+
+
+class DeduplicateResourceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._resource_file = os.path.join(self._directory, "surface.json")
+        self._content = _time_varying_surface()
+        with open(self._resource_file, 'w') as f:
+            json.dump(self._content, f)
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _read(self):
+        with open(self._resource_file) as f:
+            return json.load(f)
+
+    def test_expands_to_original(self):
+        report = deduplicate_resource_frames(self._resource_file)
+        deduplicated = self._read()
+        self.assertEqual({"morphTargets": [6, 4], "morphNormals": [6, 1], "morphColors": [6, 6]}, report["frames"])
+        self.assertEqual(0.0, report["max_error"])
+        self.assertEqual([0, 0, 1, 0, 2, 3], deduplicated["morphTargetFrames"])
+        self.assertEqual([0] * 6, deduplicated["morphNormalFrames"])
+        self.assertNotIn("morphColorFrames", deduplicated)
+        self.assertLess(report["size_after"], report["size_before"])
+        self.assertEqual(_without_names(self._content), _without_names(_expanded(deduplicated)))
+
+    def test_expands_within_tolerance(self):
+        report = deduplicate_resource_frames(self._resource_file, TOLERANCE)
+        deduplicated = self._read()
+        self.assertEqual([0, 0, 1, 0, 1, 2], deduplicated["morphTargetFrames"])
+        self.assertAlmostEqual(TOLERANCE / 4, report["max_error"])
+        assert_close(self, _without_names(self._content), _without_names(_expanded(deduplicated)), rel_tol=TOLERANCE)
+
+    def test_idempotent(self):
+        deduplicate_resource_frames(self._resource_file)
+        with open(self._resource_file, 'rb') as f:
+            once = f.read()
+        report = deduplicate_resource_frames(self._resource_file)
+        with open(self._resource_file, 'rb') as f:
+            self.assertEqual(once, f.read())
+        self.assertEqual(report["size_before"], report["size_after"])
+        self.assertEqual({"morphTargets": [4, 4], "morphNormals": [1, 1], "morphColors": [6, 6]}, report["frames"])
+
+    def test_tables_composed(self):
+        # Deduplicating with a tolerance after an exact run maps each time step through both tables.
+        deduplicate_resource_frames(self._resource_file)
+        deduplicate_resource_frames(self._resource_file, TOLERANCE)
+        deduplicated = self._read()
+        self.assertEqual([0, 0, 1, 0, 1, 2], deduplicated["morphTargetFrames"])
+        assert_close(self, _without_names(self._content), _without_names(_expanded(deduplicated)), rel_tol=TOLERANCE)
+
+    def test_streaming_same(self):
+        in_memory_file = os.path.join(self._directory, "in_memory.json")
+        shutil.copyfile(self._resource_file, in_memory_file)
+        deduplicate_resource_frames(in_memory_file)
+        deduplicate_resource_frames(self._resource_file, streaming=True)
+        with open(in_memory_file, 'rb') as f, open(self._resource_file, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
@@ -0,0 +1,62 @@
+import json
+import unittest
+from unittest import mock
+
+from mapclientplugins.argonsceneexporterstep.splitter import json_resource
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import GLYPH_LIST_KEYS, _GlyphSplitter
+
+from tests.helpers import glyph_resource
+
+
+def _chunks(content, file_size_limit):
+    splitter = _GlyphSplitter(content)
+    return [splitter.chunk_text(*chunk) for chunk in splitter.iter_chunks(file_size_limit)]
+
+
+def _rebuilt(chunk_texts):
+    chunks = [json.loads(text) for text in chunk_texts]
+    content = dict(chunks[0], label=[], metadata=dict(chunks[0]["metadata"], number_of_vertices=0))
+    for key in GLYPH_LIST_KEYS:
+        content[key] = {time: [] for time in chunks[0][key]}
+    for chunk in chunks:
+        content["label"].extend(chunk["label"])
+        content["metadata"]["number_of_vertices"] += chunk["metadata"]["number_of_vertices"]
+        for key in GLYPH_LIST_KEYS:
+            for time, values in chunk[key].items():
+                content[key][time].extend(values)
+    return content
+
+
+class GlyphSplitterTestCase(unittest.TestCase):
+
+    def _assert_split(self, content, file_size_limit):
+        chunk_texts = _chunks(content, file_size_limit)
+        self.assertGreater(len(chunk_texts), 1)
+        for text in chunk_texts:
+            self.assertLessEqual(len(text.encode()), file_size_limit)
+        self.assertEqual(content, _rebuilt(chunk_texts))
+        return chunk_texts
+
+    def test_time_indices(self):
+        content = glyph_resource(200, 3)
+        for file_size_limit in [2000, 5000, 50000]:
+            self._assert_split(content, file_size_limit)
+
+    def test_chunks_cross_windows(self):
+        content = glyph_resource(200, 4)
+        chunk_texts = _chunks(content, 7000)
+        with mock.patch.object(json_resource, "GLYPH_WINDOW_SIZE", 7):
+            self.assertEqual(chunk_texts, self._assert_split(content, 7000))
+
+    def test_chunks_fill_budget(self):
+        content = glyph_resource(200, 2)
+        splitter = _GlyphSplitter(content)
+        chunks = list(splitter.iter_chunks(4000))
+        for start, end, _, _ in chunks[:-1]:
+            # The next glyph would not have fitted.
+            self.assertGreater(len(json.dumps(splitter.chunk_data(start, end + 1), separators=(',', ':'))), 4000)
+
+    def test_glyph_too_big(self):
+        content = glyph_resource(10, 3)
+        with self.assertRaises(Exception):
+            _chunks(content, 500)
@@ -0,0 +1,59 @@
+import unittest
+
+from unittest import mock
+
+from mapclientplugins.argonsceneexporterstep.splitter import instrumentation
+from mapclientplugins.argonsceneexporterstep.splitter.instrumentation import Instrumentation
+
+ALLOCATION_SIZE = 128 * 1024 * 1024
+
+
+def _allocate():
+    # Written rather than zeroed, so the pages are resident.
+    data = b'x' * ALLOCATION_SIZE
+    return len(data)
+
+
+class StagePeakTestCase(unittest.TestCase):
+
+    def setUp(self):
+        if not instrumentation._reset_peak_rss() or instrumentation._peak_rss() is None:
+            self.skipTest("The peak resident set size cannot be reset on this platform.")
+
+    def test_peak_of_each_stage(self):
+        recorder = Instrumentation()
+        with recorder.stage("large"):
+            _allocate()
+        with recorder.stage("small"):
+            pass
+        large, small = recorder.report()["stages"]
+        self.assertGreater(large["peak_rss"] - small["peak_rss"], ALLOCATION_SIZE // 2)
+        self.assertEqual(recorder.report()["totals"]["peak_rss"], large["peak_rss"])
+
+    def test_nested_stage_peak_is_in_outer_stage(self):
+        recorder = Instrumentation()
+        with recorder.stage("outer"):
+            with recorder.stage("inner"):
+                _allocate()
+            with recorder.stage("after"):
+                pass
+        outer = recorder.report()["stages"][0]
+        inner, after = outer["stages"]
+        self.assertGreaterEqual(outer["peak_rss"], inner["peak_rss"])
+        self.assertGreater(inner["peak_rss"] - after["peak_rss"], ALLOCATION_SIZE // 2)
+
+    def test_peak_without_reset(self):
+        recorder = Instrumentation()
+        with mock.patch.object(instrumentation, "_reset_peak_rss", return_value=False):
+            with recorder.stage("large"):
+                _allocate()
+            with recorder.stage("small"):
+                pass
+        large, small = recorder.report()["stages"]
+        self.assertIsNotNone(large["peak_rss"])
+        # The peak of the process was reached before the stage started.
+        self.assertIsNone(small["peak_rss"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mapclientplugins.argonsceneexporterstep.splitter import json_resource
+from mapclientplugins.argonsceneexporterstep.splitter.journal import JOURNAL_SUFFIX, Journal
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import split_webgl_output
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+from tests.helpers import output_files, synthetic_scene
+
+SCENE = {"surfaces": 3, "lines": 1, "glyphs": 1, "lod": True}
+FILE_SIZE_LIMIT = convert_to_bytes("16 KiB")
+
+
+class Interrupted(Exception):
+    pass
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._expected = output_files(os.path.dirname(self._split(self._scene("expected"))))
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _scene(self, name):
+        return synthetic_scene(os.path.join(self._directory, name), "256 KiB", **SCENE)
+
+    def _split(self, meta_file, fail_after=None):
+        """
+        Split the scene, interrupted once fail_after resources are split when it is given.
+        Returns the metadata file and the number of resources split.
+        """
+        split_file = json_resource._split_file
+        calls = []
+
+        def _interrupted_split_file(*args):
+            if len(calls) == fail_after:
+                raise Interrupted()
+            calls.append(args[0]["URL"])
+            return split_file(*args)
+
+        with mock.patch.object(json_resource, "_split_file", _interrupted_split_file):
+            split_webgl_output(meta_file, FILE_SIZE_LIMIT, delete_split_source=True)
+        self._calls = calls
+        return meta_file
+
+    def test_resumed(self):
+        meta_file = self._scene("resumed")
+        with self.assertRaises(Interrupted):
+            self._split(meta_file, fail_after=3)
+        self.assertTrue(os.path.isfile(meta_file + ".split" + JOURNAL_SUFFIX))
+        # Nothing is deleted and the metadata file is unchanged until every resource is split.
+        self.assertTrue(os.path.isfile(os.path.join(os.path.dirname(meta_file), "surface_1.json")))
+        self.assertNotIn("_split_", open(meta_file).read())
+
+        self._split(meta_file)
+        self.assertNotIn("surface_1.json", self._calls)
+        self.assertEqual(self._expected, output_files(os.path.dirname(meta_file)))
+
+    def test_changed_output_redone(self):
+        meta_file = self._scene("changed")
+        with self.assertRaises(Interrupted):
+            self._split(meta_file, fail_after=3)
+        with open(os.path.join(os.path.dirname(meta_file), "surface_1_split_1.json"), 'a') as f:
+            f.write(" ")
+
+        self._split(meta_file)
+        self.assertEqual(["surface_1.json"], self._calls[:1])
+        self.assertEqual(self._expected, output_files(os.path.dirname(meta_file)))
+
+    def test_interrupted_after_commit(self):
+        meta_file = self._scene("committed")
+        with mock.patch.object(Journal, "finish", side_effect=Interrupted()):
+            with self.assertRaises(Interrupted):
+                self._split(meta_file)
+        self.assertIn("_split_", open(meta_file).read())
+
+        self._split(meta_file)
+        self.assertEqual([], self._calls)
+        self.assertEqual(self._expected, output_files(os.path.dirname(meta_file)))
@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import ENGINE_NUMPY, ENGINE_PYTHON, split_webgl_output
+from mapclientplugins.argonsceneexporterstep.splitter.morph import (
+    gather, morph_base_cost, morph_value_costs, split_morph_entries, value_positions)
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import compact_text
+from mapclientplugins.argonsceneexporterstep.splitter.vectorised import is_available
+
+from tests.helpers import face_values, output_files, resource_items, surface_resource
+
+ENTRIES = [{"name": f"time_{index}", "colors": [index + 0.5 * value for value in range(6)]} for index in range(3)]
+
+
+def _time_varying_surface(side, time_steps):
+    # A surface with morph targets, normals and colours.
+    content = surface_resource(side, time_steps)
+    content["morphTargets"] = [{"name": f"time_{index}", "vertices": [value + 0.25 * index for value in content["vertices"]]}
+                               for index in range(time_steps)]
+    content["morphNormals"] = [{"name": f"time_{index}", "normals": list(reversed(content["normals"]))} for index in range(time_steps)]
+    return content
+
+
+class MorphTestCase(unittest.TestCase):
+
+    def test_split_entries(self):
+        positions = value_positions([4, 1], 1)
+        self.assertEqual([4, 1], positions)
+        self.assertEqual([2.0, 0.5], gather(ENTRIES[0]["colors"], positions))
+        self.assertEqual([1.5, 2.0, 2.5, 0.0, 0.5, 1.0], gather(ENTRIES[0]["colors"], value_positions([1, 0], 3)))
+        split_entries = split_morph_entries(ENTRIES, "colors", positions)
+        self.assertEqual([{"name": f"time_{index}", "colors": [index + 2.0, index + 0.5]} for index in range(3)], split_entries)
+        self.assertEqual([{}, {}, {}], split_morph_entries(ENTRIES, "colors", []))
+
+    def test_costs(self):
+        costs = morph_value_costs(ENTRIES, "colors", 1, 6)
+        for source_indices in [[0], [4, 1], [5, 3, 2]]:
+            split_entries = split_morph_entries(ENTRIES, "colors", value_positions(source_indices, 1))
+            expected = len(compact_text(split_entries)) - len(compact_text([{}, {}, {}]))
+            self.assertEqual(expected, morph_base_cost(ENTRIES, "colors") + sum(costs[index] for index in source_indices))
+
+
+class MorphSplitTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._source = _time_varying_surface(24, 4)
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _split(self, name, **kwargs):
+        output_dir = os.path.join(self._directory, name)
+        os.makedirs(output_dir)
+        with open(os.path.join(output_dir, "surface.json"), 'w') as f:
+            json.dump(self._source, f)
+        meta_file = os.path.join(output_dir, "metadata.json")
+        with open(meta_file, 'w') as f:
+            json.dump([{"Type": "Surfaces", "URL": "surface.json", "MorphVertices": True, "MorphColours": True}], f)
+        split_webgl_output(meta_file, 16 * 1024, delete_split_source=True, **kwargs)
+        return meta_file
+
+    def test_faces_kept(self):
+        item = resource_items(self._split("python", engine=ENGINE_PYTHON))[0]
+        self.assertGreater(len(item["contents"]), 1)
+        for content in item["contents"]:
+            for morph_key, attribute in [("morphTargets", "vertices"), ("morphNormals", "normals"), ("morphColors", "colors")]:
+                self.assertEqual([entry["name"] for entry in self._source[morph_key]], [entry["name"] for entry in content[morph_key]])
+                for entry in content[morph_key]:
+                    self.assertEqual(len(content[attribute]), len(entry[attribute]))
+        self.assertEqual(face_values(self._source), [face for content in item["contents"] for face in face_values(content)])
+
+    def test_engines_identical(self):
+        python_files = output_files(os.path.dirname(self._split("python", engine=ENGINE_PYTHON)))
+        self.assertEqual(python_files, output_files(os.path.dirname(self._split("streaming", engine=ENGINE_PYTHON, memory_limit=1))))
+        if is_available():
+            self.assertEqual(python_files, output_files(os.path.dirname(self._split("numpy", engine=ENGINE_NUMPY))))
@@ -0,0 +1,94 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import combine_webgl_output
+from mapclientplugins.argonsceneexporterstep.splitter.packing import exact_packing, first_fit_decreasing, pack, packing_report
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+from tests.helpers import read_meta_content, synthetic_scene
+
+
+def _fewest_bins(sizes, capacity):
+    """
+    The fewest bins the sizes can be packed into, by trying every packing.
+    """
+    best = [len(sizes)]
+
+    def _place(position, loads):
+        if len(loads) >= best[0]:
+            return
+        if position == len(sizes):
+            best[0] = len(loads)
+            return
+        for bin_index, load in enumerate(loads):
+            if load + sizes[position] <= capacity:
+                loads[bin_index] += sizes[position]
+                _place(position + 1, loads)
+                loads[bin_index] -= sizes[position]
+        _place(position + 1, loads + [sizes[position]])
+
+    _place(0, [])
+    return best[0]
+
+
+class PackingTestCase(unittest.TestCase):
+
+    def _assert_packing(self, sizes, capacity, bins):
+        self.assertEqual(list(range(len(sizes))), sorted(index for contents in bins for index in contents))
+        for contents in bins:
+            self.assertTrue(len(contents) == 1 or sum(sizes[index] for index in contents) <= capacity)
+
+    def test_exact_better_than_first_fit(self):
+        sizes = [5, 4, 3, 3, 3, 2]
+        self.assertEqual(3, len(first_fit_decreasing(sizes, 10)))
+        bins = exact_packing(sizes, 10)
+        self._assert_packing(sizes, 10, bins)
+        self.assertEqual(2, len(bins))
+
+    def test_exact_is_fewest(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            sizes = [rng.randint(1, 60) for _ in range(rng.randint(1, 9))]
+            bins = pack(sizes, 100)
+            self._assert_packing(sizes, 100, bins)
+            self.assertEqual(_fewest_bins(sizes, 100), len(bins))
+
+    def test_first_fit_for_many(self):
+        rng = random.Random(1)
+        sizes = [rng.randint(1, 60) for _ in range(200)]
+        bins = pack(sizes, 100, exact_limit=20)
+        self._assert_packing(sizes, 100, bins)
+        # First fit decreasing uses at most 11/9 of the fewest bins, plus 6/9.
+        self.assertLessEqual(len(bins), 11 / 9 * packing_report(sizes, bins, 100)["lower_bound"] + 6 / 9)
+
+    def test_oversized_alone(self):
+        sizes = [150, 40, 60, 120]
+        bins = pack(sizes, 100)
+        self._assert_packing(sizes, 100, bins)
+        self.assertIn([0], bins)
+        self.assertIn([3], bins)
+        self.assertEqual({"items": 4, "bins": 3, "lower_bound": 3, "fill": 1.0}, packing_report(sizes, bins, 100))
+
+
+class CombineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_combined_fewest_files(self):
+        meta_file = synthetic_scene(self._directory, "256 KiB", surfaces=40, lines=10, glyphs=0, lod=True)
+        file_size_limit = convert_to_bytes("24 KiB")
+        report = combine_webgl_output(meta_file, file_size_limit)
+        for level_report in report.values():
+            self.assertEqual(level_report["lower_bound"], level_report["bins"])
+
+        combination_files = {item["URL"] for item in read_meta_content(meta_file) if isinstance(item, dict) and "Index" in item}
+        self.assertGreater(len(combination_files), 1)
+        for combination_file in combination_files:
+            self.assertLessEqual(os.path.getsize(os.path.join(self._directory, combination_file)), file_size_limit)
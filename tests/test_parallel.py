@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import combine_webgl_output
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+
+from tests.helpers import output_files, split_scene, synthetic_scene
+
+SCENE = {"surfaces": 6, "lines": 3, "glyphs": 2, "lod": True, "time_steps": 2}
+SMALL_SCENE = {"surfaces": 60, "lines": 20, "glyphs": 0, "lod": True}
+
+
+class ParallelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _split(self, workers):
+        meta_file = split_scene(os.path.join(self._directory, f"split_{workers}"), "32 KiB", "512 KiB", SCENE, delete_split_source=True,
+                                workers=workers)
+        return output_files(os.path.dirname(meta_file))
+
+    def _combined(self, workers):
+        meta_file = synthetic_scene(os.path.join(self._directory, f"combined_{workers}"), "256 KiB", **SMALL_SCENE)
+        combine_webgl_output(meta_file, convert_to_bytes("24 KiB"), delete_combined_source=True, workers=workers)
+        return output_files(os.path.dirname(meta_file))
+
+    def test_split_same_for_any_workers(self):
+        serial_files = self._split(1)
+        self.assertTrue(any("_split_" in file_name for file_name in serial_files))
+        self.assertEqual(serial_files, self._split(3))
+
+    def test_combined_same_for_any_workers(self):
+        serial_files = self._combined(1)
+        self.assertTrue(any("_combination_" in file_name for file_name in serial_files))
+        self.assertEqual(serial_files, self._combined(3))
@@ -0,0 +1,81 @@
+import json
+import math
+import os
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.precision import QUANTIZATION_KEY, reduce_resource_precision
+
+
+def _offset_surface(offset):
+    # Two triangles spanning 10 by 4 by 2, far from the origin.
+    vertices = [0.0, 0.0, 0.0, 10.0, 0.0, 0.0, 10.0, 4.0, 0.0, 0.0, 4.0, 2.0]
+    return {
+        "metadata": {"version": 4, "type": "Geometry"},
+        "vertices": [value + offset for value in vertices],
+        "faces": [0, 0, 1, 2, 0, 0, 2, 3],
+    }
+
+
+class QuantizationTestCase(unittest.TestCase):
+
+    def _quantized(self, content, bits):
+        with tempfile.TemporaryDirectory() as directory:
+            resource_file = os.path.join(directory, "surface.json")
+            with open(resource_file, 'w') as f:
+                json.dump(content, f)
+            report = reduce_resource_precision(resource_file, quantization_bits=bits)
+            with open(resource_file) as f:
+                return json.load(f), report
+
+    def test_step_size_is_bounded(self):
+        bits = 8
+        content = _offset_surface(1000.0)
+        quantized, report = self._quantized(content, bits)
+        scale = quantized[QUANTIZATION_KEY]
+        self.assertAlmostEqual(scale, (2 ** bits - 1) / 10.0)
+        vertices = quantized["vertices"]
+        self.assertTrue(all(type(value) is int for value in vertices))
+        for axis in range(3):
+            axis_values = vertices[axis::3]
+            self.assertLessEqual(max(axis_values) - min(axis_values), 2 ** bits - 1)
+        for original, value in zip(content["vertices"], vertices):
+            self.assertLessEqual(abs(value / scale - original), 0.5 / scale + 1e-9)
+        self.assertLessEqual(report["max_position_error"], math.sqrt(3.0) * 0.5 / scale + 1e-9)
+
+    def test_positions_are_scaled_about_the_origin(self):
+        # There is no offset for the loader to add back, so the integers are not bounded by the bits.
+        bits = 8
+        quantized, _ = self._quantized(_offset_surface(1000.0), bits)
+        self.assertGreater(min(quantized["vertices"]), 2 ** bits)
+        self.assertEqual(round(1000.0 * quantized[QUANTIZATION_KEY]), quantized["vertices"][0])
+
+    def test_quantized_resource_is_unchanged(self):
+        content = dict(_offset_surface(0.0), vertices=[0, 0, 0, 255, 0, 0, 255, 102, 0, 0, 102, 51], scale=25.5)
+        quantized, _ = self._quantized(content, 8)
+        self.assertEqual(quantized["vertices"], content["vertices"])
+        self.assertEqual(quantized[QUANTIZATION_KEY], 25.5)
+
+
+class GlyphGeometriesTestCase(unittest.TestCase):
+
+    def test_every_geometry_is_rounded(self):
+        geometries = [dict(_offset_surface(offset), normals=[0.123456, 0.654321, 0.5]) for offset in [0.123456, 2.987654]]
+        with tempfile.TemporaryDirectory() as directory:
+            resource_file = os.path.join(directory, "glyph_geometry.json")
+            with open(resource_file, 'w') as f:
+                json.dump(geometries, f)
+            report = reduce_resource_precision(resource_file, {"vertices": 3, "normals": 2})
+            with open(resource_file) as f:
+                reduced = json.load(f)
+
+        self.assertEqual(len(geometries), len(reduced))
+        for geometry, reduced_geometry in zip(geometries, reduced):
+            self.assertEqual([float(f"{value:.2e}") for value in geometry["vertices"]], reduced_geometry["vertices"])
+            self.assertEqual([0.12, 0.65, 0.5], reduced_geometry["normals"])
+            self.assertEqual(geometry["faces"], reduced_geometry["faces"])
+        self.assertGreater(report["max_errors"]["vertices"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mapclientplugins.argonsceneexporterstep.splitter import serialisation
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import (
+    BACKEND_JSON, BACKEND_ORJSON, BACKEND_SIMDJSON, BACKEND_UJSON, PARSING_BACKENDS, SERIALISING_BACKENDS, available_backends,
+    compact_text, parse_json, read_json, serialise_json, write_json)
+
+VALUE = {"metadata": {"version": 4, "type": "Geometry", "generator": "io.JSONLoader"}, "vertices": [0, -1, 12345, 0.5, 1.0 / 3.0, -2.75],
+         "faces": [[0, 1, 2], []], "name": "surface/1", "visible": True, "materials": None, "scale": 1.0}
+NON_FINITE_VALUE = {"vertices": [0.5, math.nan, math.inf, -math.inf], "materials": None}
+BIG_INTEGER_VALUE = {"faces": [1, 2 ** 70, -2 ** 70], "materials": None}
+SMALL_FLOAT_VALUE = [1.0e-5, 2.5e-7, 0.5]
+
+
+class SerialiseJsonTestCase(unittest.TestCase):
+
+    def test_same_as_json(self):
+        for backend in available_backends(SERIALISING_BACKENDS):
+            with self.subTest(backend=backend):
+                self.assertEqual(compact_text(VALUE).encode(), serialise_json(VALUE, backend=backend))
+                self.assertEqual(compact_text(VALUE, sort_keys=True).encode(), serialise_json(VALUE, sort_keys=True, backend=backend))
+
+    def test_non_finite_values(self):
+        for backend in available_backends(SERIALISING_BACKENDS):
+            with self.subTest(backend=backend):
+                self.assertEqual(compact_text(NON_FINITE_VALUE).encode(), serialise_json(NON_FINITE_VALUE, backend=backend))
+
+    def test_big_integers(self):
+        for backend in available_backends(SERIALISING_BACKENDS):
+            with self.subTest(backend=backend):
+                self.assertEqual(compact_text(BIG_INTEGER_VALUE).encode(), serialise_json(BIG_INTEGER_VALUE, backend=backend))
+
+    def test_size_limit(self):
+        # Output over the limit is written again with json, which fits the sizes planned with compact_text.
+        size_limit = len(compact_text(SMALL_FLOAT_VALUE))
+        for backend in available_backends(SERIALISING_BACKENDS):
+            with self.subTest(backend=backend):
+                self.assertLessEqual(len(serialise_json(SMALL_FLOAT_VALUE, size_limit=size_limit, backend=backend)), size_limit)
+                self.assertEqual(compact_text(SMALL_FLOAT_VALUE).encode(), serialise_json(SMALL_FLOAT_VALUE, size_limit=size_limit - 1, backend=backend))
+
+    def test_default(self):
+        for backend in available_backends(SERIALISING_BACKENDS):
+            with self.subTest(backend=backend):
+                self.assertEqual(b'{"faces":[0,1,2]}', serialise_json({"faces": range(3)}, default=list, backend=backend))
+
+    def test_write_json(self):
+        directory = tempfile.mkdtemp()
+        try:
+            for backend in available_backends(SERIALISING_BACKENDS):
+                with self.subTest(backend=backend):
+                    file_name = os.path.join(directory, f"{backend}.json")
+                    write_json(file_name, NON_FINITE_VALUE, backend=backend)
+                    with open(file_name, 'rb') as f:
+                        self.assertEqual(compact_text(NON_FINITE_VALUE).encode(), f.read())
+        finally:
+            shutil.rmtree(directory)
+
+
+class ParseJsonTestCase(unittest.TestCase):
+
+    def test_same_as_json(self):
+        data = compact_text(VALUE).encode()
+        for backend in available_backends(PARSING_BACKENDS):
+            with self.subTest(backend=backend):
+                self.assertEqual(VALUE, parse_json(data, backend))
+                self.assertEqual(VALUE, parse_json(memoryview(data), backend))
+
+    def test_non_finite_values(self):
+        data = compact_text(NON_FINITE_VALUE).encode()
+        for backend in available_backends(PARSING_BACKENDS):
+            with self.subTest(backend=backend):
+                values = parse_json(data, backend)["vertices"]
+                self.assertEqual([0.5, math.inf, -math.inf], [values[0]] + values[2:])
+                self.assertTrue(math.isnan(values[1]))
+
+    def test_big_integers(self):
+        data = compact_text(BIG_INTEGER_VALUE).encode()
+        for backend in available_backends(PARSING_BACKENDS):
+            with self.subTest(backend=backend):
+                self.assertEqual(BIG_INTEGER_VALUE, parse_json(data, backend))
+
+    def test_invalid(self):
+        for backend in available_backends(PARSING_BACKENDS):
+            with self.subTest(backend=backend):
+                with self.assertRaises(ValueError):
+                    parse_json(b'{"vertices": [', backend)
+
+    def test_read_json(self):
+        directory = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(directory, "resource.json")
+            with open(file_name, 'w') as f:
+                f.write(compact_text(NON_FINITE_VALUE))
+            empty_file_name = os.path.join(directory, "empty.json")
+            open(empty_file_name, 'w').close()
+            for backend in available_backends(PARSING_BACKENDS):
+                with self.subTest(backend=backend):
+                    self.assertEqual(compact_text(NON_FINITE_VALUE), compact_text(read_json(file_name, backend)))
+                    with self.assertRaises(ValueError):
+                        read_json(empty_file_name, backend)
+        finally:
+            shutil.rmtree(directory)
+
+
+class ChosenBackendTestCase(unittest.TestCase):
+
+    def _installed(self, backends):
+        return mock.patch.dict(serialisation._modules, {backend: object() if backend in backends else None for backend in PARSING_BACKENDS})
+
+    def test_order_of_preference(self):
+        for installed, parsing, serialising in [
+                ([BACKEND_ORJSON, BACKEND_SIMDJSON, BACKEND_UJSON, BACKEND_JSON], BACKEND_ORJSON, BACKEND_ORJSON),
+                ([BACKEND_SIMDJSON, BACKEND_UJSON, BACKEND_JSON], BACKEND_SIMDJSON, BACKEND_UJSON),
+                ([BACKEND_SIMDJSON, BACKEND_JSON], BACKEND_SIMDJSON, BACKEND_JSON),
+                ([BACKEND_UJSON, BACKEND_JSON], BACKEND_UJSON, BACKEND_UJSON),
+                ([BACKEND_JSON], BACKEND_JSON, BACKEND_JSON)]:
+            with self.subTest(installed=installed), self._installed(installed):
+                self.assertEqual(parsing, serialisation._chosen_backend(None, PARSING_BACKENDS))
+                self.assertEqual(serialising, serialisation._chosen_backend(None, SERIALISING_BACKENDS))
+
+    def test_not_installed(self):
+        with self._installed([BACKEND_JSON]):
+            with self.assertRaises(Exception):
+                serialise_json(VALUE, backend=BACKEND_ORJSON)
+            with self.assertRaises(Exception):
+                parse_json(b'[]', backend=BACKEND_UJSON)
+
+    def test_simdjson_only_parses(self):
+        with self._installed(PARSING_BACKENDS):
+            with self.assertRaises(Exception):
+                serialise_json(VALUE, backend=BACKEND_SIMDJSON)
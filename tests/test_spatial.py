@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter import spatial
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import SPLIT_ORDER_FACES, SPLIT_ORDER_MORTON
+from mapclientplugins.argonsceneexporterstep.splitter.spatial import bounding_box, morton_order, reorder_faces
+
+from tests.helpers import face_values, output_files, resource_items, split_scene
+
+SCENE = {"surfaces": 1, "lines": 1, "glyphs": 0, "time_steps": 2}
+
+
+def _octant_faces():
+    # A triangle in each octant of a cube, listed in reverse Morton order.
+    vertices = []
+    faces = []
+    for octant in reversed(range(8)):
+        x, y, z = octant & 1, octant >> 1 & 1, octant >> 2 & 1
+        first = len(vertices) // 3
+        vertices.extend([x, y, z, x + 0.5, y, z, x, y + 0.5, z + 0.5])
+        faces.extend([0, first, first + 1, first + 2])
+    return faces, list(range(0, len(faces) + 1, 4)), vertices
+
+
+def _extent(box):
+    return max(upper - lower for lower, upper in zip(*box))
+
+
+class MortonOrderTestCase(unittest.TestCase):
+
+    def test_octants(self):
+        faces, unit_starts, vertices = _octant_faces()
+        order = list(morton_order(faces, unit_starts, vertices))
+        self.assertEqual(list(reversed(range(8))), order)
+        self.assertEqual([0, 21, 22, 23, 0, 18, 19, 20], reorder_faces(faces, unit_starts, order)[:8])
+
+    @unittest.skipIf(spatial.np is None, "NumPy is needed to compare the Morton codes of both engines")
+    def test_codes_same_without_numpy(self):
+        faces, unit_starts, vertices = _octant_faces()
+        self.assertEqual(list(spatial._morton_codes_numpy(faces, unit_starts, vertices)),
+                         list(spatial._morton_codes_python(faces, unit_starts, vertices)))
+
+    def test_bounding_box(self):
+        self.assertEqual([[0, -1, 2], [4, 3, 2]], bounding_box([0, 3, 2, 4, -1, 2]))
+        self.assertEqual([[0.0, -0.5, 1.0], [2.0, 1.5, 1.0]], bounding_box([0, 3, 2, 4, -1, 2], 2))
+        self.assertIsNone(bounding_box([]))
+
+
+class MortonSplitTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _split(self, name, **kwargs):
+        return split_scene(os.path.join(self._directory, name), "16 KiB", "1 MiB", SCENE, **kwargs)
+
+    def test_chunk_bounding_boxes(self):
+        morton_items = resource_items(self._split("morton", split_order=SPLIT_ORDER_MORTON))
+        faces_items = resource_items(self._split("faces", split_order=SPLIT_ORDER_FACES))
+        for morton_item, faces_item in zip(morton_items, faces_items):
+            self.assertNotIn("BoundingBox", faces_item)
+            self.assertEqual([bounding_box(content["vertices"]) for content in morton_item["contents"]], morton_item["BoundingBox"])
+            self.assertEqual(sorted(face for content in faces_item["contents"] for face in face_values(content)),
+                             sorted(face for content in morton_item["contents"] for face in face_values(content)))
+            if morton_item["Type"] == "Surfaces":
+                # Chunks much narrower than the rows of a surface are long strips of it in the order
+                # of its faces, compact chunks are smaller across and share fewer vertices.
+                self.assertLess(sum(_extent(box) for box in morton_item["BoundingBox"]),
+                                sum(_extent(bounding_box(content["vertices"])) for content in faces_item["contents"]))
+                self.assertLess(sum(len(content["vertices"]) for content in morton_item["contents"]),
+                                sum(len(content["vertices"]) for content in faces_item["contents"]))
+
+    def test_same_when_streamed(self):
+        self.assertEqual(output_files(os.path.dirname(self._split("in_memory", split_order=SPLIT_ORDER_MORTON))),
+                         output_files(os.path.dirname(self._split("streaming", split_order=SPLIT_ORDER_MORTON, memory_limit=1))))
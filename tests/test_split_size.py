@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import (
+    ENGINE_NUMPY, ENGINE_PYTHON, SPLIT_ORDER_FACES, SPLIT_ORDER_MORTON)
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import convert_to_bytes
+from mapclientplugins.argonsceneexporterstep.splitter.vectorised import is_available
+
+from tests.helpers import read_meta_content, split_scene
+
+SCENE = {"surfaces": 1, "lines": 1, "glyphs": 1, "time_steps": 3}
+# More than the bytes a pair of faces or a glyph adds to a chunk with its values.
+LARGEST_UNIT = 1024
+
+
+class SplitSizeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _assert_chunk_sizes(self, file_size_limit, **kwargs):
+        output_dir = tempfile.mkdtemp(dir=self._directory)
+        meta_file = split_scene(output_dir, file_size_limit, "512 KiB", SCENE, **kwargs)
+        limit = convert_to_bytes(file_size_limit)
+        split_items = [item for item in read_meta_content(meta_file) if isinstance(item, dict) and isinstance(item.get("URL", None), list)]
+        self.assertEqual(3, len(split_items))
+        for item in split_items:
+            sizes = [os.path.getsize(os.path.join(output_dir, url)) for url in item["URL"]]
+            self.assertLessEqual(max(sizes), limit)
+            # Chunks are only cut when the next faces or glyph would not fit.
+            self.assertGreater(min(sizes[:-1]), limit - LARGEST_UNIT)
+
+    def test_chunks_fit_limit(self):
+        engines = [ENGINE_PYTHON, ENGINE_NUMPY] if is_available() else [ENGINE_PYTHON]
+        for file_size_limit in ["8 KiB", "24 KiB", "100 KiB"]:
+            for engine in engines:
+                for split_order in [SPLIT_ORDER_FACES, SPLIT_ORDER_MORTON]:
+                    with self.subTest(file_size_limit=file_size_limit, engine=engine, split_order=split_order):
+                        self._assert_chunk_sizes(file_size_limit, engine=engine, split_order=split_order)
+
+    def test_streamed_chunks_fit_limit(self):
+        self._assert_chunk_sizes("8 KiB", memory_limit=1)
+
+    def test_limit_too_small(self):
+        with self.assertRaises(Exception):
+            split_scene(self._directory, "100", "64 KiB", SCENE)
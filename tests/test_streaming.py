@@ -0,0 +1,99 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from mapclientplugins.argonsceneexporterstep.splitter import morph
+from mapclientplugins.argonsceneexporterstep.splitter.instrumentation import STATUS_FILE
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import ENGINE_NUMPY, ENGINE_PYTHON, FACE_TYPES
+from mapclientplugins.argonsceneexporterstep.splitter.vectorised import is_available
+
+from tests.helpers import face_values, output_files, read_resource, resource_items, split_scene, synthetic_scene
+
+SCENE = {"surfaces": 2, "lines": 1, "glyphs": 1, "time_steps": 3}
+# Prints the peak anonymous memory, in KiB, sampled while streaming the split of a metadata file.  The pages
+# of the memory mapped spool files are left out, they are page cache the system takes back when it needs to.
+PEAK_SCRIPT = """
+import sys
+import threading
+from mapclientplugins.argonsceneexporterstep.splitter.instrumentation import STATUS_FILE
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import split_webgl_output
+
+peak = [0]
+stop = threading.Event()
+
+def sample():
+    while True:
+        with open(STATUS_FILE) as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    peak[0] = max(peak[0], int(line.split()[1]))
+        if stop.wait(0.01):
+            return
+
+thread = threading.Thread(target=sample)
+thread.start()
+split_webgl_output(sys.argv[1], 256 * 1024, memory_limit=1)
+stop.set()
+thread.join()
+print(peak[0] * 1024)
+"""
+
+
+class StreamingSplitTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _split(self, name, **kwargs):
+        return split_scene(os.path.join(self._directory, name), "24 KiB", scene=SCENE, **kwargs)
+
+    def test_same_as_in_memory(self):
+        in_memory_meta_file = self._split("in_memory", memory_limit=None, engine=ENGINE_PYTHON)
+        streaming_meta_file = self._split("streaming", memory_limit=1, engine=ENGINE_PYTHON)
+        self.assertEqual(output_files(os.path.dirname(in_memory_meta_file)), output_files(os.path.dirname(streaming_meta_file)))
+
+    @unittest.skipUnless(is_available(), "NumPy is needed for the numpy engine")
+    def test_engines_identical(self):
+        python_files = output_files(os.path.dirname(self._split("python", memory_limit=None, engine=ENGINE_PYTHON)))
+        numpy_files = output_files(os.path.dirname(self._split("numpy", memory_limit=None, engine=ENGINE_NUMPY)))
+        streaming_files = output_files(os.path.dirname(self._split("streaming", memory_limit=1)))
+        self.assertEqual(python_files, numpy_files)
+        self.assertEqual(python_files, streaming_files)
+
+    def test_faces_kept(self):
+        meta_file = self._split("streaming", memory_limit=1)
+        for item in resource_items(meta_file):
+            if item["Type"] in FACE_TYPES:
+                self.assertGreater(len(item["contents"]), 1)
+                # The source is kept next to its split files.
+                source = read_resource(os.path.join(os.path.dirname(meta_file), item["URL"][0].replace("_split_1", "")))
+                self.assertEqual(face_values(source), [face for content in item["contents"] for face in face_values(content)])
+
+    def _streaming_peak(self, size):
+        meta_file = synthetic_scene(os.path.join(self._directory, size), size, surfaces=1, lines=0, glyphs=0, time_steps=3)
+        # Split in a new process, so that the peak is not that of generating the scene.
+        completed = subprocess.run([sys.executable, "-c", PEAK_SCRIPT, meta_file], check=True, stdout=subprocess.PIPE, text=True,
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return int(completed.stdout), os.path.getsize(os.path.join(os.path.dirname(meta_file), "surface_1.json"))
+
+    @unittest.skipUnless(os.path.isfile(STATUS_FILE), "The memory of a process is read from its status file")
+    def test_memory_follows_chunk_size(self):
+        small_peak, small_size = self._streaming_peak("32 MiB")
+        large_peak, large_size = self._streaming_peak("128 MiB")
+        # Splitting in memory takes about 8 times the size of the resource, streaming the same whatever its size.
+        self.assertLess(large_peak - small_peak, 0.05 * (large_size - small_size))
+
+    def test_block_costs_same(self):
+        # Values sized a few at a time, across many blocks, give the same chunks.
+        with mock.patch.object(morph, "BLOCK_VALUES", 7), mock.patch.object(morph, "CACHED_BLOCKS", 2):
+            self.test_same_as_in_memory()
+            if is_available():
+                self.assertEqual(output_files(os.path.dirname(self._split("python", memory_limit=None, engine=ENGINE_PYTHON))),
+                                 output_files(os.path.dirname(self._split("numpy", memory_limit=1, engine=ENGINE_NUMPY))))
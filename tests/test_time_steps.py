@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.time_steps import merge_time_step_contents, merge_time_step_metadata, time_step_slices
+
+from tests.helpers import argon_document, grid_document_state, read_export
+
+try:
+    import cmlibs.argon
+    import cmlibs.exporter
+except ImportError:
+    cmlibs = None
+
+
+class MergeTimeStepsTestCase(unittest.TestCase):
+
+    def test_metadata_merged(self):
+        slices = time_step_slices(6, 1.0, 6.0, 2)
+        meta_contents = [
+            [{"Type": "Surfaces", "URL": "a_1.json", "MorphColours": False, "MorphVertices": True},
+             {"Type": "Settings", "Duration": "PT2S", "OriginalDuration": "PT2S"}],
+            [{"Type": "Surfaces", "URL": "a_1.json", "MorphColours": True, "MorphVertices": False},
+             {"Type": "Settings", "Duration": "PT2S", "OriginalDuration": "PT2S"}],
+        ]
+        merged = merge_time_step_metadata(meta_contents, slices)
+        self.assertEqual({"Type": "Surfaces", "URL": "a_1.json", "MorphColours": True, "MorphVertices": True}, merged[0])
+        self.assertEqual({"Type": "Settings", "Duration": "PT5S", "OriginalDuration": "PT5S"}, merged[1])
+
+    def test_metadata_differs(self):
+        slices = time_step_slices(4, 1.0, 4.0, 2)
+        with self.assertRaises(Exception):
+            merge_time_step_metadata([[{"URL": "a_1.json"}], []], slices)
+
+    def test_static_slice_repeated(self):
+        slices = time_step_slices(4, 1.0, 4.0, 2)
+        contents = [
+            {"colors": [0.5], "morphColors": [{"name": "frame_000", "colors": [0.1]}, {"name": "frame_001", "colors": [0.2]}]},
+            {"colors": [0.3]},
+        ]
+        merged = merge_time_step_contents(contents, slices)
+        self.assertEqual([{"name": "frame_000", "colors": [0.1]}, {"name": "frame_001", "colors": [0.2]},
+                          {"name": "frame_002", "colors": [0.3]}, {"name": "frame_003", "colors": [0.3]}], merged["morphColors"])
+
+
+@unittest.skipIf(cmlibs is None, "cmlibs.argon and cmlibs.exporter are needed to export a scene")
+class ParallelTimeStepsTestCase(unittest.TestCase):
+
+    def test_same_as_serial_export(self):
+        from mapclientplugins.argonsceneexporterstep.exporters import create_exporter, export_time_steps
+
+        parameters = {"prefix": "grid", "numberOfTimeSteps": 7, "initialTime": 1.0, "finishTime": 4.0}
+        with tempfile.TemporaryDirectory() as directory:
+            model_dir, serial_dir, parallel_dir = [os.path.join(directory, name) for name in ["model", "serial", "parallel"]]
+            for output_dir in [model_dir, serial_dir, parallel_dir]:
+                os.makedirs(output_dir)
+            document_state = grid_document_state(model_dir)
+
+            exporter = create_exporter("webgl", serial_dir, {})
+            exporter.set_document(argon_document(document_state))
+            exporter.set_parameters(parameters)
+            exporter.export()
+            export_time_steps(document_state, "webgl", parallel_dir, {}, parameters, 3)
+
+            self.assertEqual(read_export(serial_dir), read_export(parallel_dir))
@@ -0,0 +1,25 @@
+import math
+import unittest
+from array import array
+
+from mapclientplugins.argonsceneexporterstep.splitter.serialisation import compact_text
+from mapclientplugins.argonsceneexporterstep.splitter.utilities import json_number_size, json_value_sizes
+
+VALUES = [0, -1, 12345, 0.5, -1.0e-7, 1.0 / 3.0, 2.5e20, math.nan, math.inf, -math.inf]
+
+
+class JsonValueSizesTestCase(unittest.TestCase):
+
+    def test_sizes_of_numbers(self):
+        self.assertEqual([len(compact_text(value)) for value in VALUES], json_value_sizes(VALUES))
+        self.assertEqual([json_number_size(value) for value in VALUES], json_value_sizes(VALUES))
+
+    def test_sizes_across_blocks(self):
+        self.assertEqual(json_value_sizes(VALUES), json_value_sizes(VALUES, block_size=3))
+
+    def test_sizes_of_memory_view(self):
+        values = [float(value) for value in VALUES]
+        self.assertEqual(json_value_sizes(values), json_value_sizes(memoryview(array('d', values)), block_size=4))
+
+    def test_no_values(self):
+        self.assertEqual([], json_value_sizes([]))
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mapclientplugins.argonsceneexporterstep.splitter.json_resource import ENGINE_NUMPY, ENGINE_PYTHON, FACE_TYPES, _index_width
+from mapclientplugins.argonsceneexporterstep.splitter.vectorised import is_available
+
+from tests.helpers import face_values, output_files, read_resource, resource_items, split_scene
+
+SCENE = {"surfaces": 1, "lines": 1, "glyphs": 0, "time_steps": 2}
+MAX_VERTICES = 500
+# The most vertices a pair of faces adds to a chunk.
+UNIT_VERTICES = 6
+
+
+class VertexBoundTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _split(self, name, **kwargs):
+        # The file size limit is far above the size of the resources.
+        return split_scene(os.path.join(self._directory, name), "18 MiB", "1 MiB", SCENE, max_vertices_per_chunk=MAX_VERTICES, **kwargs)
+
+    def test_chunks_bounded(self):
+        meta_file = self._split("python", engine=ENGINE_PYTHON)
+        for item in resource_items(meta_file):
+            self.assertIn(item["Type"], FACE_TYPES)
+            self.assertGreater(len(item["contents"]), 1)
+            self.assertEqual([16] * len(item["contents"]), item["IndexWidth"])
+            vertex_counts = [len(content["vertices"]) // 3 for content in item["contents"]]
+            self.assertLessEqual(max(vertex_counts), MAX_VERTICES)
+            self.assertGreater(min(vertex_counts[:-1]), MAX_VERTICES - UNIT_VERTICES)
+            for content in item["contents"]:
+                self.assertLessEqual(len(content.get("normals", [])) // 3, MAX_VERTICES)
+                self.assertLessEqual(len(content.get("colors", [])), MAX_VERTICES)
+            source = read_resource(os.path.join(os.path.dirname(meta_file), item["URL"][0].replace("_split_1", "")))
+            self.assertEqual(face_values(source), [face for content in item["contents"] for face in face_values(content)])
+
+    def test_engines_identical(self):
+        python_files = output_files(os.path.dirname(self._split("python", engine=ENGINE_PYTHON)))
+        self.assertEqual(python_files, output_files(os.path.dirname(self._split("streaming", memory_limit=1))))
+        if is_available():
+            self.assertEqual(python_files, output_files(os.path.dirname(self._split("numpy", engine=ENGINE_NUMPY))))
+
+    def test_index_width(self):
+        self.assertEqual(16, _index_width({"vertices": [0.0] * 3 * 2 ** 16, "colors": [0] * 100}))
+        self.assertEqual(32, _index_width({"vertices": [0.0] * 300, "colors": [0] * (2 ** 16 + 1)}))